@@ -1,50 +1,88 @@
 class AST(object):
-	pass
+	__slots__ = ()
+
+def iter_child_nodes(node):
+	for cls in type(node).__mro__:
+		for name in getattr(cls, '__slots__', ()):
+			value = getattr(node, name)
+			if isinstance(value, AST):
+				yield value
+			elif isinstance(value, list):
+				for item in value:
+					if isinstance(item, AST):
+						yield item
+
+class BinaryNode(AST):
+	#left op right, the operator token doubles as the node's token
+	__slots__ = ('left', 'op', 'right')
 
-class BinOp(AST):
 	def __init__(self, left, op, right):
 		self.left = left
-		self.token = self.op = op
+		self.op = op
 		self.right = right
-	
+
+	@property
+	def token(self):
+		return self.op
+
+class BinOp(BinaryNode):
+	__slots__ = ()
+
 class Num(AST):
+	__slots__ = ('token', 'value')
+
 	def __init__(self, token):
 		self.token = token
 		self.value = token.value
 
 class UnaryOp(AST):
+	__slots__ = ('op', 'identifier')
+
 	def __init__(self, op, identifier):
-		self.token = self.op = op
+		self.op = op
 		self.identifier = identifier
 
+	@property
+	def token(self):
+		return self.op
+
 class Compound(AST):
+	__slots__ = ('children',)
+
 	def __init__(self):
 		self.children = []
 
-class Assign(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class Assign(BinaryNode):
+	__slots__ = ()
 
 class Var(AST):
+	#slot is the variable's number, set by Resolver
+	__slots__ = ('token', 'var_name', 'index', 'slot')
+
 	def __init__(self, token, index):
 		self.token = token
 		self.var_name = token.value
 		self.index = index
+		self.slot = None
 
 class Indexer(AST):
+	__slots__ = ('token', 'value')
+
 	def __init__(self, token):
 		self.token = token
 		self.value = token.value
 
 class Loop(AST):
+	__slots__ = ('token', 'condition', 'body')
+
 	def __init__(self, token, condition, body):
 		self.token = token
 		self.condition = condition
 		self.body = body
 
 class If(AST):
+	__slots__ = ('token', 'condition', 'body', 'else_node')
+
 	def __init__(self, token, condition, body, else_node):
 		self.token = token
 		self.condition = condition
@@ -52,94 +90,85 @@ class If(AST):
 		self.else_node = else_node
 
 class Else(AST):
+	__slots__ = ('token', 'after')
+
 	def __init__(self, token, after):
 		self.token = token
 		self.after = after
 
 class Output(AST):
+	__slots__ = ('token', 'expr')
+
 	def __init__(self, token, expr):
 		self.token = token
 		self.expr = expr
 
 class Declarative(AST):
+	__slots__ = ('token', 'var', 'assigned')
+
 	def __init__(self, token, var, assigned):
 		self.token = token
 		self.var = var
 		self.assigned = assigned
 
-class PlusEquals(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class PlusEquals(BinaryNode):
+	__slots__ = ()
 
-class MinusEquals(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class MinusEquals(BinaryNode):
+	__slots__ = ()
 
-class DivEquals(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class DivEquals(BinaryNode):
+	__slots__ = ()
 
-class MulEquals(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class MulEquals(BinaryNode):
+	__slots__ = ()
 
-class ModEquals(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class ModEquals(BinaryNode):
+	__slots__ = ()
 
-class LessThan(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
-	
-class LessThanEqual(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class LessThan(BinaryNode):
+	__slots__ = ()
 
-class GreaterThan(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class LessThanEqual(BinaryNode):
+	__slots__ = ()
 
-class GreaterThanEqual(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class GreaterThan(BinaryNode):
+	__slots__ = ()
 
-class EqualTo(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class GreaterThanEqual(BinaryNode):
+	__slots__ = ()
 
-class NotEqualTo(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
-	
-class CompoundCondition(AST):
-	def __init__(self, left, op, right):
-		self.left = left
-		self.token = self.op = op
-		self.right = right
+class EqualTo(BinaryNode):
+	__slots__ = ()
+
+class NotEqualTo(BinaryNode):
+	__slots__ = ()
+
+class CompoundCondition(BinaryNode):
+	__slots__ = ()
 
 class Negator(AST):
+	__slots__ = ('op', 'right')
+
 	def __init__(self, op, right):
-		self.token = self.op = op
-		self.right = right
\ No newline at end of file
+		self.op = op
+		self.right = right
+
+	@property
+	def token(self):
+		return self.op
+
+def line_number(node):
+	#the source line a node came from, None for nodes without a token such as Compound
+	token = getattr(node, 'token', None)
+	if token is None:
+		token = getattr(node, 'op', None)
+	return getattr(token, 'line_number', None)
+
+def replace(node, **changes):
+	#shallow copy of node with some of its fields changed, the original is left alone
+	new = object.__new__(type(node))
+	for cls in type(node).__mro__:
+		for name in getattr(cls, '__slots__', ()):
+			setattr(new, name, changes[name] if name in changes else getattr(node, name))
+	return new
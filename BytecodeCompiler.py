@@ -0,0 +1,315 @@
+from Token import Token
+from Lexer import *
+from Parser import Parser
+from AST import AST, UnaryOp, Num
+from NodeVisitor import NodeVisitor
+import operator
+
+#opcodes, operands (if any) follow the opcode in the code array
+LOAD = 0				#LOAD slot
+CONST = 1				#CONST value
+STORE = 2				#STORE slot
+BINARY = 3				#BINARY operator
+BINARY_CONST = 4		#BINARY_CONST operator value
+BRANCH = 5				#BRANCH operator target			(pops both operands, jumps if the comparison holds)
+BRANCH_CONST = 6		#BRANCH_CONST operator value target
+JUMP = 7				#JUMP target
+JUMP_IF_TRUE = 8		#JUMP_IF_TRUE target
+JUMP_IF_FALSE = 9		#JUMP_IF_FALSE target
+INC = 10				#INC slot delta					(statement, nothing is pushed)
+LOAD_ELEM = 11			#LOAD_ELEM slot					(pops index)
+STORE_ELEM = 12			#STORE_ELEM slot				(pops value, then index)
+INC_VALUE = 13			#INC_VALUE slot delta
+INC_ELEM = 14			#INC_ELEM slot delta			(pops index)
+INC_ELEM_VALUE = 15		#INC_ELEM_VALUE slot delta		(pops index)
+JUMP_IF_TRUE_OR_POP = 16	#JUMP_IF_TRUE_OR_POP target
+JUMP_IF_FALSE_OR_POP = 17	#JUMP_IF_FALSE_OR_POP target
+DUP = 18
+NOT = 19
+OUTPUT = 20
+NEW_ARRAY = 21			#NEW_ARRAY slot length			(raises if the slot was declared before)
+DECLARE = 22			#DECLARE slot					(0 into the slot, raises if it was declared before)
+CHECK = 23				#CHECK slot						(raises if the slot was never declared, to read it)
+CHECK_STORE = 24		#CHECK_STORE slot				(raises if the slot was never declared, to store into it)
+
+#operands of BINARY, BINARY_CONST, BRANCH and BRANCH_CONST index into this
+OPERATORS = (
+	operator.add,
+	operator.sub,
+	operator.mul,
+	operator.floordiv,
+	operator.mod,
+	operator.lt,
+	operator.le,
+	operator.gt,
+	operator.ge,
+	operator.eq,
+	operator.ne
+)
+
+BINARY_OPERATORS = {
+	PLUS: 0,
+	MINUS: 1,
+	MUL: 2,
+	DIV: 3,
+	MOD: 4
+}
+
+COMPARISONS = {
+	'LessThan': 5,
+	'LessThanEqual': 6,
+	'GreaterThan': 7,
+	'GreaterThanEqual': 8,
+	'EqualTo': 9,
+	'NotEqualTo': 10
+}
+
+#comparison that holds exactly when the key does not
+INVERSE = {5: 8, 6: 7, 7: 6, 8: 5, 9: 10, 10: 9}
+
+class BytecodeCompiler(NodeVisitor):
+	#lowers the tree from Parser.parse() into a flat list of ints for the VirtualMachine
+	#variables are resolved to integer slots here, so the VM never looks up a name
+	#
+	#whether a declaration has run is only known when the program runs, a slot is None until then.
+	#Declaring runs a check each time, and a variable not declared on every way to where it is
+	#used is checked there first, so the VM raises the Interpreter's errors where it does
+	def __init__(self, parser, optimizer=None):
+		self.parser = parser
+		self.root = self.parser.parse()
+		if optimizer is not None:
+			self.root = optimizer.optimize(self.root)
+		self.check(self.root)
+		self.slots = {}
+		#names declared on every way to the code being compiled
+		self.declared = set()
+		self.code = []
+
+	def compile(self):
+		self.visit(self.root)
+		return self.code
+
+	def emit(self, *words):
+		self.code.extend(words)
+
+	def emit_jump(self, *words):
+		#returns the position of the target operand so it can be patched later
+		self.code.extend(words)
+		self.code.append(0)
+		return len(self.code) - 1
+
+	def patch(self, positions, target=None):
+		if target is None:
+			target = len(self.code)
+		for position in positions:
+			self.code[position] = target
+
+	def lookup(self, name):
+		slot = self.slots.get(name)
+		if slot is None:
+			slot = self.slots[name] = len(self.slots)
+		return slot
+
+	def declare(self, name):
+		self.declared.add(name)
+		return self.lookup(name)
+
+	def check_declared(self, name, slot, opcode=CHECK):
+		#right before the variable is used, after whatever is calculated for it, as the Interpreter does
+		if name not in self.declared:
+			self.emit(opcode, slot)
+
+	def branch(self, node):
+		#a statement that may not run: what it declares is not declared after it
+		declared = set(self.declared)
+		yield self.statement(node)
+		self.declared = declared
+
+	def statement(self, node):
+		#UnaryOp is both a statement and an expression, only push its value when it is used
+		if isinstance(node, UnaryOp):
+			yield self.increment(node, INC, INC_ELEM)
+		else:
+			yield node
+
+	def jump_if(self, node, truth):
+		#emits a jump taken when the condition evaluates to truth, falls through otherwise
+		#returns the operand positions to patch with the target
+		kind = type(node).__name__
+		if kind in COMPARISONS:
+			comparison = COMPARISONS[kind]
+			if not truth:
+				comparison = INVERSE[comparison]
+			yield node.left
+			if isinstance(node.right, Num):
+				return [self.emit_jump(BRANCH_CONST, comparison, node.right.value)]
+			yield node.right
+			return [self.emit_jump(BRANCH, comparison)]
+		elif kind == 'Negator':
+			return (yield self.jump_if(node.right, not truth))
+		elif kind == 'CompoundCondition':
+			if (node.op.value == '||') == truth:
+				#either side deciding is enough to take the jump
+				return (yield self.jump_if(node.left, truth)) + (yield self.jump_if(node.right, truth))
+			fall_through = yield self.jump_if(node.left, not truth)
+			positions = yield self.jump_if(node.right, truth)
+			self.patch(fall_through)
+			return positions
+		yield node
+		return [self.emit_jump(JUMP_IF_TRUE if truth else JUMP_IF_FALSE)]
+
+	def visit_Compound(self, node):
+		for child in node.children:
+			yield self.statement(child)
+
+	def visit_Declarative(self, node):
+		slot = self.declare(node.var.var_name)
+		if node.var.index is not None:
+			self.emit(NEW_ARRAY, slot, node.var.index.value)
+		else:
+			self.emit(DECLARE, slot)
+			if node.assigned is not None:
+				yield node.assigned
+
+	def visit_Assign(self, node):
+		slot = self.lookup(node.left.var_name)
+		if node.left.index is not None:
+			yield node.left.index
+			yield node.right
+			self.check_declared(node.left.var_name, slot, CHECK_STORE)
+			self.emit(STORE_ELEM, slot)
+		else:
+			yield node.right
+			self.check_declared(node.left.var_name, slot, CHECK_STORE)
+			self.emit(STORE, slot)
+
+	def operation(self, right, op):
+		#applies op to the value on top of the stack and right
+		if isinstance(right, Num):
+			self.emit(BINARY_CONST, op, right.value)
+		else:
+			yield right
+			self.emit(BINARY, op)
+
+	def update(self, node, op):
+		#shared by the compound assignments, the index is only evaluated once
+		slot = self.lookup(node.left.var_name)
+		if node.left.index is not None:
+			yield node.left.index
+			self.check_declared(node.left.var_name, slot)
+			self.emit(DUP, LOAD_ELEM, slot)
+			yield self.operation(node.right, op)
+			self.emit(STORE_ELEM, slot)
+		else:
+			self.check_declared(node.left.var_name, slot)
+			self.emit(LOAD, slot)
+			yield self.operation(node.right, op)
+			self.emit(STORE, slot)
+
+	def visit_PlusEquals(self, node):
+		return self.update(node, BINARY_OPERATORS[PLUS])
+
+	def visit_MinusEquals(self, node):
+		return self.update(node, BINARY_OPERATORS[MINUS])
+
+	def visit_MulEquals(self, node):
+		return self.update(node, BINARY_OPERATORS[MUL])
+
+	def visit_DivEquals(self, node):
+		return self.update(node, BINARY_OPERATORS[DIV])
+
+	def visit_ModEquals(self, node):
+		return self.update(node, BINARY_OPERATORS[MOD])
+
+	def increment(self, node, scalar_op, element_op):
+		slot = self.lookup(node.identifier.var_name)
+		delta = 1 if node.op.type == INCREMENTOR else -1
+		if node.identifier.index is not None:
+			yield node.identifier.index
+			self.check_declared(node.identifier.var_name, slot)
+			self.emit(element_op, slot, delta)
+		else:
+			self.check_declared(node.identifier.var_name, slot)
+			self.emit(scalar_op, slot, delta)
+
+	def visit_UnaryOp(self, node):
+		return self.increment(node, INC_VALUE, INC_ELEM_VALUE)
+
+	def visit_Var(self, node):
+		slot = self.lookup(node.var_name)
+		if node.index is not None:
+			yield node.index
+			self.check_declared(node.var_name, slot)
+			self.emit(LOAD_ELEM, slot)
+		else:
+			self.check_declared(node.var_name, slot)
+			self.emit(LOAD, slot)
+
+	def visit_Num(self, node):
+		self.emit(CONST, node.value)
+
+	def visit_BinOp(self, node):
+		yield node.left
+		yield self.operation(node.right, BINARY_OPERATORS[node.op.type])
+
+	def visit_Output(self, node):
+		yield node.expr
+		self.emit(OUTPUT)
+
+	def visit_Loop(self, node):
+		#condition at the bottom so each iteration costs a single branch
+		condition = self.emit_jump(JUMP)
+		top = len(self.code)
+		yield self.branch(node.body)
+		self.patch([condition])
+		self.patch((yield self.jump_if(node.condition, True)), top)
+
+	def visit_If(self, node):
+		skip_body = yield self.jump_if(node.condition, False)
+		yield self.branch(node.body)
+		if node.else_node is not None:
+			skip_else = self.emit_jump(JUMP)
+			self.patch(skip_body)
+			yield self.branch(node.else_node)
+			self.patch([skip_else])
+		else:
+			self.patch(skip_body)
+
+	def visit_Else(self, node):
+		return self.statement(node.after)
+
+	def comparison(self, node):
+		#a condition used as a value rather than through jump_if
+		yield node.left
+		yield self.operation(node.right, COMPARISONS[type(node).__name__])
+
+	def visit_LessThan(self, node):
+		return self.comparison(node)
+
+	def visit_LessThanEqual(self, node):
+		return self.comparison(node)
+
+	def visit_GreaterThan(self, node):
+		return self.comparison(node)
+
+	def visit_GreaterThanEqual(self, node):
+		return self.comparison(node)
+
+	def visit_EqualTo(self, node):
+		return self.comparison(node)
+
+	def visit_NotEqualTo(self, node):
+		return self.comparison(node)
+
+	def visit_CompoundCondition(self, node):
+		yield node.left
+		if node.op.value == '||':
+			short_circuit = self.emit_jump(JUMP_IF_TRUE_OR_POP)
+		else:
+			short_circuit = self.emit_jump(JUMP_IF_FALSE_OR_POP)
+		yield node.right
+		self.patch([short_circuit])
+
+	def visit_Negator(self, node):
+		yield node.right
+		self.emit(NOT)
@@ -0,0 +1,284 @@
+from Lexer import *
+from AST import Num
+from SymbolTable import SymbolTable
+from NodeVisitor import NodeVisitor
+from Resolver import Resolver
+import operator
+
+#closure makers for each operator, one for two calculated sides and one for a number on the right,
+#so the operator is chosen once when the program is built instead of every time it runs
+ARITHMETIC = {
+	PLUS: (lambda left, right: lambda: left() + right(), lambda left, value: lambda: left() + value),
+	MINUS: (lambda left, right: lambda: left() - right(), lambda left, value: lambda: left() - value),
+	MUL: (lambda left, right: lambda: left() * right(), lambda left, value: lambda: left() * value),
+	DIV: (lambda left, right: lambda: left() // right(), lambda left, value: lambda: left() // value),
+	MOD: (lambda left, right: lambda: left() % right(), lambda left, value: lambda: left() % value)
+}
+
+COMPARISONS = {
+	'LessThan': (lambda left, right: lambda: left() < right(), lambda left, value: lambda: left() < value),
+	'LessThanEqual': (lambda left, right: lambda: left() <= right(), lambda left, value: lambda: left() <= value),
+	'GreaterThan': (lambda left, right: lambda: left() > right(), lambda left, value: lambda: left() > value),
+	'GreaterThanEqual': (lambda left, right: lambda: left() >= right(), lambda left, value: lambda: left() >= value),
+	'EqualTo': (lambda left, right: lambda: left() == right(), lambda left, value: lambda: left() == value),
+	'NotEqualTo': (lambda left, right: lambda: left() != right(), lambda left, value: lambda: left() != value)
+}
+
+OPERATORS = {
+	PLUS: operator.add,
+	MINUS: operator.sub,
+	MUL: operator.mul,
+	DIV: operator.floordiv,
+	MOD: operator.mod
+}
+
+#the operator of a compound assignment
+COMPOUND = {
+	'PlusEquals': PLUS,
+	'MinusEquals': MINUS,
+	'MulEquals': MUL,
+	'DivEquals': DIV,
+	'ModEquals': MOD
+}
+
+class ClosureCompiler(NodeVisitor):
+	#turns the tree from Parser.parse() into nested Python functions, once, and the program
+	#runs as calls of those: a node's function calls its children's, nothing is dispatched or
+	#compared by name while it runs. It runs like the Interpreter, with the same errors:
+	#variables are in values by Resolver slot, and the symbol table records declarations.
+	#
+	#building walks the tree without recursion, but running recurses once per level of nesting,
+	#so a program nested deeper than Python's recursion limit needs the Interpreter
+	def __init__(self, parser, optimizer=None):
+		self.symtab = SymbolTable()
+		self.parser = parser
+		self.root = self.parser.parse()
+		if optimizer is not None:
+			self.root = optimizer.optimize(self.root)
+		self.check(self.root)
+		self.values = [None] * Resolver().resolve(self.root)
+
+	def compile(self):
+		#the program as a function taking no arguments
+		return self.visit(self.root)
+
+	def binary(self, makers, node):
+		#the closure of node.left op node.right from the pair of closure makers for op
+		left = yield node.left
+		if node.right.__class__ is Num:
+			return makers[1](left, node.right.value)
+		return makers[0](left, (yield node.right))
+
+	def visit_Num(self, node):
+		value = node.value
+		return lambda: value
+
+	def visit_Var(self, node):
+		if node.index is not None:
+			return self.element(node)
+		return self.load(node)
+
+	def element(self, node):
+		values = self.values
+		symtab = self.symtab
+		slot = node.slot
+		name = node.var_name
+		index = yield node.index
+		def element():
+			position = index()
+			elements = values[slot]
+			if elements is None:
+				symtab.lookup(name)
+			return elements[position]
+		return element
+
+	def visit_BinOp(self, node):
+		return self.binary(ARITHMETIC[node.op.type], node)
+
+	def visit_LessThan(self, node):
+		return self.binary(COMPARISONS['LessThan'], node)
+
+	def visit_LessThanEqual(self, node):
+		return self.binary(COMPARISONS['LessThanEqual'], node)
+
+	def visit_GreaterThan(self, node):
+		return self.binary(COMPARISONS['GreaterThan'], node)
+
+	def visit_GreaterThanEqual(self, node):
+		return self.binary(COMPARISONS['GreaterThanEqual'], node)
+
+	def visit_EqualTo(self, node):
+		return self.binary(COMPARISONS['EqualTo'], node)
+
+	def visit_NotEqualTo(self, node):
+		return self.binary(COMPARISONS['NotEqualTo'], node)
+
+	def visit_CompoundCondition(self, node):
+		left = yield node.left
+		right = yield node.right
+		if node.op.value == '||':
+			return lambda: True if left() else right()
+		return lambda: right() if left() else False
+
+	def visit_Negator(self, node):
+		right = yield node.right
+		return lambda: not right()
+
+	def visit_Compound(self, node):
+		statements = []
+		for child in node.children:
+			statements.append((yield child))
+		statements = tuple(statements)
+		def block():
+			for statement in statements:
+				statement()
+		return block
+
+	def visit_Output(self, node):
+		expr = yield node.expr
+		return lambda: print(expr())
+
+	def visit_Loop(self, node):
+		condition = yield node.condition
+		body = yield node.body
+		def loop():
+			while condition():
+				body()
+		return loop
+
+	def visit_If(self, node):
+		condition = yield node.condition
+		body = yield node.body
+		if node.else_node is None:
+			def branch():
+				if condition():
+					body()
+			return branch
+		after = yield node.else_node
+		def branches():
+			if condition():
+				body()
+			else:
+				after()
+		return branches
+
+	def visit_Else(self, node):
+		return (yield node.after)
+
+	def visit_Declarative(self, node):
+		values = self.values
+		symtab = self.symtab
+		slot = node.var.slot
+		name = node.var.var_name
+		if node.var.index is not None:
+			length = yield node.var.index
+			def declare_array():
+				size = length()
+				symtab.declare(name)
+				values[slot] = [0] * size
+			return declare_array
+		assigned = None
+		if node.assigned is not None:
+			assigned = yield node.assigned
+		def declare():
+			symtab.declare(name)
+			values[slot] = 0
+			if assigned is not None:
+				assigned()
+		return declare
+
+	def store(self, target, calculate):
+		#the closure storing what calculate returns into the target. An element's index is calculated
+		#first and calculate gets it, a variable's calculate takes nothing. The target is checked for
+		#a declaration after the value, as the Interpreter does
+		values = self.values
+		symtab = self.symtab
+		slot = target.slot
+		name = target.var_name
+		if target.index is None:
+			def store_variable():
+				value = calculate()
+				if values[slot] is None:
+					symtab.assign(name, value, None)
+				values[slot] = value
+				return value
+			return store_variable
+		index = yield target.index
+		def store_element():
+			position = index()
+			value = calculate(position)
+			elements = values[slot]
+			if elements is None:
+				symtab.assign(name, value, position)
+			elements[position] = value
+			return value
+		return store_element
+
+	def load(self, target):
+		#the closure reading the target, an element's takes its index
+		values = self.values
+		symtab = self.symtab
+		slot = target.slot
+		name = target.var_name
+		if target.index is None:
+			def load_variable():
+				value = values[slot]
+				if value is None:
+					symtab.lookup(name)
+				return value
+			return load_variable
+		def load_element(position):
+			elements = values[slot]
+			if elements is None:
+				symtab.lookup(name)
+			return elements[position]
+		return load_element
+
+	def visit_Assign(self, node):
+		right = yield node.right
+		if node.left.index is None:
+			return (yield self.store(node.left, right))
+		return (yield self.store(node.left, lambda position: right()))
+
+	def compound(self, node):
+		#the target is read before the right side is calculated, as the Interpreter does
+		load = self.load(node.left)
+		right = yield node.right
+		function = OPERATORS[COMPOUND[type(node).__name__]]
+		if node.left.index is None:
+			return (yield self.store(node.left, lambda: function(load(), right())))
+		return (yield self.store(node.left, lambda position: function(load(position), right())))
+
+	def visit_PlusEquals(self, node):
+		return self.compound(node)
+
+	def visit_MinusEquals(self, node):
+		return self.compound(node)
+
+	def visit_MulEquals(self, node):
+		return self.compound(node)
+
+	def visit_DivEquals(self, node):
+		return self.compound(node)
+
+	def visit_ModEquals(self, node):
+		return self.compound(node)
+
+	def visit_UnaryOp(self, node):
+		step = 1 if node.op.type == INCREMENTOR else -1
+		if node.identifier.index is not None:
+			load = self.load(node.identifier)
+			return self.store(node.identifier, lambda position: load(position) + step)
+		#++i and --i are most of what a counting loop does, so they get one function
+		values = self.values
+		symtab = self.symtab
+		slot = node.identifier.slot
+		name = node.identifier.var_name
+		def step_variable():
+			value = values[slot]
+			if value is None:
+				symtab.lookup(name)
+			value += step
+			values[slot] = value
+			return value
+		return step_variable
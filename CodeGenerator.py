@@ -1,98 +1,445 @@
 from Token import Token
 from Lexer import *
 from Parser import Parser
-from AST import AST
+from AST import AST, UnaryOp, Assign, PlusEquals, MinusEquals, MulEquals, DivEquals, ModEquals, iter_child_nodes, line_number
 from SymbolTable import SymbolTable
 from NodeVisitor import NodeVisitor
-from Command import Command
+from Command import Command, Label
+import Runtime
+
+#the target's words, and so its values and addresses, are 8 bits
+WORD_BITS = 8
+#names of the cells holding values part way through a calculation,
+#no program variable can have them because $ cannot start an identifier
+TEMPORARY = '${n}'
+#a multiplication by a constant is done in place when it takes at most this many words,
+#about what passing the operands to the multiply routine and calling it takes
+INLINE_WORDS = 16
+#the nodes that change a variable, an operation with one of them in it is calculated left first
+EFFECTS = (UnaryOp, Assign, PlusEquals, MinusEquals, MulEquals, DivEquals, ModEquals)
 
 class CodeGenerator(NodeVisitor):
-	def __init__(self, parser):
+	def __init__(self, parser, optimizer=None):
 		self.symtab = SymbolTable()
+		#where the condition being generated jumps to when it is true and when it is false
+		self.body = None
+		self.after = None
+		#cells for values part way through a calculation, declared as they are first needed
+		#and handed out again once free, so at most as many as the deepest calculation holds at once
+		self.temporaries = []
+		self.free = []
+		#runtime routines the program calls, by name
+		self.routines = {}
 		self.parser = parser
 		self.root = self.parser.parse()
+		if optimizer is not None:
+			self.root = optimizer.optimize(self.root)
+		self.check(self.root)
+		#the nodes that change a variable or have one that does inside them, found once
+		#so asking at every level of a deep expression does not walk it again
+		self.changing = self.changes(self.root)
 	
 	def generate(self):
-		commands = self.visit(self.root)
+		commands = [self.visit(self.root)]
 		commands.append(Command('HLT', 'instruction'))
+		for name, routine in self.routines.items():
+			commands.append([Command(name, 'source'), routine.commands])
+		return self.layout(commands)
+
+	def layout(self, commands):
+		#statements nest the lists of the statements inside them instead of copying them,
+		#they are flattened here, once. Every label gets the address of the word after it,
+		#then the labels are dropped and each reference becomes the address
+		#
+		#a source marker gives the words after it in its list, and in the lists inside that, their source
+		placed = []
+		stack = [iter(commands)]
+		sources = []
+		source = None
+		while stack:
+			for command in stack[-1]:
+				if command.__class__ is list:
+					stack.append(iter(command))
+					sources.append(source)
+					break
+				elif command.data_type == 'label':
+					command.data.address = len(placed)
+				elif command.data_type == 'source':
+					if command.data is not None:
+						source = command.data
+				else:
+					command.source = source
+					placed.append(command)
+			else:
+				stack.pop()
+				if sources:
+					source = sources.pop()
+		for command in placed:
+			if command.data_type == 'dynamic':
+				command.data = command.data.address
+		return placed
+
+	def spills(self):
+		#addresses of the temporaries generate() used
+		return list(self.temporaries)
+
+	def allocate(self):
+		if self.free:
+			return self.free.pop()
+		name = TEMPORARY.format(n=len(self.temporaries))
+		self.symtab.declare(name)
+		address = self.symtab.lookup_address(name)
+		self.temporaries.append(address)
+		return address
+
+	def release(self, address):
+		self.free.append(address)
+
+	def operand(self, node):
+		#the operand word of an instruction that uses node directly: (word, immediate),
+		#None when its value has to be calculated first
+		if type(node).__name__ == 'Num':
+			return Command(node.value, 'data'), True
+		elif type(node).__name__ == 'Var' and node.index is None:
+			return Command(self.symtab.lookup_address(node.var_name), 'variable'), False
+		elif type(node).__name__ == 'Var' and type(node.index).__name__ == 'Num':
+			return Command(self.symtab.lookup_address(node.var_name, node.index.value), 'address'), False
+		return None
+
+	def load(self, node):
+		#commands leaving the value of node in the accumulator
+		operand = self.operand(node)
+		if operand is not None:
+			word, immediate = operand
+			return [Command('LDI' if immediate else 'LDA', 'instruction'), word]
+		if type(node).__name__ == 'Var':
+			#load through the address calculated into the accumulator
+			filled = Label()
+			commands = yield node
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(filled, 'dynamic'))
+			commands.append(Command('LDA', 'instruction'))
+			commands.append(Command(filled, 'label'))
+			commands.append(Command(0, 'dynamically filled'))
+			return commands
+		return (yield node)
+
+	def arithmetic(self, left, right, immediate_instruction, memory_instruction, commutative, reverse=False):
+		#left in the accumulator, then right added or subtracted straight from its operand,
+		#or from a temporary when right has to be calculated too. Calculating it first
+		#leaves it in the accumulator, so when left does not need calculating they swap if they can.
+		#Either side changing a variable needs them calculated in the source's order, left first,
+		#or right first with reverse, where the source has them the other way round, so
+		#there a variable right has to be read before left too
+		operand = self.operand(right)
+		if (operand is None or reverse and not operand[1]) and (self.effects(left) or self.effects(right)):
+			return (yield self.ordered(left, right, memory_instruction, commutative, reverse))
+		if operand is None and self.operand(left) is not None and commutative:
+			left, right = right, left
+			operand = self.operand(right)
+		if operand is not None:
+			word, immediate = operand
+			commands = yield self.load(left)
+			commands.append(Command(immediate_instruction if immediate else memory_instruction, 'instruction'))
+			commands.append(word)
+			return commands
+		commands = yield self.load(right)
+		temporary = self.allocate()
+		commands.append(Command('STO', 'instruction'))
+		commands.append(Command(temporary, 'address'))
+		commands.extend((yield self.load(left)))
+		commands.append(Command(memory_instruction, 'instruction'))
+		commands.append(Command(temporary, 'address'))
+		self.release(temporary)
+		return commands
+
+	def ordered(self, left, right, memory_instruction, commutative, reverse):
+		#left calculated into a temporary, then right. Commutative, right can take left from the
+		#temporary, otherwise right goes into a second one and left comes back. With reverse,
+		#right goes into the temporary first and left is calculated into the accumulator after it
+		if reverse:
+			commands = yield self.load(right)
+			first = self.allocate()
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(first, 'address'))
+			commands.extend((yield self.load(left)))
+			commands.append(Command(memory_instruction, 'instruction'))
+			commands.append(Command(first, 'address'))
+			self.release(first)
+			return commands
+		commands = yield self.load(left)
+		first = self.allocate()
+		commands.append(Command('STO', 'instruction'))
+		commands.append(Command(first, 'address'))
+		commands.extend((yield self.load(right)))
+		if commutative:
+			commands.append(Command(memory_instruction, 'instruction'))
+			commands.append(Command(first, 'address'))
+			self.release(first)
+			return commands
+		second = self.allocate()
+		commands.append(Command('STO', 'instruction'))
+		commands.append(Command(second, 'address'))
+		commands.append(Command('LDA', 'instruction'))
+		commands.append(Command(first, 'address'))
+		commands.append(Command(memory_instruction, 'instruction'))
+		commands.append(Command(second, 'address'))
+		self.release(second)
+		self.release(first)
+		return commands
+
+	def effects(self, node):
+		#whether calculating node can change a variable
+		return node in self.changing
+
+	def changes(self, root):
+		#the set of nodes under root that are or have inside them one of EFFECTS, children
+		#decided before their parents
+		changing = set()
+		stack = [(root, False)]
+		while stack:
+			node, visited = stack.pop()
+			children = list(iter_child_nodes(node))
+			if not visited:
+				stack.append((node, True))
+				stack.extend((child, False) for child in children)
+			elif isinstance(node, EFFECTS) or any(child in changing for child in children):
+				changing.add(node)
+		return changing
+
+	def routine(self, name):
+		if name not in self.routines:
+			self.routines[name] = Runtime.ROUTINES[name](self.symtab, WORD_BITS)
+		return self.routines[name]
+
+	def call(self, name, left, right):
+		#left and right into the routine's argument cells, in through its entry
+		#and back with the return address stored into its last JMP
+		routine = self.routine(name)
+		first, second = routine.arguments
+		if self.operand(right) is not None:
+			commands = yield self.load(left)
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(first, 'address'))
+			commands.extend((yield self.load(right)))
+		elif self.effects(left) or self.effects(right):
+			#left first, as the Interpreter does, waiting in a temporary while right could call the routine
+			commands = yield self.load(left)
+			temporary = self.allocate()
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(temporary, 'address'))
+			commands.extend((yield self.load(right)))
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(second, 'address'))
+			commands.append(Command('LDA', 'instruction'))
+			commands.append(Command(temporary, 'address'))
+			self.release(temporary)
+			first, second = second, first
+		elif self.operand(left) is not None:
+			commands = yield self.load(right)
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(second, 'address'))
+			commands.extend((yield self.load(left)))
+			first, second = second, first
+		else:
+			#the left side could call the routine too, so the right waits in a temporary
+			commands = yield self.load(right)
+			temporary = self.allocate()
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(temporary, 'address'))
+			commands.extend((yield self.load(left)))
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(first, 'address'))
+			commands.append(Command('LDA', 'instruction'))
+			commands.append(Command(temporary, 'address'))
+			self.release(temporary)
+		commands.append(Command('STO', 'instruction'))
+		commands.append(Command(second, 'address'))
+		back = Label()
+		commands.append(Command('LDI', 'instruction'))
+		commands.append(Command(back, 'dynamic'))
+		commands.append(Command('STO', 'instruction'))
+		commands.append(Command(routine.exit, 'dynamic'))
+		commands.append(Command('JMP', 'instruction'))
+		commands.append(Command(routine.entry, 'dynamic'))
+		commands.append(Command(back, 'label'))
+		return commands
+
+	def multiplication(self, left, right):
+		if type(left).__name__ == 'Num' and type(right).__name__ != 'Num':
+			left, right = right, left
+		if type(right).__name__ == 'Num':
+			factor = right.value % (1 << WORD_BITS)
+			if factor == 0:
+				commands = []
+				if self.operand(left) is None:
+					#still calculated, it can have ++ or -- in it
+					commands = yield self.load(left)
+				commands.append(Command('LDI', 'instruction'))
+				commands.append(Command(0, 'data'))
+				return commands
+			elif factor == 1:
+				return (yield self.load(left))
+			steps = self.scaling(factor)
+			if steps is not None:
+				return (yield self.scale(left, steps))
+		return (yield self.call('multiply', left, right))
+
+	def scaling(self, factor):
+		#the shortest way to multiply the accumulator by factor as a list of steps: 'double' it,
+		#or 'add' the value it started with. None when calling the multiply routine is shorter
+		repeated = ['add'] * (factor - 1)
+		binary = []
+		for bit in bin(factor)[3:]:
+			binary.append('double')
+			if bit == '1':
+				binary.append('add')
+		steps = min(repeated, binary, key=self.scaling_words)
+		if self.scaling_words(steps) > INLINE_WORDS:
+			return None
+		return steps
+
+	def scaling_words(self, steps):
+		#STO; ADD to double, ADD to add, and STO to keep the value added
+		words = 4 * steps.count('double') + 2 * steps.count('add')
+		if 'add' in steps:
+			words += 2
+		return words
+
+	def scale(self, node, steps):
+		commands = yield self.load(node)
+		if 'add' in steps:
+			start = self.allocate()
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(start, 'address'))
+		if 'double' in steps:
+			doubled = self.allocate()
+		for step in steps:
+			if step == 'double':
+				commands.append(Command('STO', 'instruction'))
+				commands.append(Command(doubled, 'address'))
+				commands.append(Command('ADD', 'instruction'))
+				commands.append(Command(doubled, 'address'))
+			else:
+				commands.append(Command('ADD', 'instruction'))
+				commands.append(Command(start, 'address'))
+		if 'double' in steps:
+			self.release(doubled)
+		if 'add' in steps:
+			self.release(start)
+		return commands
+
+	def division(self, left, right, remainder):
+		#quotient or remainder. A divisor of at least half the word range goes at most once,
+		#which a subtraction decides, anything else calls the divide routine
+		if type(right).__name__ == 'Num':
+			divisor = right.value % (1 << WORD_BITS)
+			if divisor == 1:
+				commands = yield self.load(left)
+				if remainder:
+					commands.append(Command('LDI', 'instruction'))
+					commands.append(Command(0, 'data'))
+				return commands
+			elif divisor >= 1 << (WORD_BITS - 1):
+				done = Label()
+				commands = yield self.load(left)
+				commands.append(Command('SBI', 'instruction'))
+				commands.append(Command(divisor, 'data'))
+				if remainder:
+					#left - divisor when nothing was borrowed, otherwise left again
+					commands.append(Command('JC', 'instruction'))
+					commands.append(Command(done, 'dynamic'))
+					commands.append(Command('ADI', 'instruction'))
+					commands.append(Command(divisor, 'data'))
+				else:
+					once = Label()
+					commands.append(Command('JC', 'instruction'))
+					commands.append(Command(once, 'dynamic'))
+					commands.append(Command('LDI', 'instruction'))
+					commands.append(Command(0, 'data'))
+					commands.append(Command('JMP', 'instruction'))
+					commands.append(Command(done, 'dynamic'))
+					commands.append(Command(once, 'label'))
+					commands.append(Command('LDI', 'instruction'))
+					commands.append(Command(1, 'data'))
+				commands.append(Command(done, 'label'))
+				return commands
+		commands = yield self.call('divide', left, right)
+		if remainder:
+			commands.append(Command('LDA', 'instruction'))
+			commands.append(Command(self.routine('divide').result, 'address'))
+		return commands
+
+	def comparison(self, minuend, subtrahend, jumps, symmetric=False, reverse=False):
+		#sets the flags from minuend - subtrahend, then jumps to self.body or self.after:
+		#carry set means nothing was borrowed, minuend >= subtrahend. reverse is for a
+		#subtrahend that is the left side in the source, as in > and >=
+		commands = yield self.arithmetic(minuend, subtrahend, 'SBI', 'SUB', symmetric, reverse)
+		for instruction, target in jumps:
+			commands.append(Command(instruction, 'instruction'))
+			commands.append(Command(target, 'dynamic'))
 		return commands
 	
+	def statement(self, node):
+		#the commands of a statement, marked with its line
+		commands = yield node
+		return [Command(line_number(node), 'source'), commands]
+
 	def visit_Compound(self, node):
 		child_commands = []
-		length = 0
 		for c in node.children:
-			commands = self.visit(c)
-			length = len(child_commands)
-			for command in commands:
-				if command.data_type == 'dynamic':
-					command.data += length
-			child_commands.extend(commands)
+			child_commands.append((yield self.statement(c)))
 		return child_commands
 		
 	def visit_Declarative(self, node):
 		commands = []
 		if node.var.index is not None:
-			self.symtab.declare_array(node.var.var_name, self.visit(node.var.index))
+			self.symtab.declare_array(node.var.var_name, (yield node.var.index))
 		else:
 			self.symtab.declare(node.var.var_name)
 			if node.assigned is not None:
-				commands.extend(self.visit(node.assigned))
+				commands.extend((yield node.assigned))
 		return commands
 	
 	def visit_Assign(self, node):
+		return self.assignment(node.left, self.load(node.right))
+
+	def visit_PlusEquals(self, node):
+		return self.assignment(node.left, self.operation(node.left, '+', node.right))
+
+	def visit_MinusEquals(self, node):
+		return self.assignment(node.left, self.operation(node.left, '-', node.right))
+
+	def visit_MulEquals(self, node):
+		return self.assignment(node.left, self.operation(node.left, '*', node.right))
+
+	def visit_DivEquals(self, node):
+		return self.assignment(node.left, self.operation(node.left, '/', node.right))
+
+	def visit_ModEquals(self, node):
+		return self.assignment(node.left, self.operation(node.left, '%', node.right))
+
+	def assignment(self, target, value):
+		#value is the generator of the commands calculating what to store
 		#this could be an address or
 		# instructions to calculate an address
-		var_address = self.visit(node.left)
+		var_address = yield target
 
 		if len(var_address) == 1:
-			#not an array
-			if type(node.right).__name__ == 'Num':
-				#store number in variable
-				value = self.visit(node.right)
-				commands = [Command('LDI', 'instruction')]
-				commands.append(Command(value, 'data'))
-				commands.append(Command('STO', 'instruction'))
-				commands.extend(var_address)
-			else:
-				#store expression result in variable
-				commands = self.visit(node.right)
-				commands.append(Command('STO', 'instruction'))
-				commands.extend(var_address)
+			#not an array, or an element known in advance
+			commands = yield value
+			commands.append(Command('STO', 'instruction'))
+			commands.extend(var_address)
 		else:
-			#dealing with an array
-			if type(node.right).__name__ == 'Num':
-				#store number in array spot
-				value = self.visit(node.right)
-				length = len(var_address) + 4
-				commands = var_address
-				commands.append(Command('STO', 'instruction'))
-				commands.append(Command(length + 1, 'dynamic'))
-				commands.append(Command('LDI', 'instruction'))
-				commands.append(Command(value, 'data'))
-				commands.append(Command('STO', 'instruction'))
-				commands.append(Command('0', 'dynamically filled'))
-			elif type(node.right).__name__ == 'Var':
-				#store var in array spot
-				length = len(var_address) + 4
-				right_var_address = self.visit(node.right)
-				commands = var_address
-				commands.append(Command('STO', 'instruction'))
-				commands.append(Command(length + 1, 'dynamic'))
-				commands.append(Command('LDA', 'instruction'))
-				commands.extend(right_var_address)
-				commands.append(Command('STO', 'instruction'))
-				commands.append(Command(0, 'dynamically filled'))
-			else:
-				#store expression result in array spot
-				length = len(var_address) + 2
-				right_commands = self.visit(node.right)
-				right_length = len(right_commands)
-				commands = var_address
-				commands.append(Command('STO', 'instruction'))
-				commands.append(Command(length + right_length + 1, 'dynamic'))
-				commands.extend(right_commands)
-				commands.append(Command('STO', 'instruction'))
-				commands.append(Command(0, 'dynamically filled'))
+			#the address calculated is stored into the operand of the last STO
+			filled = Label()
+			commands = var_address
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(filled, 'dynamic'))
+			commands.extend((yield value))
+			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(filled, 'label'))
+			commands.append(Command(0, 'dynamically filled'))
 
 		return commands
 	
@@ -101,17 +448,12 @@ class CodeGenerator(NodeVisitor):
 			#with index
 			if type(node.index).__name__ == 'Num':
 				#with numeric index
-				index = self.visit(node.index)
+				index = yield node.index
 				address = self.symtab.lookup_address(node.var_name, index)
 				return [Command(address, 'address')]
 			else:
-				if type(node.index).__name__ == 'Var':
-					#with variable index
-					commands = [Command('LDA', 'instruction')]
-					commands.extend(self.visit(node.index))
-				else:
-					#with expression index
-					commands = self.visit(node.index)
+				#with variable or expression index
+				commands = yield self.load(node.index)
 				var_address = self.symtab.lookup_address(node.var_name, 0)
 				commands.append(Command('ADI', 'instruction'))
 				commands.append(Command(var_address, 'address'))
@@ -124,536 +466,95 @@ class CodeGenerator(NodeVisitor):
 		return node.value
 
 	def visit_Output(self, node):
-		if type(node.expr).__name__ == 'Num':
-			value = self.visit(node.expr)
-			commands = [Command('LDI', 'instruction')]
-			commands.append(Command(value, 'data'))
-		elif type(node.expr).__name__ == 'Var':
-			address = self.visit(node.expr)
-			if len(address) == 1:
-				commands = [Command('LDA', 'instruction')]
-				commands.extend(address)
-			else:
-				commands = address
-				commands.append(Command('STO', 'instruction'))
-				commands.append(Command(len(address) + 2, 'dynamic'))
-				commands.append(Command('LDI', 'instruction'))
-				commands.append(Command(0, 'dynamically filled'))
-		else:
-			commands = self.visit(node.expr)
+		commands = yield self.load(node.expr)
 		commands.append(Command('OUT', 'instruction'))
 		return commands
 	
 	def visit_BinOp(self, node):
-		left_setup = []
-		left_commands = []
-		right_setup = []
-		right_commands = []
-		operations = []
-		if type(node.left).__name__ == 'Num':
-			value = self.visit(node.left)
-			left_commands = [Command('LDI', 'instruction')]
-			left_commands.append(Command(value, 'data'))
-		elif type(node.left).__name__ == 'Var':
-			immediate = False
-			left_address = self.visit(node.left)
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.extend(left_address)
-		else:
-			if not self.symtab.is_declared('binop_left'):
-				self.symtab.declare('binop_left')
-			left_address = self.symtab.lookup_address('binop_left')
-			left_setup = self.visit(node.left)
-			#do I really need to do this? Perhaps it will be caught by the optimizer
-			left_setup.append(Command('STO', 'instruction'))
-			left_setup.append(Command(left_address, 'address'))
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.append(Command(left_address, 'variable'))
-
-		if type(node.right).__name__ == 'Num':
-			immediate = True;
-			value = self.visit(node.right)
-			right_commands.append(Command(value, 'data'))
-		elif type(node.right).__name__ == 'Var':
-			immediate = False
-			right_address = self.visit(node.right)
-			right_commands.extend(right_address)
-		else:
-			immediate = False
-			right_setup = self.visit(node.right)
-			if not self.symtab.is_declared('binop_right'):
-				self.symtab.declare('binop_right')
-			right_address = self.symtab.lookup_address('binop_right')
-			right_setup.append(Command('STO', 'instruction'))
-			right_setup.append(Command(right_address, 'address'))
-			right_commands.append(Command(right_address, 'address'))
-			
-		if node.op.value == '+':
-			if immediate:
-				operations.append(Command('ADI', 'instruction'))
-			else:
-				operations.append(Command('ADD', 'instruction'))
-		elif node.op.value == '-':
-			if immediate:
-				operations.append(Command('SBI', 'instruction'))
-			else:
-				operations.append(Command('SUB', 'instruction'))
-		elif node.op.value == '*':
-			#do something here
-			raise Exception('multiplication not implemented yet!')
-		elif node.op.value == '/':
-			#do something here
-			raise Exception('division not implemented yet!')
-		elif node.op.value == '%':
-			#do something here
-			raise Exception('modulus not implemented yet!')
-		commands = left_setup
-		commands.extend(right_setup)
-		commands.extend(left_commands)
-		commands.extend(operations)
-		commands.extend(right_commands)
-		return commands
+		return self.operation(node.left, node.op.value, node.right)
+
+	def operation(self, left, op, right):
+		if op == '+':
+			return self.arithmetic(left, right, 'ADI', 'ADD', True)
+		elif op == '-':
+			return self.arithmetic(left, right, 'SBI', 'SUB', False)
+		elif op == '*':
+			return self.multiplication(left, right)
+		elif op == '/':
+			return self.division(left, right, False)
+		elif op == '%':
+			return self.division(left, right, True)
 	
 	def visit_Loop(self, node):
-		commands = self.visit(node.condition)
-		condition_length = len(commands)
-		commands.extend(self.visit(node.body))
-		commands.append(Command('JMP', 'instruction'))
-		commands.append(Command(0, 'data'))	# we'll change the type later
-		full_length = len(commands)
-		for command in commands:
-			if command.data_type == 'skip_once':
-				command.data_type = 'dynamic'
-			elif command.data_type == 'dynamic':
-				command.data += condition_length
-			elif command.data_type == 'body':
-				command.data = condition_length
-				command.data_type = 'dynamic'
-			elif command.data_type == 'after':
-				command.data = full_length
-				command.data_type = 'dynamic'
-		commands[-1].data_type = 'dynamic'
+		start = Label()
+		body = Label()
+		after = Label()
+		commands = [Command(start, 'label')]
+		commands.extend((yield self.condition(node.condition, body, after)))
+		commands.append(Command(body, 'label'))
+		commands.append((yield self.statement(node.body)))
+		back = Command('JMP', 'instruction')
+		back.loop = True
+		commands.append(back)
+		commands.append(Command(start, 'dynamic'))
+		commands.append(Command(after, 'label'))
+		return commands
+
+	def condition(self, node, body, after):
+		#a condition jumps to after when it is false, and to body or on into it when it is true
+		outer = (self.body, self.after)
+		self.body, self.after = body, after
+		commands = yield node
+		self.body, self.after = outer
 		return commands
 	
 	def visit_LessThan(self, node):
-		left_setup = []
-		left_commands = []
-		right_setup = []
-		right_commands = []
-		operations = []
-		if type(node.left).__name__ == 'Num':
-			value = self.visit(node.left)
-			left_commands = [Command('LDI', 'instruction')]
-			left_commands.append(Command(value, 'data'))
-		elif type(node.left).__name__ == 'Var':
-			immediate = False
-			left_address = self.visit(node.left)
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.extend(left_address)
-		else:
-			if not self.symtab.is_declared('compare_left'):
-				self.symtab.declare('compare_left')
-			left_address = self.symtab.lookup_address('compare_left')
-			left_setup = self.visit(node.left)
-			#do I really need to do this? Perhaps it will be caught by the optimizer
-			left_setup.append(Command('STO', 'instruction'))
-			left_setup.append(Command(left_address, 'address'))
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.append(Command(left_address, 'variable'))
-
-		if type(node.right).__name__ == 'Num':
-			immediate = True;
-			value = self.visit(node.right)
-			right_commands.append(Command(value, 'data'))
-		elif type(node.right).__name__ == 'Var':
-			immediate = False
-			right_address = self.visit(node.right)
-			right_commands.extend(right_address)
-		else:
-			immediate = False
-			right_setup = self.visit(node.right)
-			if not self.symtab.is_declared('compare_right'):
-				self.symtab.declare('compare_right')
-			right_address = self.symtab.lookup_address('compare_right')
-			right_setup.append(Command('STO', 'instruction'))
-			right_setup.append(Command(right_address, 'address'))
-			right_commands.append(Command(right_address, 'address'))
-		
-		if immediate:
-			operations.append(Command('SBI', 'instruction'))
-		else:
-			operations.append(Command('SUB', 'instruction'))
-		
-		commands = left_setup
-		commands.extend(right_setup)
-		commands.extend(left_commands)
-		commands.extend(operations)
-		commands.extend(right_commands)
-		commands.append(Command('JC', 'instruction'))
-		commands.append(Command(0, 'after'))
-		return commands
+		return self.comparison(node.left, node.right, (('JC', self.after),))
 
 	def visit_GreaterThan(self, node):
-		left_setup = []
-		left_commands = []
-		right_setup = []
-		right_commands = []
-		operations = []
-		if type(node.left).__name__ == 'Num':
-			immediate = True;
-			value = self.visit(node.left)
-			left_commands.append(Command(value, 'data'))
-		elif type(node.left).__name__ == 'Var':
-			immediate = False
-			left_address = self.visit(node.left)
-			left_commands.extend(left_address)
-		else:
-			immediate = False
-			if not self.symtab.is_declared('compare_left'):
-				self.symtab.declare('compare_left')
-			left_address = self.symtab.lookup_address('compare_left')
-			left_setup = self.visit(node.left)
-			#do I really need to do this? Perhaps it will be caught by the optimizer
-			left_setup.append(Command('STO', 'instruction'))
-			left_setup.append(Command(left_address, 'address'))
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.append(Command(left_address, 'variable'))
-
-		if type(node.right).__name__ == 'Num':
-			value = self.visit(node.right)
-			right_commands = [Command('LDI', 'instruction')]
-			right_commands.append(Command(value, 'data'))
-		elif type(node.right).__name__ == 'Var':
-			right_address = self.visit(node.right)
-			right_commands.append(Command('LDA', 'instruction'))
-			right_commands.extend(right_address)
-		else:
-			right_setup = self.visit(node.right)
-			if not self.symtab.is_declared('compare_right'):
-				self.symtab.declare('compare_right')
-			right_address = self.symtab.lookup_address('compare_right')
-			right_setup.append(Command('STO', 'instruction'))
-			right_setup.append(Command(right_address, 'address'))
-			right_commands.append(Command(right_address, 'address'))
-		
-		if immediate:
-			operations.append(Command('SBI', 'instruction'))
-		else:
-			operations.append(Command('SUB', 'instruction'))
-		
-		commands = right_setup
-		commands.extend(left_setup)
-		commands.extend(right_commands)
-		commands.extend(operations)
-		commands.extend(left_commands)
-		commands.append(Command('JC', 'instruction'))
-		commands.append(Command(0, 'after'))
-		return commands
+		return self.comparison(node.right, node.left, (('JC', self.after),), reverse=True)
 
 	def visit_NotEqualTo(self, node):
-		left_setup = []
-		left_commands = []
-		right_setup = []
-		right_commands = []
-		operations = []
-		if type(node.left).__name__ == 'Num':
-			value = self.visit(node.left)
-			left_commands = [Command('LDI', 'instruction')]
-			left_commands.append(Command(value, 'data'))
-		elif type(node.left).__name__ == 'Var':
-			immediate = False
-			left_address = self.visit(node.left)
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.extend(left_address)
-		else:
-			if not self.symtab.is_declared('compare_left'):
-				self.symtab.declare('compare_left')
-			left_address = self.symtab.lookup_address('compare_left')
-			left_setup = self.visit(node.left)
-			#do I really need to do this? Perhaps it will be caught by the optimizer
-			left_setup.append(Command('STO', 'instruction'))
-			left_setup.append(Command(left_address, 'address'))
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.append(Command(left_address, 'variable'))
-
-		if type(node.right).__name__ == 'Num':
-			immediate = True;
-			value = self.visit(node.right)
-			right_commands.append(Command(value, 'data'))
-		elif type(node.right).__name__ == 'Var':
-			immediate = False
-			right_address = self.visit(node.right)
-			right_commands.extend(right_address)
-		else:
-			immediate = False
-			right_setup = self.visit(node.right)
-			if not self.symtab.is_declared('compare_right'):
-				self.symtab.declare('compare_right')
-			right_address = self.symtab.lookup_address('compare_right')
-			right_setup.append(Command('STO', 'instruction'))
-			right_setup.append(Command(right_address, 'address'))
-			right_commands.append(Command(right_address, 'address'))
-		
-		if immediate:
-			operations.append(Command('SBI', 'instruction'))
-		else:
-			operations.append(Command('SUB', 'instruction'))
-		
-		commands = left_setup
-		commands.extend(right_setup)
-		commands.extend(left_commands)
-		commands.extend(operations)
-		commands.extend(right_commands)
-		commands.append(Command('JZ', 'instruction'))
-		commands.append(Command(0, 'after'))
-		return commands
+		return self.comparison(node.left, node.right, (('JZ', self.after),), True)
 	
 	def visit_EqualTo(self, node):
-		left_setup = []
-		left_commands = []
-		right_setup = []
-		right_commands = []
-		operations = []
-		if type(node.left).__name__ == 'Num':
-			value = self.visit(node.left)
-			left_commands = [Command('LDI', 'instruction')]
-			left_commands.append(Command(value, 'data'))
-		elif type(node.left).__name__ == 'Var':
-			immediate = False
-			left_address = self.visit(node.left)
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.extend(left_address)
-		else:
-			if not self.symtab.is_declared('compare_left'):
-				self.symtab.declare('compare_left')
-			left_address = self.symtab.lookup_address('compare_left')
-			left_setup = self.visit(node.left)
-			#do I really need to do this? Perhaps it will be caught by the optimizer
-			left_setup.append(Command('STO', 'instruction'))
-			left_setup.append(Command(left_address, 'address'))
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.append(Command(left_address, 'variable'))
-
-		if type(node.right).__name__ == 'Num':
-			immediate = True;
-			value = self.visit(node.right)
-			right_commands.append(Command(value, 'data'))
-		elif type(node.right).__name__ == 'Var':
-			immediate = False
-			right_address = self.visit(node.right)
-			right_commands.extend(right_address)
-		else:
-			immediate = False
-			right_setup = self.visit(node.right)
-			if not self.symtab.is_declared('compare_right'):
-				self.symtab.declare('compare_right')
-			right_address = self.symtab.lookup_address('compare_right')
-			right_setup.append(Command('STO', 'instruction'))
-			right_setup.append(Command(right_address, 'address'))
-			right_commands.append(Command(right_address, 'address'))
-		
-		if immediate:
-			operations.append(Command('SBI', 'instruction'))
-		else:
-			operations.append(Command('SUB', 'instruction'))
-		
-		commands = left_setup
-		commands.extend(right_setup)
-		commands.extend(left_commands)
-		commands.extend(operations)
-		commands.extend(right_commands)
-		commands.append(Command('JZ', 'instruction'))
-		commands.append(Command(0, 'body'))
-		commands.append(Command('JMP', 'instruction'))
-		commands.append(Command(0, 'after'))
-		return commands
+		return self.comparison(node.left, node.right, (('JZ', self.body), ('JMP', self.after)), True)
 	
 	def visit_GreaterThanEqual(self, node):
-		left_setup = []
-		left_commands = []
-		right_setup = []
-		right_commands = []
-		operations = []
-		if type(node.left).__name__ == 'Num':
-			immediate = True;
-			value = self.visit(node.left)
-			left_commands.append(Command(value, 'data'))
-		elif type(node.left).__name__ == 'Var':
-			immediate = False
-			left_address = self.visit(node.left)
-			left_commands.extend(left_address)
-		else:
-			immediate = False
-			if not self.symtab.is_declared('compare_left'):
-				self.symtab.declare('compare_left')
-			left_address = self.symtab.lookup_address('compare_left')
-			left_setup = self.visit(node.left)
-			#do I really need to do this? Perhaps it will be caught by the optimizer
-			left_setup.append(Command('STO', 'instruction'))
-			left_setup.append(Command(left_address, 'address'))
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.append(Command(left_address, 'variable'))
-
-		if type(node.right).__name__ == 'Num':
-			value = self.visit(node.right)
-			right_commands = [Command('LDI', 'instruction')]
-			right_commands.append(Command(value, 'data'))
-		elif type(node.right).__name__ == 'Var':
-			right_address = self.visit(node.right)
-			right_commands.append(Command('LDA', 'instruction'))
-			right_commands.extend(right_address)
-		else:
-			right_setup = self.visit(node.right)
-			if not self.symtab.is_declared('compare_right'):
-				self.symtab.declare('compare_right')
-			right_address = self.symtab.lookup_address('compare_right')
-			right_setup.append(Command('STO', 'instruction'))
-			right_setup.append(Command(right_address, 'address'))
-			right_commands.append(Command(right_address, 'address'))
-		
-		if immediate:
-			operations.append(Command('SBI', 'instruction'))
-		else:
-			operations.append(Command('SUB', 'instruction'))
-		
-		commands = right_setup
-		commands.extend(left_setup)
-		commands.extend(right_commands)
-		commands.extend(operations)
-		commands.extend(left_commands)
-		commands.append(Command('JZ', 'instruction'))
-		length = len(commands)
-		commands.append(Command(length + 3, 'body'))
-		commands.append(Command('JC', 'instruction'))
-		commands.append(Command(0, 'after'))
-		commands.append(Command('JMP', 'instruction'))
-		commands.append(Command(0, 'body'))
-		return commands
+		return self.comparison(node.right, node.left, (('JZ', self.body), ('JC', self.after), ('JMP', self.body)), reverse=True)
 	
 	def visit_LessThanEqual(self, node):
-		left_setup = []
-		left_commands = []
-		right_setup = []
-		right_commands = []
-		operations = []
-		if type(node.left).__name__ == 'Num':
-			value = self.visit(node.left)
-			left_commands = [Command('LDI', 'instruction')]
-			left_commands.append(Command(value, 'data'))
-		elif type(node.left).__name__ == 'Var':
-			immediate = False
-			left_address = self.visit(node.left)
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.extend(left_address)
-		else:
-			if not self.symtab.is_declared('compare_left'):
-				self.symtab.declare('compare_left')
-			left_address = self.symtab.lookup_address('compare_left')
-			left_setup = self.visit(node.left)
-			#do I really need to do this? Perhaps it will be caught by the optimizer
-			left_setup.append(Command('STO', 'instruction'))
-			left_setup.append(Command(left_address, 'address'))
-			left_commands.append(Command('LDA', 'instruction'))
-			left_commands.append(Command(left_address, 'variable'))
-
-		if type(node.right).__name__ == 'Num':
-			immediate = True;
-			value = self.visit(node.right)
-			right_commands.append(Command(value, 'data'))
-		elif type(node.right).__name__ == 'Var':
-			immediate = False
-			right_address = self.visit(node.right)
-			right_commands.extend(right_address)
-		else:
-			immediate = False
-			right_setup = self.visit(node.right)
-			if not self.symtab.is_declared('compare_right'):
-				self.symtab.declare('compare_right')
-			right_address = self.symtab.lookup_address('compare_right')
-			right_setup.append(Command('STO', 'instruction'))
-			right_setup.append(Command(right_address, 'address'))
-			right_commands.append(Command(right_address, 'address'))
-		
-		if immediate:
-			operations.append(Command('SBI', 'instruction'))
-		else:
-			operations.append(Command('SUB', 'instruction'))
-		
-		commands = left_setup
-		commands.extend(right_setup)
-		commands.extend(left_commands)
-		commands.extend(operations)
-		commands.extend(right_commands)
-		commands.append(Command('JZ', 'instruction'))
-		commands.append(Command(0, 'body'))
-		commands.append(Command('JC', 'instruction'))
-		commands.append(Command(0, 'after'))
-		commands.append(Command('JMP', 'instruction'))
-		commands.append(Command(0, 'body'))
-		return commands
+		return self.comparison(node.left, node.right, (('JZ', self.body), ('JC', self.after), ('JMP', self.body)))
 	
 	def visit_CompoundCondition(self, node):
-		left_commands =  self.visit(node.left)
-		right_commands = self.visit(node.right)
-		left_length = len(left_commands)
-		right_length = len(right_commands)
-		commands = []
+		right = Label()
 		if node.op.value == '&&':
-			#process and condition
-			for command in left_commands:
-				if command.data_type == 'body':
-					command.data = left_length
-					command.data_type = 'skip_once'
-
-			for command in right_commands:
-				if command.data_type == 'body':
-					command.data = left_length + right_length
-					command.data_type = 'skip_once'
-
-			commands.extend(left_commands)
-			commands.extend(right_commands)
+			#the left side goes on to the right one when it is true
+			left_commands = yield self.condition(node.left, right, self.after)
 		else:
-			#process or condition
-			for command in left_commands:
-				if command.data_type == 'body':
-					command.data += left_length + right_length
-					command.data_type = 'skip_once'
-				elif command.data_type == 'after':
-					command.data = left_length
-					command.data_type = 'skip_once'
-
-			for command in right_commands:
-				if command.data_type == 'body':
-					command.data += left_length + right_length
-					command.data_type = 'skip_once'
-
-			commands.extend(left_commands)
-			commands.extend(right_commands)
-
+			#the left side goes on to the right one when it is false,
+			#and can fall through when it is true, so that jumps to the body
+			left_commands = yield self.condition(node.left, self.body, right)
+			left_commands.append(Command('JMP', 'instruction'))
+			left_commands.append(Command(self.body, 'dynamic'))
+		commands = left_commands
+		commands.append(Command(right, 'label'))
+		commands.extend((yield node.right))
 		return commands
 	
 	def visit_If(self, node):
-		commands = self.visit(node.condition)
-		length = len(commands)
-		commands.extend(self.visit(node.body))
-		full_length = len(commands)
-		for command in commands:
-			if command.data_type == 'skip_once':
-				command.data_type = 'dynamic'
-			elif command.data_type == 'dynamic':
-				command.data += length
-			elif command.data_type == 'body':
-				command.data = length
-				command.data_type = 'dynamic'
-			elif command.data_type == 'after':
-				command.data = full_length
-				command.data_type = 'dynamic'
+		body = Label()
+		after = Label()
+		commands = yield self.condition(node.condition, body, after)
+		commands.append(Command(body, 'label'))
+		commands.append((yield self.statement(node.body)))
+		commands.append(Command(after, 'label'))
 		return commands
 	
 	def visit_UnaryOp(self, node):
 		commands = []
 		operations = []
-		var_address = self.visit(node.identifier)
+		var_address = yield node.identifier
 		if node.op.value == '++':
 			operations.append(Command('ADI', 'instruction'))
 		else:
@@ -669,15 +570,18 @@ class CodeGenerator(NodeVisitor):
 		else:
 			#variable indexed array
 			commands.extend(var_address)
-			length = len(var_address) + 2
+			loaded = Label()
+			stored = Label()
 			commands.append(Command('STO', 'instruction'))
-			commands.append(Command(length + 3, 'dynamic'))
+			commands.append(Command(loaded, 'dynamic'))
 			commands.append(Command('STO', 'instruction'))
-			commands.append(Command(length + 7, 'dynamic'))
+			commands.append(Command(stored, 'dynamic'))
 			commands.append(Command('LDA', 'instruction'))
+			commands.append(Command(loaded, 'label'))
 			commands.append(Command(0, 'dynamically filled'))
 			commands.extend(operations)
 			commands.append(Command('STO', 'instruction'))
+			commands.append(Command(stored, 'label'))
 			commands.append(Command('0', 'dynamically filled'))
 
 		return commands
\ No newline at end of file
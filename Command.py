@@ -1,4 +1,43 @@
+#words following each instruction as its operand
+OPERANDS = {
+	'LDI': 1, 'LDA': 1, 'STO': 1,
+	'ADD': 1, 'ADI': 1, 'SUB': 1, 'SBI': 1,
+	'JC': 1, 'JZ': 1, 'JMP': 1,
+	'OUT': 0, 'HLT': 0
+}
+
+#instruction words in memory, numbered like the SAP-1 with ADI and SBI in its gaps
+OPCODES = {
+	'LDA': 1, 'ADD': 2, 'SUB': 3, 'STO': 4,
+	'LDI': 5, 'JMP': 6, 'JC': 7, 'JZ': 8,
+	'ADI': 9, 'SBI': 10,
+	'OUT': 14, 'HLT': 15
+}
+
+#clock cycles per instruction: two to fetch each of its words, then its own steps
+#(a memory operand takes one to address it, an add or subtract one more for the B register)
+CYCLES = {
+	'LDI': 5, 'LDA': 6, 'STO': 6,
+	'ADD': 7, 'ADI': 6, 'SUB': 7, 'SBI': 6,
+	'JC': 5, 'JZ': 5, 'JMP': 5,
+	'OUT': 3, 'HLT': 3
+}
+
 class Command:
-	def __init__(self, data, data_type):
+	#loop marks the JMP closing a while loop, which jumps back to where the loop starts
+	loop = False
+
+	#source is where a word came from: the line of the statement it was generated for,
+	#the name of the runtime routine it is part of, or None
+	def __init__(self, data, data_type, source=None):
 		self.data = data
-		self.data_type = data_type
\ No newline at end of file
+		self.data_type = data_type
+		self.source = source
+
+class Label:
+	#a place in the generated code, given an address when the code is laid out
+	#Command(label, 'label') marks the place and takes no word, Command(label, 'dynamic') is its address
+	__slots__ = ('address',)
+
+	def __init__(self):
+		self.address = None
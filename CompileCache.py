@@ -0,0 +1,147 @@
+from Command import Command
+import Compiler
+import collections
+import hashlib
+import json
+import os
+
+#what the cache may hold before the least recently used entries go
+DEFAULT_LIMIT = 64 * 1024 * 1024
+#the part of the limit evicting goes down to, so the next eviction is that many bytes of puts away
+EVICTED = 0.9
+SUFFIX = '.json'
+#programs a MemoryCache holds
+DEFAULT_ENTRIES = 4096
+
+class CompileCache:
+	#compiled programs in a directory, one file per source text, options and compiler version,
+	#holding the Command list, the optimization report and the memory map
+	#
+	#several processes can share the directory: an entry is written under a name of its own and
+	#renamed into place, so a reader sees all of it or nothing. Reading an entry touches it, and once
+	#the entries are over limit bytes the least recently used go, files another process removed first are skipped.
+	#The directory is only looked through when the bytes found there last time and those put since pass
+	#the limit, what other processes put since is not counted until then
+	def __init__(self, directory, limit=DEFAULT_LIMIT):
+		self.directory = directory
+		self.limit = limit
+		self.version = Compiler.version()
+		self.hits = 0
+		self.misses = 0
+		#bytes in the directory, None before it has been looked through
+		self.size = None
+		os.makedirs(directory, exist_ok=True)
+
+	def path(self, text, options):
+		digest = hashlib.sha256()
+		digest.update('{version} {options}\n'.format(version=self.version, options=options).encode())
+		digest.update(text.encode())
+		return os.path.join(self.directory, digest.hexdigest() + SUFFIX)
+
+	def get(self, text, options):
+		#(commands, messages, memory map), None when the program is not in the cache
+		path = self.path(text, options)
+		try:
+			with open(path, 'r') as f:
+				entry = json.load(f)
+		except (OSError, ValueError):
+			self.misses += 1
+			return None
+		try:
+			os.utime(path)
+		except OSError:
+			pass
+		self.hits += 1
+		commands = []
+		for data, data_type, source, loop in entry['commands']:
+			command = Command(data, data_type, source)
+			if loop:
+				command.loop = True
+			commands.append(command)
+		return commands, entry['messages'], entry['map']
+
+	def put(self, text, options, commands, messages, memory_map):
+		path = self.path(text, options)
+		entry = {
+			'commands': [[command.data, command.data_type, command.source, command.loop] for command in commands],
+			'messages': messages,
+			'map': memory_map
+		}
+		partial = '{path}.{pid}.partial'.format(path=path, pid=os.getpid())
+		with open(partial, 'w') as f:
+			json.dump(entry, f)
+			size = f.tell()
+		os.replace(partial, path)
+		if self.size is None:
+			self.evict(self.limit)
+		else:
+			self.size += size
+		if self.size > self.limit:
+			self.evict(int(self.limit * EVICTED))
+
+	def evict(self, limit):
+		#removes the least recently used entries until the rest are at most limit bytes
+		entries = []
+		total = 0
+		for name in os.listdir(self.directory):
+			if not name.endswith(SUFFIX):
+				continue
+			try:
+				status = os.stat(os.path.join(self.directory, name))
+			except OSError:
+				continue
+			entries.append((status.st_mtime, status.st_size, name))
+			total += status.st_size
+		entries.sort()
+		for modified, size, name in entries:
+			if total <= limit:
+				break
+			try:
+				os.remove(os.path.join(self.directory, name))
+			except OSError:
+				pass
+			total -= size
+		self.size = total
+
+	def summary(self):
+		return '{hits} hits, {misses} misses'.format(hits=self.hits, misses=self.misses)
+
+class MemoryCache:
+	#compiled programs kept in memory, the limit most recently used, for a process compiling many
+	#programs such as the compile server. Gets and puts like a CompileCache, and with one as backing
+	#what is not in memory is looked for on disk and what is compiled is kept in both
+	def __init__(self, limit=DEFAULT_ENTRIES, backing=None):
+		self.limit = limit
+		self.backing = backing
+		self.entries = collections.OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, text, options):
+		key = (text, options)
+		entry = self.entries.get(key)
+		if entry is not None:
+			self.entries.move_to_end(key)
+			self.hits += 1
+			return entry
+		self.misses += 1
+		if self.backing is None:
+			return None
+		entry = self.backing.get(text, options)
+		if entry is not None:
+			self.keep(key, entry)
+		return entry
+
+	def put(self, text, options, commands, messages, memory_map):
+		self.keep((text, options), (commands, messages, memory_map))
+		if self.backing is not None:
+			self.backing.put(text, options, commands, messages, memory_map)
+
+	def keep(self, key, entry):
+		self.entries[key] = entry
+		self.entries.move_to_end(key)
+		while len(self.entries) > self.limit:
+			self.entries.popitem(last=False)
+
+	def summary(self):
+		return '{hits} hits, {misses} misses, {entries} programs in memory'.format(hits=self.hits, misses=self.misses, entries=len(self.entries))
@@ -0,0 +1,72 @@
+from Compiler import Compiler
+import asyncio
+import json
+import os
+import signal
+import stat
+
+#the longest request line, a source text with its options
+REQUEST_LIMIT = 16 * 1024 * 1024
+
+class CompileServer:
+	#compiles programs for clients on a Unix domain socket, so the compiler is imported once instead
+	#of by every compile. A request is a line of JSON, {"source": text, "optimize": bool}, and its
+	#response a line of JSON: {"output": the words of a.txt, "messages": the -O report, "map": the memory map},
+	#or {"error": message} for a program that does not compile. A client can send any number of requests
+	#
+	#every client shares one cache of compiled programs, the most recently used in memory and, with
+	#backing, the rest on disk. Compiling runs on the event loop, one program at a time, clients waiting
+	#meanwhile: a compile takes milliseconds, and threads would not run two at once
+	def __init__(self, path, cache):
+		self.path = path
+		self.cache = cache
+		self.compilers = {optimize: Compiler(optimize, cache) for optimize in (False, True)}
+		self.requests = 0
+		self.errors = 0
+
+	def respond(self, line):
+		try:
+			request = json.loads(line)
+			compiler = self.compilers[bool(request.get('optimize', False))]
+			commands, messages, memory_map = compiler.compile(request['source'])
+		except Exception as e:
+			self.errors += 1
+			return {'error': str(e)}
+		return {'output': [command.data for command in commands], 'messages': messages, 'map': memory_map}
+
+	async def handle(self, reader, writer):
+		try:
+			while True:
+				try:
+					line = await reader.readline()
+				except ValueError:
+					writer.write(json.dumps({'error': 'Request longer than {limit} bytes'.format(limit=REQUEST_LIMIT)}).encode() + b'\n')
+					break
+				if not line:
+					break
+				self.requests += 1
+				writer.write(json.dumps(self.respond(line)).encode() + b'\n')
+				await writer.drain()
+		except ConnectionError:
+			pass
+		finally:
+			writer.close()
+
+	async def serve(self):
+		#until SIGINT or SIGTERM, removing the socket after
+		if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+			os.remove(self.path)
+		stop = asyncio.Event()
+		loop = asyncio.get_running_loop()
+		for signum in (signal.SIGINT, signal.SIGTERM):
+			loop.add_signal_handler(signum, stop.set)
+		server = await asyncio.start_unix_server(self.handle, path=self.path, limit=REQUEST_LIMIT)
+		try:
+			async with server:
+				await stop.wait()
+		finally:
+			os.remove(self.path)
+
+	def summary(self):
+		return '{requests} requests, {errors} did not compile, cache: {cache}'.format(
+			requests=self.requests, errors=self.errors, cache=self.cache.summary())
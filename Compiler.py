@@ -0,0 +1,130 @@
+from FastLexer import FastLexer
+from IterativeParser import IterativeParser
+from CodeGenerator import CodeGenerator, WORD_BITS
+from Optimizer import Optimizer
+from Peephole import Peephole
+from MemoryPlanner import MemoryPlanner
+import contextlib
+import hashlib
+import os
+import time
+
+#the modules whose code decides what a program compiles to, any change to them is a new compiler version
+SOURCES = (
+	'Token.py', 'Lexer.py', 'FastLexer.py', 'AST.py', 'Parser.py', 'IterativeParser.py', 'NodeVisitor.py',
+	'Optimizer.py', 'SymbolTable.py', 'Var.py', 'Command.py', 'Runtime.py', 'CodeGenerator.py',
+	'Peephole.py', 'MemoryPlanner.py', 'Compiler.py'
+)
+
+def version():
+	#a hash of the compiler's own source files
+	digest = hashlib.sha256()
+	directory = os.path.dirname(os.path.abspath(__file__))
+	for name in SOURCES:
+		with open(os.path.join(directory, name), 'rb') as f:
+			digest.update(name.encode() + b'\0' + f.read())
+	return digest.hexdigest()
+
+class Parsed:
+	#stands in for a parser when the tree is already parsed
+	def __init__(self, root):
+		self.root = root
+
+	def parse(self):
+		return self.root
+
+class Compiler:
+	#compile.py's work on a source text: parse, optimize with optimize, generate, remove redundant
+	#instructions with optimize and plan memory. compile returns the Command list, the lines
+	#reporting what the optimizations did and the memory map. Without report there are no such lines,
+	#saving the second, unoptimized code generation they compare against
+	#
+	#with a CompileCache, a text compiled before with the same options and compiler version
+	#comes from the cache instead. Programs that fail to compile are not kept
+	#
+	#timings adds up the seconds spent in each stage over every compile. With a Profiler the
+	#stages are its phases, with lexing and laying out code as phases of their own inside parsing
+	#and generating, and the visits of the optimizer and code generator are recorded
+	def __init__(self, optimize=False, cache=None, profiler=None, report=True):
+		self.optimize = optimize
+		self.cache = cache
+		self.profiler = profiler
+		self.reported = report
+		self.timings = {}
+
+	@contextlib.contextmanager
+	def stage(self, name):
+		#times what runs inside as the stage name
+		start = time.perf_counter()
+		try:
+			if self.profiler is None:
+				yield
+			else:
+				with self.profiler.phase(name):
+					yield
+		finally:
+			self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - start
+
+	def key(self):
+		#what besides the text decides the output
+		return 'optimize={optimize} report={report}'.format(optimize=self.optimize, report=self.reported)
+
+	def compile(self, text):
+		if self.cache is not None:
+			with self.stage('cache'):
+				cached = self.cache.get(text, self.key())
+			if cached is not None:
+				return cached
+		commands, messages, memory_map = self.build(text)
+		if self.cache is not None:
+			with self.stage('cache'):
+				self.cache.put(text, self.key(), commands, messages, memory_map)
+		return commands, messages, memory_map
+
+	def build(self, text):
+		with self.stage('parse'):
+			lexer = FastLexer(text)
+			if self.profiler is not None:
+				lexer.get_next_token = self.profiler.timed('lex', lexer.get_next_token)
+			root = IterativeParser(lexer).parse()
+		optimizer = None
+		optimized = root
+		if self.optimize:
+			with self.stage('optimize'):
+				optimizer = Optimizer(bits=WORD_BITS, static_declarations=True)
+				if self.profiler is not None:
+					self.profiler.instrument(optimizer)
+				optimized = optimizer.optimize(root)
+		with self.stage('generate'):
+			generator = CodeGenerator(Parsed(optimized))
+			if self.profiler is not None:
+				self.profiler.instrument(generator)
+				generator.layout = self.profiler.timed('layout', generator.layout)
+			commands = generator.generate()
+		peephole = None
+		if self.optimize:
+			with self.stage('peephole'):
+				peephole = Peephole(generator.spills())
+				commands = peephole.optimize(commands)
+		with self.stage('plan'):
+			planner = MemoryPlanner(generator.symtab, share=self.optimize)
+			commands = planner.plan(commands)
+		messages = []
+		if optimizer is not None and self.reported:
+			with self.stage('report'):
+				messages = self.report(root, commands, optimizer, peephole, planner)
+		return commands, messages, planner.memory_map()
+
+	def report(self, root, commands, optimizer, peephole, planner):
+		#the -O lines: what each optimization did and the words saved against compiling root unoptimized
+		try:
+			unoptimized = len(CodeGenerator(Parsed(root)).generate())
+			saved = '{before} -> {after} words, {saved} saved'.format(before=unoptimized, after=len(commands), saved=unoptimized - len(commands))
+		except Exception as e:
+			saved = '{after} words, does not compile unoptimized ({error})'.format(after=len(commands), error=e)
+		return [
+			'optimizer: ' + optimizer.summary(),
+			'peephole: ' + peephole.summary(),
+			'memory: ' + planner.summary(),
+			saved
+		]
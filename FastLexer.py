@@ -0,0 +1,168 @@
+from Token import Token
+from Lexer import *
+from array import array
+from itertools import accumulate, chain, repeat
+from operator import itemgetter
+import re
+import sys
+
+#each match is the whitespace and comments in front of a token, then the token itself
+#the catch-all \S keeps the engine from backtracking into a comment, \Z gives a last match for trailing whitespace.
+#Comments are only tried at a /, and the operators ending in = are one character class
+TOKEN_PATTERN = re.compile(r'''
+	(\s*(?:/(?:/[^\n]*\n?|\*[\s\S]*?(?:\*/|\Z))\s*)*)
+	([^\W\d_]\w*|\d+|[=<>!+\-/*%]=|\+\+|--|&&|\|\||\S|\Z)
+''', re.VERBOSE)
+#whitespace and comments up to the end of a window, the last comment or run of whitespace in it captured
+SKIPPED_PATTERN = re.compile(r'(?:(\s+|//[^\n]*\n?|/\*[\s\S]*?(?:\*/|\Z)))*')
+
+OPERATORS = {
+	'==': EVALOPERATOR,
+	'<=': EVALOPERATOR,
+	'>=': EVALOPERATOR,
+	'!=': EVALOPERATOR,
+	'<': EVALOPERATOR,
+	'>': EVALOPERATOR,
+	'=': ASSIGN,
+	'!': NEGATOR,
+	'++': INCREMENTOR,
+	'--': DECREMENTOR,
+	'+=': PLUSEQUALS,
+	'-=': MINUSEQUALS,
+	'/=': DIVEQUALS,
+	'*=': MULEQUALS,
+	'%=': MODEQUALS,
+	'+': PLUS,
+	'-': MINUS,
+	'/': DIV,
+	'*': MUL,
+	'%': MOD,
+	'&&': CONDITIONALCOMBINATOR,
+	'||': CONDITIONALCOMBINATOR,
+	';': SEMICOLON,
+	'[': LBRACKET,
+	']': RBRACKET,
+	'{': LBRACE,
+	'}': RBRACE,
+	'(': LPARENT,
+	')': RPARENT
+}
+
+#token text with a fixed type, reserved words included
+FIXED_TYPES = dict(OPERATORS)
+FIXED_TYPES.update(RESERVED_WORDS)
+
+#one shared string per operator and reserved word instead of one per token
+FIXED_VALUES = dict((sys.intern(text), sys.intern(text)) for text in FIXED_TYPES)
+
+class FastLexer:
+	#drop-in replacement for Lexer, tokenizes a whole window of input in one pass
+	#a string is a single window, file objects, mmaps and chunk iterables are read a chunk at a time
+	#tokens are kept as three parallel arrays and only become Token objects as the parser asks for them
+	#
+	#the arrays are filled by maps over the matches, no Python runs per token: a window's texts
+	#are classified once each, into a table from text to type and value, and its lines are
+	#a running sum of the newlines skipped before each token
+	def __init__(self, text, chunk_size=CHUNK_SIZE):
+		self.chunks = chunks(text, chunk_size)
+		self.carry = ''
+		self.line = 1
+		self.final = False
+		self.types = []
+		self.values = []
+		self.lines = array('l')
+		#get_next_token is the iterator's own __next__, per token only Token() itself runs in Python
+		self.get_next_token = chain.from_iterable(self.windows()).__next__
+
+	def error(self, message):
+		raise Exception('Error lexing input\n' + message)
+
+	def windows(self):
+		#tokens of each window in turn, then EOF forever like Lexer
+		while not self.final:
+			self.fill()
+			yield map(Token, self.types, self.values, self.lines)
+		yield repeat(Token(EOF, None, self.line))
+
+	def fill(self):
+		#replaces the arrays with the tokens of the next window
+		self.types = []
+		self.values = []
+		self.lines = array('l')
+		while not self.types and not self.final:
+			chunk = next(self.chunks, None)
+			if chunk is None:
+				self.final = True
+				self.tokenize(self.carry, True)
+			else:
+				self.tokenize(self.carry + chunk, False)
+
+	def tokenize(self, text, final):
+		line = self.line
+		matches = TOKEN_PATTERN.findall(text)
+		#the last match is whatever follows the last token, up to the end of the window
+		#when that is not empty findall adds one more empty match after it
+		skipped, value = matches.pop()
+		if matches and not matches[-1][1]:
+			skipped, value = matches.pop()
+		self.carry = skipped
+		carried_lines = 0
+		if not final and not skipped and matches:
+			#a token touching the end of the window may continue in the next chunk
+			skipped, value = matches.pop()
+			carried_lines = skipped.count('\n')
+			self.carry = value
+		elif not final:
+			self.carry = self.unfinished(skipped)
+			carried_lines = skipped.count('\n')
+		texts = list(map(itemgetter(1), matches))
+		lines = list(map(str.count, map(itemgetter(0), matches), repeat('\n')))
+		del matches
+		if lines:
+			lines[0] += line
+			lines = array('l', accumulate(lines))
+			line = lines[-1]
+		else:
+			lines = array('l')
+		types = dict(FIXED_TYPES)
+		values = dict(FIXED_VALUES)
+		unrecognized = []
+		#numbers and identifiers, each text once
+		for value in set(texts).difference(types):
+			if value[:1].isdigit():
+				types[value] = INTEGER
+				values[value] = int(value)
+			elif value[:1].isalpha():
+				types[value] = IDENTIFIER
+				values[value] = sys.intern(value)
+			else:
+				unrecognized.append(texts.index(value))
+		if unrecognized:
+			first = min(unrecognized)
+			self.error('Unrecognized character: ' + texts[first] + ' on ' + str(lines[first]))
+		self.types = list(map(types.__getitem__, texts))
+		self.values = list(map(values.__getitem__, texts))
+		self.lines = lines
+		line += carried_lines
+		if final:
+			line += self.carry.count('\n')
+		self.line = line
+
+	def unfinished(self, skipped):
+		#what the next window needs of whitespace and comments ending this one: only how a comment
+		#still open at the end began, so a long comment is not scanned again from its start every chunk
+		last = SKIPPED_PATTERN.match(skipped).group(1) or ''
+		if last.startswith('/*') and not (len(last) >= 4 and last.endswith('*/')):
+			#a * at the end may be half of the */ closing it
+			return '/**' if len(last) > 2 and last.endswith('*') else '/*'
+		elif last.startswith('//') and not last.endswith('\n'):
+			return '//'
+		return ''
+
+	def tokens(self):
+		#generator over the remaining tokens, ending with EOF
+		token = self.get_next_token()
+		while token.type != EOF:
+			yield token
+			token = self.get_next_token()
+		yield token
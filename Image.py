@@ -0,0 +1,100 @@
+from Command import OPCODES
+import sys
+
+#the bits of a word in memory
+WORD_MASK = 0xFF
+#data bytes in each Intel HEX record
+HEX_RECORD = 16
+
+def words(program):
+	#the memory image of a program as numbers: program is a Command list, or the data of each Command
+	#as the compile server sends it, mnemonics encoded by OPCODES
+	image = []
+	for word in program:
+		if not isinstance(word, (int, str)):
+			word = word.data
+		if word in OPCODES:
+			word = OPCODES[word]
+		image.append(int(word) & WORD_MASK)
+	return image
+
+def text(program):
+	#a word per line, instructions by mnemonic, the format of a.txt
+	return ''.join([str(word if isinstance(word, (int, str)) else word.data) + '\n' for word in program]).encode()
+
+def binary(program):
+	#a byte per word, as the EEPROM is written
+	return bytes(words(program))
+
+def intel_hex(program):
+	#Intel HEX data records of HEX_RECORD bytes from address 0, then the end of file record
+	image = words(program)
+	lines = []
+	for address in range(0, len(image), HEX_RECORD):
+		data = image[address:address + HEX_RECORD]
+		record = [len(data), address >> 8, address & 0xFF, 0] + data
+		checksum = -sum(record) & 0xFF
+		lines.append(':' + ''.join('{byte:02X}'.format(byte=byte) for byte in record) + '{checksum:02X}\n'.format(checksum=checksum))
+	lines.append(':00000001FF\n')
+	return ''.join(lines).encode()
+
+#each format's renderer and the extension of its files
+FORMATS = {
+	'text': (text, '.txt'),
+	'binary': (binary, '.bin'),
+	'hex': (intel_hex, '.hex')
+}
+
+def write(path, program, format='text'):
+	#the program in format to path in one write, - is standard output
+	data = FORMATS[format][0](program)
+	if path == '-':
+		sys.stdout.flush()
+		sys.stdout.buffer.write(data)
+		sys.stdout.buffer.flush()
+		return
+	with open(path, 'wb') as f:
+		f.write(data)
+
+def read_hex(data):
+	#the words of an Intel HEX image, addresses missing from it are 0
+	image = []
+	for number, line in enumerate(data.decode().splitlines(), 1):
+		line = line.strip()
+		if not line:
+			continue
+		try:
+			if not line.startswith(':'):
+				raise ValueError
+			record = bytes.fromhex(line[1:])
+		except ValueError:
+			raise Exception('Intel HEX: line {number} is not a record'.format(number=number)) from None
+		if len(record) < 5 or len(record) != record[0] + 5:
+			raise Exception('Intel HEX: line {number} has the wrong length'.format(number=number))
+		if sum(record) & 0xFF:
+			raise Exception('Intel HEX: line {number} fails its checksum'.format(number=number))
+		if record[3] == 1:
+			break
+		if record[3] != 0:
+			raise Exception('Intel HEX: line {number} is a record of type {type}, only data and end of file are used'.format(number=number, type=record[3]))
+		address = record[1] << 8 | record[2]
+		data_bytes = record[4:-1]
+		if len(image) < address + len(data_bytes):
+			image.extend([0] * (address + len(data_bytes) - len(image)))
+		image[address:address + len(data_bytes)] = data_bytes
+	return image
+
+def read(path, format=None):
+	#the words of a program written in format, by default the format its extension is for
+	if format is None:
+		format = 'text'
+		for name, (renderer, extension) in FORMATS.items():
+			if path.endswith(extension):
+				format = name
+	with open(path, 'rb') as f:
+		data = f.read()
+	if format == 'binary':
+		return list(data)
+	if format == 'hex':
+		return read_hex(data)
+	return [line for line in data.decode().splitlines() if line.strip()]
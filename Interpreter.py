@@ -1,147 +1,221 @@
 from Token import Token
 from Lexer import *
 from Parser import Parser
-from AST import AST
+from AST import AST, Num, Var
 from SymbolTable import SymbolTable
 from NodeVisitor import NodeVisitor
+from Resolver import Resolver
+from Vectorizer import Vectorizer, AVAILABLE
+import operator
 
 class Interpreter(NodeVisitor):
-	def __init__(self, parser):
+	#variables live in values by their Resolver slot: a number, the list of an array's elements,
+	#or None until the declaration runs. The symbol table only records declarations,
+	#for the errors of declaring twice and of using what was never declared
+	#
+	#with vectorize, counted loops over arrays run as NumPy operations when NumPy is installed, see Vectorizer.
+	#With a Profiler, every visit is recorded in it
+	def __init__(self, parser, optimizer=None, vectorize=True, profiler=None):
+		if profiler is not None:
+			profiler.instrument(self)
 		self.symtab = SymbolTable()
+		self.vectorizer = Vectorizer() if vectorize and AVAILABLE else None
 		self.parser = parser
 		root = self.parser.parse()
+		if optimizer is not None:
+			root = optimizer.optimize(root)
+		self.check(root)
+		self.values = [None] * Resolver().resolve(root)
 		self.visit(root)
 	
+	def leaf(self, node):
+		#value of a number or plain variable, None for anything that has to be visited
+		if node.__class__ is Num:
+			return node.value
+		elif node.__class__ is Var and node.index is None:
+			value = self.values[node.slot]
+			if value is None:
+				self.symtab.lookup(node.var_name)
+			return value
+		return None
+
+	def load(self, var, index):
+		value = self.values[var.slot]
+		if value is None:
+			self.symtab.lookup(var.var_name)
+		if index is not None:
+			return value[index]
+		return value
+
+	def store(self, var, value, index):
+		if self.values[var.slot] is None:
+			self.symtab.assign(var.var_name, value, index)
+		if index is not None:
+			self.values[var.slot][index] = value
+		else:
+			self.values[var.slot] = value
+
+	def operation(self, node, function):
+		#left op right without a generator when both sides are leaves,
+		#the right leaf is only read early when nothing on the left can change it
+		left = self.leaf(node.left)
+		if left is not None:
+			right = self.leaf(node.right)
+			if right is not None:
+				return function(left, right)
+		return self.nested_operation(node, function, left)
+
+	def nested_operation(self, node, function, left):
+		if left is None:
+			left = yield node.left
+		right = yield node.right
+		return function(left, right)
+
 	def visit_BinOp(self, node):
 		if node.op.type == PLUS:
-			return self.visit(node.left) + self.visit(node.right)
+			return self.operation(node, operator.add)
 		elif node.op.type == MINUS:
-			return self.visit(node.left) - self.visit(node.right)
+			return self.operation(node, operator.sub)
 		elif node.op.type == MUL:
-			return self.visit(node.left) * self.visit(node.right)
+			return self.operation(node, operator.mul)
 		elif node.op.type == DIV:
-			return self.visit(node.left) // self.visit(node.right)
+			return self.operation(node, operator.floordiv)
 		elif node.op.type == MOD:
-			return self.visit(node.left) % self.visit(node.right)
+			return self.operation(node, operator.mod)
 		
 	def visit_Num(self, node):
 		return node.value
 
 	def visit_UnaryOp(self, node):
+		if node.identifier.index is not None:
+			return self.step_element(node)
+		return self.step(node, None)
+
+	def step(self, node, index):
 		op = node.op.type
-		var_name = node.identifier.var_name
-		value = self.visit(node.identifier)
+		value = self.load(node.identifier, index)
 		if op == INCREMENTOR:
 			 value += 1
 		elif op == DECREMENTOR:
 			value -= 1
-		self.symtab.assign(var_name, value)
+		self.store(node.identifier, value, index)
 		return value
 
+	def step_element(self, node):
+		#only an array element has an index to visit first
+		return self.step(node, (yield node.identifier.index))
+
 	def visit_Compound(self, node):
 		for child in node.children:
-			self.visit(child)
+			yield child
 	
 	def visit_Assign(self, node):
-		var_name = node.left.var_name
-		if node.left.index is not None:
-			index = self.visit(node.left.index)
-		else:
-			index = None
-		value = self.visit(node.right)
-		self.symtab.assign(var_name, value, index)
+		index = yield node.left.index
+		value = yield node.right
+		self.store(node.left, value, index)
 
 	def visit_Declarative(self, node):
 		if node.var.index is not None:
-			self.symtab.declare_array(node.var.var_name, self.visit(node.var.index))
+			length = yield node.var.index
+			#the symbol table only needs the name, not an object for every element
+			self.symtab.declare(node.var.var_name)
+			self.values[node.var.slot] = [0] * length
 		else:
 			self.symtab.declare(node.var.var_name)
+			self.values[node.var.slot] = 0
 			if node.assigned is not None:
-				self.visit(node.assigned)
+				yield node.assigned
 	
 	def visit_Var(self, node):
 		if node.index is not None:
-			return self.symtab.lookup(node.var_name, self.visit(node.index)).value
-		else:
-			return self.symtab.lookup(node.var_name).value
+			return self.element(node)
+		value = self.values[node.slot]
+		if value is None:
+			self.symtab.lookup(node.var_name)
+		return value
+
+	def element(self, node):
+		return self.load(node, (yield node.index))
 
 	def visit_Output(self, node):
-		value = self.visit(node.expr)
+		value = yield node.expr
 		print(value)
 	
 	def visit_PlusEquals(self, node):
-		var_name = node.left.var_name
-		value = self.symtab.lookup(var_name) + self.visit(node.right)
-		self.symtab.assign(var_name, value)
+		index = yield node.left.index
+		value = self.load(node.left, index) + (yield node.right)
+		self.store(node.left, value, index)
 	
 	def visit_MinusEquals(self, node):
-		var_name = node.left.var_name
-		value = self.symtab.lookup(var_name) - self.visit(node.right)
-		self.symtab.assign(var_name, value)
+		index = yield node.left.index
+		value = self.load(node.left, index) - (yield node.right)
+		self.store(node.left, value, index)
 
 	def visit_DivEquals(self, node):
-		var_name = node.left.var_name
-		value = self.symtab.lookup(var_name) // self.visit(node.right)
-		self.symtab.assign(var_name, value)
+		index = yield node.left.index
+		value = self.load(node.left, index) // (yield node.right)
+		self.store(node.left, value, index)
 	
 	def visit_MulEquals(self, node):
-		var_name = node.left.var_name
-		value = self.symtab.lookup(var_name) * self.visit(node.right)
-		self.symtab.assign(var_name, value)
+		index = yield node.left.index
+		value = self.load(node.left, index) * (yield node.right)
+		self.store(node.left, value, index)
 
 	def visit_ModEquals(self, node):
-		var_name = node.left.var_name
-		value = self.symtab.lookup(var_name) % self.visit(node.right)
-		self.symtab.assign(var_name, value)
+		index = yield node.left.index
+		value = self.load(node.left, index) % (yield node.right)
+		self.store(node.left, value, index)
 	
 	def visit_Loop(self, node):
-		while self.visit(node.condition):
-			self.visit(node.body)
+		if self.vectorizer is not None and self.vectorizer.run(node, self.values):
+			return
+		while (yield node.condition):
+			yield node.body
 	
 	def visit_Body(self, node):
 		for c in node.children:
-			self.visit(c)
+			yield c
 	
 	def visit_LessThan(self, node):
-		return self.visit(node.left) < self.visit(node.right)
+		return self.operation(node, operator.lt)
 	
 	def visit_LessThanEqual(self, node):
-		return self.visit(node.left) <= self.visit(node.right)
+		return self.operation(node, operator.le)
 
 	def visit_GreaterThan(self, node):
-		return self.visit(node.left) > self.visit(node.right)
+		return self.operation(node, operator.gt)
 	
 	def visit_GreaterThanEqual(self, node):
-		return self.visit(node.left) >= self.visit(node.right)
+		return self.operation(node, operator.ge)
 	
 	def visit_EqualTo(self, node):
-		return self.visit(node.left) == self.visit(node.right)
+		return self.operation(node, operator.eq)
 	
 	def visit_NotEqualTo(self, node):
-		return self.visit(node.left) != self.visit(node.right)
+		return self.operation(node, operator.ne)
 	
 	def visit_If(self, node):
-		if self.visit(node.condition):
-			self.visit(node.body)
+		if (yield node.condition):
+			yield node.body
 		elif node.else_node is not None:
-			self.visit(node.else_node)
+			yield node.else_node
 	
 	def visit_CompoundCondition(self, node):
-		left = self.visit(node.left)
+		left = yield node.left
 		if left:
 			if node.op.value == '||':
 				return True	#ignore right side because True or X will always be True
 			else:
-				return self.visit(node.right)
+				return (yield node.right)
 		else:
 			if node.op.value == '&&':
 				return False	#ignore right side because False and X will always be False
 			else:
-				return self.visit(node.right)
+				return (yield node.right)
 	
 	def visit_Negator(self, node):
-		right = self.visit(node.right)
+		right = yield node.right
 		return not right
 	
 	def visit_Else(self, node):
-		self.visit(node.after)
\ No newline at end of file
+		yield node.after
\ No newline at end of file
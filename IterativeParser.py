@@ -0,0 +1,203 @@
+from Token import Token
+from Lexer import *
+from Parser import Parser
+from AST import *
+
+class IterativeParser(Parser):
+	#builds the same tree as Parser, but nesting lives on explicit stacks instead of the Python call stack
+	#so deeply nested expressions, conditions, blocks and else if ladders cannot hit the recursion limit
+	def expression(self):
+		#expression     : term ((PLUS|MINUS)term)*
+		#term           : factor ((MUL|DIV|MOD) factor)*
+		#factor         : (LPARENT expression RPARENT|INTEGER|IDENTIFIER|incrementor|decrementor)
+		#a parenthesis or indexer saves the enclosing expression's locals on the stack and starts a new one
+		stack = []
+		closer = name = unary = None
+		expr = expr_op = term = term_op = None
+		while True:
+			token = self.current_token
+			if token.type == LPARENT:
+				self.eat(LPARENT)
+				stack.append((closer, name, unary, expr, expr_op, term, term_op))
+				closer = RPARENT
+				expr = expr_op = term = term_op = None
+				continue
+			elif token.type == INTEGER:
+				self.eat(INTEGER)
+				node = Num(token)
+			elif token.type in (IDENTIFIER, INCREMENTOR, DECREMENTOR):
+				op = None
+				if token.type != IDENTIFIER:
+					op = token
+					self.eat(token.type)
+					token = self.current_token
+				self.eat(IDENTIFIER)
+				if self.current_token.type == LBRACKET:
+					self.eat(LBRACKET)
+					stack.append((closer, name, unary, expr, expr_op, term, term_op))
+					closer = RBRACKET
+					name = token
+					unary = op
+					expr = expr_op = term = term_op = None
+					continue
+				node = Var(token, None)
+				if op is not None:
+					node = UnaryOp(op, node)
+			else:
+				self.error(token)
+
+			#node is a finished factor, see what follows it
+			while True:
+				if term_op is not None:
+					node = BinOp(left=term, op=term_op, right=node)
+					term_op = None
+				token = self.current_token
+				if token.type in (MUL, DIV, MOD):
+					self.eat(token.type)
+					term = node
+					term_op = token
+					break
+				if expr_op is not None:
+					node = BinOp(left=expr, op=expr_op, right=node)
+					expr_op = None
+				if token.type in (PLUS, MINUS):
+					self.eat(token.type)
+					expr = node
+					expr_op = token
+					break
+				if closer is None:
+					return node
+				self.eat(closer)
+				if closer == RBRACKET:
+					node = Var(name, node)
+					if unary is not None:
+						node = UnaryOp(unary, node)
+				closer, name, unary, expr, expr_op, term, term_op = stack.pop()
+
+	def comparison(self):
+		#expression (evaloperator expression)?, a bare expression is compared against 0
+		left = self.expression()
+		if self.current_token.type == RPARENT or self.current_token.type == CONDITIONALCOMBINATOR:
+			op = Token(EVALOPERATOR, '!=', self.current_token.line_number)
+			right = Num(Token(INTEGER, 0, self.current_token.line_number))
+			return NotEqualTo(left, op, right)
+		op = self.evaloperator()
+		right = self.expression()
+		if op.value == '<':
+			return LessThan(left, op, right)
+		elif op.value == '<=':
+			return LessThanEqual(left, op, right)
+		elif op.value == '>':
+			return GreaterThan(left, op, right)
+		elif op.value == '>=':
+			return GreaterThanEqual(left, op, right)
+		elif op.value == '==':
+			return EqualTo(left, op, right)
+		elif op.value == '!=':
+			return NotEqualTo(left, op, right)
+		self.error(self.current_token)
+
+	def conditionalexpression(self):
+		#conditionalexpression: conditionalterm (OR conditionalterm)+
+		#conditionalterm      : conditionalfactor (AND conditionalfactor)+
+		#conditionalfactor    : NEGATOR conditionalexpression | LPARENT conditionalexpression RPARENT | expression (evaloperator expression)?
+		#like the recursive version each level takes at most one && and one ||
+		stack = []
+		closer = negator = None
+		or_left = or_op = and_left = and_op = None
+		while True:
+			token = self.current_token
+			if token.type == NEGATOR or token.type == LPARENT:
+				self.eat(token.type)
+				stack.append((closer, negator, or_left, or_op, and_left, and_op))
+				closer = RPARENT if token.type == LPARENT else NEGATOR
+				negator = token
+				or_left = or_op = and_left = and_op = None
+				continue
+			node = self.comparison()
+
+			#node is a finished conditionalfactor, see what follows it
+			while True:
+				token = self.current_token
+				if and_op is not None:
+					node = CompoundCondition(and_left, and_op, node)
+					and_op = None
+				elif token.type == CONDITIONALCOMBINATOR and token.value == '&&':
+					self.eat(CONDITIONALCOMBINATOR)
+					and_left = node
+					and_op = token
+					break
+				if or_op is not None:
+					node = CompoundCondition(or_left, or_op, node)
+					or_op = None
+				elif token.type == CONDITIONALCOMBINATOR and token.value == '||':
+					self.eat(CONDITIONALCOMBINATOR)
+					or_left = node
+					or_op = token
+					break
+				if closer is None:
+					return node
+				elif closer == RPARENT:
+					self.eat(RPARENT)
+				else:
+					node = Negator(negator, node)
+				closer, negator, or_left, or_op, and_left, and_op = stack.pop()
+
+	def statement(self):
+		#statement      : (declarative|assignment|loop|if|output|INCREMENTOR SEMICOLON|DECREMENTOR SEMICOLON)
+		#body           : (LBRACE statement(statement)* RBRACE | statement )
+		#loops, ifs, elses and blocks waiting for their body are kept on a stack of lists
+		pending = []
+		body = False
+		while True:
+			node = None
+			token = self.current_token
+			if body and token.type == LBRACE:
+				self.eat(LBRACE)
+				node = Compound()
+				if self.current_token.type != RBRACE:
+					pending.append(['block', node])
+					body = False
+					continue
+				self.eat(RBRACE)
+			elif token.type == LOOP or token.type == IF:
+				self.eat(token.type)
+				self.eat(LPARENT)
+				condition = self.conditionalexpression()
+				self.eat(RPARENT)
+				pending.append(['loop' if token.type == LOOP else 'if', token, condition])
+				body = True
+				continue
+			elif token.type in (DECLARE, IDENTIFIER, OUTPUT, INCREMENTOR, DECREMENTOR):
+				node = Parser.statement(self)
+			else:
+				self.error(token)
+
+			#a finished statement, handed to whatever was waiting for it
+			while pending:
+				frame = pending[-1]
+				if frame[0] == 'block':
+					frame[1].children.append(node)
+					if self.current_token.type != RBRACE:
+						node = None
+						break
+					self.eat(RBRACE)
+					node = frame[1]
+				elif frame[0] == 'loop':
+					node = Loop(frame[1], frame[2], node)
+				elif frame[0] == 'if':
+					if self.current_token.type == ELSE:
+						#else           : ELSE (if|body)
+						frame[0] = 'else'
+						frame.append(node)
+						frame.append(self.current_token)
+						self.eat(ELSE)
+						node = None
+						break
+					node = If(frame[1], frame[2], node, None)
+				else:
+					node = If(frame[1], frame[2], frame[3], Else(frame[4], node))
+				pending.pop()
+			if node is not None:
+				return node
+			body = pending[-1][0] != 'block'
@@ -1,4 +1,6 @@
 from Token import Token
+import codecs
+import sys
 INTEGER = 'INTEGER'
 PLUS = 'PLUS'
 MINUS = 'MINUS'
@@ -39,11 +41,39 @@ RESERVED_WORDS = {
 	'output': OUTPUT
 }
 
+CHUNK_SIZE = 1 << 16
+
+def chunks(source, chunk_size=CHUNK_SIZE):
+	#everything a lexer accepts, as an iterator of non-empty strings:
+	#a string, a text or binary file object, a memory-mapped file or bytes, or any iterable of str/bytes pieces
+	if isinstance(source, str):
+		if source:
+			yield source
+		return
+	if hasattr(source, 'read'):
+		pieces = iter(lambda: source.read(chunk_size), source.read(0))
+	elif hasattr(source, '__getitem__') and not isinstance(source, (list, tuple)):
+		pieces = (source[start:start + chunk_size] for start in range(0, len(source), chunk_size))
+	else:
+		pieces = source
+	#bytes are decoded incrementally so a character split between two pieces survives
+	decoder = codecs.getincrementaldecoder('utf-8')()
+	for piece in pieces:
+		if not isinstance(piece, str):
+			piece = decoder.decode(piece)
+		if piece:
+			yield piece
+	piece = decoder.decode(b'', True)
+	if piece:
+		yield piece
+
 class Lexer:
-	def __init__(self, text):
-		self.text = text
+	#text is a string or anything chunks() accepts, only one chunk is held at a time
+	def __init__(self, text, chunk_size=CHUNK_SIZE):
+		self.chunks = chunks(text, chunk_size)
+		self.text = next(self.chunks, '')
 		self.pos = 0
-		self.current_char = self.text[self.pos]
+		self.current_char = self.text[self.pos] if self.text else None
 		self.line = 1
 		self.reserved_words = ['while', 'if', 'else', 'declare', 'output']
 
@@ -53,16 +83,24 @@ class Lexer:
 	def peek(self):
 		peek_pos = self.pos + 1
 		if peek_pos > len(self.text) - 1:
-			return None
-		else:
-			return self.text[peek_pos]
+			#the next character is in the next chunk, keep the current one around
+			more = next(self.chunks, None)
+			if more is None:
+				return None
+			self.text = self.text[self.pos:] + more
+			self.pos = 0
+			peek_pos = 1
+		return self.text[peek_pos]
 
 	def advance(self):
 		self.pos += 1
 		if self.pos > len(self.text) - 1:
-			self.current_char = None
-		else:
+			self.text = next(self.chunks, '')
+			self.pos = 0
+		if self.text:
 			self.current_char = self.text[self.pos]
+		else:
+			self.current_char = None
 		
 	def skip_whitespace(self):
 		while self.current_char is not None and self.current_char.isspace():
@@ -97,7 +135,8 @@ class Lexer:
 		while self.current_char is not None and (self.current_char.isalnum() or self.current_char == '_'):
 			result += self.current_char
 			self.advance()
-		return result
+		#every occurrence of a name shares one string
+		return sys.intern(result)
 	
 	def get_next_token(self):
 		while self.current_char is not None:
@@ -242,4 +281,12 @@ class Lexer:
 
 			self.error('Unrecognized character: ' + self.current_char + ' on ' + str(self.line))
 		
-		return Token(EOF, None, self.line)
\ No newline at end of file
+		return Token(EOF, None, self.line)
+
+	def tokens(self):
+		#generator over the remaining tokens, ending with EOF
+		token = self.get_next_token()
+		while token.type != EOF:
+			yield token
+			token = self.get_next_token()
+		yield token
@@ -0,0 +1,161 @@
+from Command import Command, OPERANDS
+from CodeGenerator import WORD_BITS
+
+MEMORY_SIZE = 1 << WORD_BITS
+#operand types naming a data word
+DATA = ('address', 'variable')
+#instructions whose operand is the address of the word they read
+READS = ('LDA', 'ADD', 'SUB')
+
+class OutOfMemory(Exception):
+	pass
+
+class MemoryPlanner:
+	#gives the variables of a finished program their addresses, once its code size is known:
+	#arrays get blocks and variables single cells from the top of memory down, with no gaps,
+	#and with share a variable takes the cell of one it is never live at the same time as.
+	#Code and data meeting is an error showing the memory map, instead of code overwritten at run time
+	#
+	#a variable is live where some path on reads it before it is stored to,
+	#from the start of the program too: a variable never assigned reads 0, so it keeps a cell of its own
+	#until it is. A jump whose operand is filled in at run time, a runtime routine's return, can go to
+	#any address an LDI loads. Array elements can be reached through calculated addresses, arrays are never shared
+	def __init__(self, symtab, share=True):
+		self.symtab = symtab
+		self.share = share
+		#(address, length, names) of every cell or block, from the lowest address
+		self.cells = []
+		self.code = 0
+
+	def plan(self, commands):
+		#commands from CodeGenerator.generate(), or Peephole.optimize(), with the variables moved
+		self.code = len(commands)
+		variables = [name for name, var in self.symtab.tab.items() if not isinstance(var, list)]
+		interference = self.interference(commands, variables) if self.share else None
+		moved = {}
+		top = MEMORY_SIZE
+		shared = []
+		for name, var in self.symtab.tab.items():
+			if isinstance(var, list):
+				top -= len(var)
+				for index, element in enumerate(var):
+					moved[element.address] = top + index
+				self.cells.append((top, len(var), [name]))
+				continue
+			cell = None
+			if interference is not None:
+				for candidate in shared:
+					if not any(other in interference[name] for other in candidate[2]):
+						cell = candidate
+						break
+			if cell is None:
+				top -= 1
+				cell = (top, 1, [])
+				shared.append(cell)
+				self.cells.append(cell)
+			cell[2].append(name)
+			moved[var.address] = cell[0]
+		self.cells.sort()
+		if top < self.code:
+			raise OutOfMemory('Program does not fit in memory: {code} words of code and {data} of data, {size} words of memory\n{map}'.format(
+				code=self.code, data=MEMORY_SIZE - top, size=MEMORY_SIZE, map=self.memory_map()))
+		for name, var in self.symtab.tab.items():
+			for element in (var if isinstance(var, list) else [var]):
+				element.address = moved[element.address]
+		placed = []
+		for command in commands:
+			if command.data_type in DATA:
+				#operands can be the same Command twice, like the LDA and STO of x++, so they are copied
+				command = Command(moved[command.data], command.data_type, command.source)
+			placed.append(command)
+		return placed
+
+	def interference(self, commands, variables):
+		#for each variable, the variables live where it is stored to, and it where they are
+		bits = {}
+		for name in variables:
+			bits[self.symtab.lookup_address(name)] = 1 << len(bits)
+		code = []
+		starts = {}
+		returns = []
+		i = 0
+		while i < len(commands):
+			name = commands[i].data
+			operand = commands[i + 1] if OPERANDS.get(name) else None
+			starts[i] = len(code)
+			code.append((name, operand, i + 1 + (operand is not None)))
+			if name == 'LDI' and operand.data_type == 'dynamic':
+				returns.append(operand.data)
+			i = code[-1][2]
+		uses = []
+		stores = []
+		successors = []
+		for name, operand, following in code:
+			cell = 0
+			if operand is not None and operand.data_type in DATA:
+				cell = bits.get(operand.data, 0)
+			uses.append(cell if name in READS else 0)
+			stores.append(cell if name == 'STO' else 0)
+			if name == 'HLT':
+				targets = []
+			elif name == 'JMP' and operand.data_type == 'dynamic':
+				targets = [operand.data]
+			elif name == 'JMP':
+				targets = returns
+			elif name in ('JC', 'JZ'):
+				targets = [operand.data, following]
+			else:
+				targets = [following]
+			successors.append([starts[target] for target in targets if target in starts])
+		live = [0] * len(code)
+		changed = True
+		while changed:
+			changed = False
+			for i in range(len(code) - 1, -1, -1):
+				out = 0
+				for successor in successors[i]:
+					out |= live[successor]
+				value = uses[i] | (out & ~stores[i])
+				if value != live[i]:
+					live[i] = value
+					changed = True
+		conflicts = {name: set() for name in variables}
+		names = {bits[self.symtab.lookup_address(name)]: name for name in variables}
+		for i in range(len(code)):
+			if not stores[i]:
+				continue
+			out = 0
+			for successor in successors[i]:
+				out |= live[successor]
+			stored = names[stores[i]]
+			for bit, name in names.items():
+				if out & bit and name != stored:
+					conflicts[stored].add(name)
+					conflicts[name].add(stored)
+		return conflicts
+
+	def memory_map(self):
+		#one line per cell or block, from address 0 up
+		lines = ['{first:>3}-{last:<3} code, {words} words'.format(first=0, last=self.code - 1, words=self.code)]
+		if not self.cells:
+			lines.append('{first:>3}-{last:<3} free, {words} words'.format(first=self.code, last=MEMORY_SIZE - 1, words=MEMORY_SIZE - self.code))
+			return '\n'.join(lines)
+		lowest = self.cells[0][0]
+		if lowest > self.code:
+			lines.append('{first:>3}-{last:<3} free, {words} words'.format(first=self.code, last=lowest - 1, words=lowest - self.code))
+		for address, length, names in self.cells:
+			if length == 1:
+				line = '{first:>3}     {names}'.format(first=address, names=', '.join(names))
+			else:
+				line = '{first:>3}-{last:<3} {name}[{length}]'.format(first=address, last=address + length - 1, name=names[0], length=length)
+			if address < self.code:
+				line += '  overlaps code'
+			lines.append(line)
+		return '\n'.join(lines)
+
+	def summary(self):
+		variables = sum(len(names) for address, length, names in self.cells if length == 1)
+		scalars = sum(1 for address, length, names in self.cells if length == 1)
+		data = sum(length for address, length, names in self.cells)
+		return '{code} words of code, {data} of data with {variables} variables in {scalars} cells, {free} free'.format(
+			code=self.code, data=data, variables=variables, scalars=scalars, free=MEMORY_SIZE - self.code - data)
@@ -1,8 +1,80 @@
+from AST import AST, iter_child_nodes
+from types import GeneratorType
+
 class NodeVisitor(object):
+	#every subclass gets its own table mapping node classes to its visit_ functions,
+	#filled in the first time a node class is seen
+	#
+	#a visit_ method returns its result, or a generator when it has child nodes to visit:
+	#the generator yields each child (value = yield node.left) and returns the result.
+	#Generators are driven from an explicit stack by run, so however deep the tree gets
+	#it never reaches the Python call stack. Yielding another generator runs it the same way,
+	#for helpers that visit children themselves
+	_dispatch = {}
+
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls._dispatch = {}
+
 	def visit(self, node):
-		method_name = 'visit_' + type(node).__name__
-		visitor = getattr(self, method_name, self.generic_visit)
-		return visitor(node)
-	
+		try:
+			visitor = self._dispatch[node.__class__]
+		except KeyError:
+			visitor = self.resolve(node.__class__)
+		value = visitor(self, node)
+		if value.__class__ is GeneratorType:
+			return self.run(value)
+		return value
+
+	def run(self, routine):
+		dispatch = self._dispatch
+		routines = []
+		value = None
+		while True:
+			try:
+				node = routine.send(value)
+			except StopIteration as finished:
+				value = finished.value
+				if not routines:
+					return value
+				routine = routines.pop()
+				continue
+			if node.__class__ is GeneratorType:
+				value = node
+			else:
+				try:
+					visitor = dispatch[node.__class__]
+				except KeyError:
+					visitor = self.resolve(node.__class__)
+				value = visitor(self, node)
+			if value.__class__ is GeneratorType:
+				routines.append(routine)
+				routine = value
+				value = None
+
+	def resolve(self, node_class):
+		visitor = getattr(type(self), 'visit_' + node_class.__name__, None)
+		if visitor is None:
+			visitor = type(self).generic_visit
+		self._dispatch[node_class] = visitor
+		return visitor
+
+	def check(self, root):
+		#resolves every node class in the tree up front, so a missing visit_ method
+		#is reported when the visitor is built instead of part way through a run
+		stack = [root]
+		while stack:
+			node = stack.pop()
+			visitor = self._dispatch.get(node.__class__)
+			if visitor is None:
+				visitor = self.resolve(node.__class__)
+			if visitor is type(self).generic_visit:
+				self.generic_visit(node)
+			stack.extend(iter_child_nodes(node))
+
+	def visit_NoneType(self, node):
+		#an absent child, like the index of a plain variable, visits to None
+		return None
+
 	def generic_visit(self, node):
-		raise Exception('No visit_{} method'.format(type(node).__name__))
\ No newline at end of file
+		raise Exception('No visit_{} method'.format(type(node).__name__))
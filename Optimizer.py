@@ -0,0 +1,281 @@
+from Token import Token
+from Lexer import *
+from AST import *
+from NodeVisitor import NodeVisitor
+import operator
+
+ARITHMETIC = {
+	PLUS: operator.add,
+	MINUS: operator.sub,
+	MUL: operator.mul,
+	DIV: operator.floordiv,
+	MOD: operator.mod
+}
+
+COMPARISONS = {
+	LessThan: operator.lt,
+	LessThanEqual: operator.le,
+	GreaterThan: operator.gt,
+	GreaterThanEqual: operator.ge,
+	EqualTo: operator.eq,
+	NotEqualTo: operator.ne
+}
+
+#x op identity is x
+RIGHT_IDENTITIES = {PLUS: 0, MINUS: 0, MUL: 1, DIV: 1}
+#identity op x is x
+LEFT_IDENTITIES = {PLUS: 0, MUL: 1}
+
+class Optimizer(NodeVisitor):
+	#rewrites the tree from Parser.parse() before it is interpreted or compiled:
+	#folds constant arithmetic and conditions, drops +0, -0, *1 and /1,
+	#and prunes ifs and loops whose condition is known
+	#the parsed tree is never changed, changed nodes are copies, so it can still be compiled unoptimized
+	#
+	#bits is the target's word size, values wrap around and constants must fit in a word
+	#None is the interpreter's unbounded integers
+	#static_declarations keeps the declarations of pruned code: the code generator
+	#gives every declaration an address whether or not it is reached, the interpreter does not
+	def __init__(self, bits=None, static_declarations=False):
+		self.bits = bits
+		self.static_declarations = static_declarations
+		self.counts = {'folded': 0, 'simplified': 0, 'conditions': 0, 'pruned': 0}
+
+	def optimize(self, root):
+		self.check(root)
+		return self.visit(root)
+
+	def summary(self):
+		return '{folded} folded, {simplified} simplified, {conditions} conditions decided, {pruned} ifs and loops pruned'.format(**self.counts)
+
+	def fits(self, value):
+		return self.bits is None or 0 <= value < 1 << self.bits
+
+	def number(self, value, token):
+		if self.bits is not None:
+			value %= 1 << self.bits
+		return Num(Token(INTEGER, value, token.line_number))
+
+	def visit_Num(self, node):
+		return node
+
+	def visit_Var(self, node):
+		if node.index is None:
+			return node
+		return self.indexed(node)
+
+	def indexed(self, node):
+		index = yield node.index
+		if index is node.index:
+			return node
+		return replace(node, index=index)
+
+	def visit_UnaryOp(self, node):
+		identifier = yield node.identifier
+		if identifier is node.identifier:
+			return node
+		return replace(node, identifier=identifier)
+
+	def visit_BinOp(self, node):
+		left = yield node.left
+		right = yield node.right
+		op = node.op.type
+		if isinstance(left, Num) and isinstance(right, Num) and self.fits(left.value) and self.fits(right.value):
+			if not (op in (DIV, MOD) and right.value == 0):
+				self.counts['folded'] += 1
+				return self.number(ARITHMETIC[op](left.value, right.value), node.op)
+		if isinstance(right, Num) and RIGHT_IDENTITIES.get(op) == right.value:
+			self.counts['simplified'] += 1
+			return left
+		if isinstance(left, Num) and LEFT_IDENTITIES.get(op) == left.value:
+			self.counts['simplified'] += 1
+			return right
+		if op in (PLUS, MINUS) and isinstance(right, Num) and self.fits(right.value) and isinstance(left, BinOp) and left.op.type in (PLUS, MINUS) and isinstance(left.right, Num) and self.fits(left.right.value):
+			#(x + a) - b is x + (a - b)
+			constant = left.right.value if left.op.type == PLUS else -left.right.value
+			constant += right.value if op == PLUS else -right.value
+			self.counts['folded'] += 1
+			if constant == 0:
+				return left.left
+			elif constant < 0 and self.fits(-constant):
+				return BinOp(left.left, Token(MINUS, '-', node.op.line_number), self.number(-constant, node.op))
+			return BinOp(left.left, Token(PLUS, '+', node.op.line_number), self.number(constant, node.op))
+		if left is node.left and right is node.right:
+			return node
+		return replace(node, left=left, right=right)
+
+	def visit_Compound(self, node):
+		children = []
+		changed = False
+		for child in node.children:
+			new = yield child
+			if new is not child:
+				changed = True
+			if isinstance(new, Compound):
+				#a block does not open a scope, so its statements can join the enclosing one
+				children.extend(new.children)
+			else:
+				children.append(new)
+		if not changed:
+			return node
+		return replace(node, children=children)
+
+	def visit_Declarative(self, node):
+		if node.assigned is None:
+			return node
+		assigned = yield node.assigned
+		if assigned is node.assigned:
+			return node
+		return replace(node, assigned=assigned)
+
+	def assignment(self, node):
+		left = yield node.left
+		right = yield node.right
+		if left is node.left and right is node.right:
+			return node
+		return replace(node, left=left, right=right)
+
+	def visit_Assign(self, node):
+		return self.assignment(node)
+
+	def visit_PlusEquals(self, node):
+		return self.assignment(node)
+
+	def visit_MinusEquals(self, node):
+		return self.assignment(node)
+
+	def visit_MulEquals(self, node):
+		return self.assignment(node)
+
+	def visit_DivEquals(self, node):
+		return self.assignment(node)
+
+	def visit_ModEquals(self, node):
+		return self.assignment(node)
+
+	def visit_Output(self, node):
+		expr = yield node.expr
+		if expr is node.expr:
+			return node
+		return replace(node, expr=expr)
+
+	def comparison(self, node):
+		#a condition folds to True or False, only an if or loop can take that
+		left = yield node.left
+		right = yield node.right
+		if isinstance(left, Num) and isinstance(right, Num) and self.fits(left.value) and self.fits(right.value):
+			self.counts['conditions'] += 1
+			return COMPARISONS[type(node)](left.value, right.value)
+		if left is node.left and right is node.right:
+			return node
+		return replace(node, left=left, right=right)
+
+	def visit_LessThan(self, node):
+		return self.comparison(node)
+
+	def visit_LessThanEqual(self, node):
+		return self.comparison(node)
+
+	def visit_GreaterThan(self, node):
+		return self.comparison(node)
+
+	def visit_GreaterThanEqual(self, node):
+		return self.comparison(node)
+
+	def visit_EqualTo(self, node):
+		return self.comparison(node)
+
+	def visit_NotEqualTo(self, node):
+		return self.comparison(node)
+
+	def visit_CompoundCondition(self, node):
+		left = yield node.left
+		either = node.op.value == '||'
+		if left is True or left is False:
+			#the right side is only evaluated when the left does not decide
+			self.counts['conditions'] += 1
+			if left == either:
+				return left
+			return (yield node.right)
+		right = yield node.right
+		if right is True or right is False:
+			if right != either:
+				#x && true, x || false
+				self.counts['conditions'] += 1
+				return left
+			#x && false, x || true still have to evaluate x
+			right = node.right
+		if left is node.left and right is node.right:
+			return node
+		return replace(node, left=left, right=right)
+
+	def visit_Negator(self, node):
+		right = yield node.right
+		if right is True or right is False:
+			self.counts['conditions'] += 1
+			return not right
+		if right is node.right:
+			return node
+		return replace(node, right=right)
+
+	def block(self, statements):
+		block = Compound()
+		for statement in statements:
+			if isinstance(statement, Compound):
+				block.children.extend(statement.children)
+			else:
+				block.children.append(statement)
+		return block
+
+	def declarations(self, node):
+		#the declarations in code that is pruned, with their initial values dropped
+		statements = []
+		if self.static_declarations:
+			stack = [node]
+			while stack:
+				node = stack.pop()
+				if isinstance(node, Declarative):
+					statements.append(replace(node, assigned=None))
+				else:
+					stack.extend(reversed(list(iter_child_nodes(node))))
+		return self.block(statements)
+
+	def visit_If(self, node):
+		condition = yield node.condition
+		if condition is True or condition is False:
+			self.counts['pruned'] += 1
+			if condition:
+				kept = yield node.body
+				if node.else_node is None:
+					return kept
+				return self.block([kept, self.declarations(node.else_node)])
+			kept = self.declarations(node.body)
+			if node.else_node is None:
+				return kept
+			return self.block([kept, (yield node.else_node.after)])
+		body = yield node.body
+		else_node = None
+		if node.else_node is not None:
+			else_node = yield node.else_node
+		if condition is node.condition and body is node.body and else_node is node.else_node:
+			return node
+		return replace(node, condition=condition, body=body, else_node=else_node)
+
+	def visit_Else(self, node):
+		after = yield node.after
+		if after is node.after:
+			return node
+		return replace(node, after=after)
+
+	def visit_Loop(self, node):
+		condition = yield node.condition
+		if condition is False:
+			self.counts['pruned'] += 1
+			return self.declarations(node.body)
+		elif condition is True:
+			#an endless loop still needs a condition to branch on
+			condition = node.condition
+		body = yield node.body
+		if condition is node.condition and body is node.body:
+			return node
+		return replace(node, condition=condition, body=body)
@@ -221,7 +221,7 @@ class Parser:
 			self.eat(SEMICOLON)
 			return MulEquals(left, op, right)
 		elif op.type == MODEQUALS:
-			self.eat(MODEQALS)
+			self.eat(MODEQUALS)
 			right = self.expression()
 			self.eat(SEMICOLON)
 			return ModEquals(left, op, right)
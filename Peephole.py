@@ -0,0 +1,244 @@
+from Command import OPERANDS
+
+JUMPS = ('JMP', 'JC', 'JZ')
+LOADS = ('LDA', 'LDI')
+#instructions whose operand is the address of the word they read
+READS = ('LDA', 'ADD', 'SUB')
+#operand types naming a data word, a dynamic operand names a word of the program
+DATA = ('address', 'variable')
+
+class Instruction:
+	#an instruction word and its operand word, if it has one
+	#a dynamic operand keeps the instruction it points into and the word within it (0 is the
+	#instruction itself, 1 its operand), so it can be resolved again once words are deleted
+	__slots__ = ('opcode', 'operand', 'target', 'offset', 'address')
+
+	def __init__(self, opcode, operand):
+		self.opcode = opcode
+		self.operand = operand
+		self.target = None
+		self.offset = 0
+		self.address = 0
+
+	def words(self):
+		return 1 if self.operand is None else 2
+
+	def name(self):
+		return self.opcode.data
+
+	def data(self):
+		#the data word an LDA, ADD, SUB or STO uses, None for anything else
+		if self.operand is not None and self.operand.data_type in DATA and (self.opcode.data in READS or self.opcode.data == 'STO'):
+			return self.operand.data
+		return None
+
+class Peephole:
+	#removes redundant instructions from the Command list of CodeGenerator.generate():
+	#   store/load      STO x; LDA x, the accumulator already holds x
+	#   load/store      LDA x; STO x, x already holds the accumulator
+	#   dead load       a load straight into another load
+	#   dead spill      a store to a scratch variable nothing reads
+	#   jump to next    a jump to the instruction after it
+	#   unreachable     code no path from the start reaches
+	#jumps to a JMP are threaded to where it goes, which can leave more code unreachable
+	#
+	#rules run until none applies, dynamic operands are resolved again afterwards
+	#an instruction a dynamic STO writes into is never touched, its words change at run time
+	#the accumulator is never compared, only SUB and SBI set the flags, so loads and stores can go
+	#spills are the addresses of the code generator's scratch variables, see CodeGenerator.spills
+	def __init__(self, spills=()):
+		self.spills = set(spills)
+		self.saved = {'store/load': 0, 'load/store': 0, 'dead load': 0, 'dead spill': 0, 'jump to next': 0, 'unreachable': 0}
+		self.threaded = 0
+
+	def optimize(self, commands):
+		code = self.decode(commands)
+		rules = (
+			('store/load', self.store_load),
+			('load/store', self.load_store),
+			('dead load', self.dead_load),
+			('dead spill', self.dead_spill),
+			('jump to next', self.jump_to_next),
+			('unreachable', self.unreachable)
+		)
+		changed = True
+		while changed:
+			changed = self.thread(code)
+			for rule, find in rules:
+				targets, pinned = self.references(code)
+				dead = find(code, targets, pinned)
+				if dead:
+					self.saved[rule] += sum(code[i].words() for i in dead)
+					code = self.remove(code, dead)
+					changed = True
+		return self.encode(code)
+
+	def summary(self):
+		rules = ', '.join('{words} {rule}'.format(words=words, rule=rule) for rule, words in self.saved.items())
+		return '{total} words saved ({rules}), {threaded} jumps threaded'.format(
+			total=sum(self.saved.values()), rules=rules, threaded=self.threaded)
+
+	def decode(self, commands):
+		code = []
+		owners = []
+		i = 0
+		while i < len(commands):
+			opcode = commands[i]
+			if opcode.data_type != 'instruction' or opcode.data not in OPERANDS:
+				raise Exception('Peephole: word {i} is not an instruction'.format(i=i))
+			operand = None
+			if OPERANDS[opcode.data]:
+				if i + 1 >= len(commands):
+					raise Exception('Peephole: {name} at word {i} has no operand'.format(name=opcode.data, i=i))
+				operand = commands[i + 1]
+			instruction = Instruction(opcode, operand)
+			code.append(instruction)
+			for offset in range(instruction.words()):
+				owners.append((instruction, offset))
+			i += instruction.words()
+		for instruction in code:
+			operand = instruction.operand
+			if operand is None or operand.data_type != 'dynamic':
+				continue
+			if operand.data >= len(owners):
+				raise Exception('Peephole: {name} points past the end of the program'.format(name=instruction.name()))
+			instruction.target, instruction.offset = owners[operand.data]
+		return code
+
+	def encode(self, code):
+		address = 0
+		for instruction in code:
+			instruction.address = address
+			address += instruction.words()
+		commands = []
+		for instruction in code:
+			commands.append(instruction.opcode)
+			if instruction.operand is not None:
+				if instruction.target is not None:
+					instruction.operand.data = instruction.target.address + instruction.offset
+				commands.append(instruction.operand)
+		return commands
+
+	def references(self, code):
+		#instructions jumped to, and instructions written into or pointed at by anything but a jump
+		targets = set()
+		pinned = set()
+		for instruction in code:
+			if instruction.target is None:
+				continue
+			if instruction.name() in JUMPS and instruction.offset == 0:
+				targets.add(id(instruction.target))
+			else:
+				pinned.add(id(instruction.target))
+		return targets, pinned
+
+	def remove(self, code, dead):
+		#jumps to a removed instruction go to the next one kept instead
+		kept = []
+		following = {}
+		after = None
+		for i in range(len(code) - 1, -1, -1):
+			if i in dead:
+				following[id(code[i])] = after
+			else:
+				after = code[i]
+				kept.append(after)
+		kept.reverse()
+		for instruction in kept:
+			if instruction.target is not None and id(instruction.target) in following:
+				instruction.target = following[id(instruction.target)]
+				if instruction.target is None:
+					raise Exception('Peephole: removed the end of the program')
+		return kept
+
+	def thread(self, code):
+		changed = False
+		pinned = self.references(code)[1]
+		for instruction in code:
+			if instruction.name() not in JUMPS or instruction.target is None or instruction.offset != 0:
+				continue
+			seen = set()
+			target = instruction.target
+			while target.name() == 'JMP' and target.target is not None and target.offset == 0 and id(target) not in seen and id(target) not in pinned:
+				seen.add(id(target))
+				target = target.target
+			if target is not instruction.target:
+				instruction.target = target
+				self.threaded += 1
+				changed = True
+		return changed
+
+	def store_load(self, code, targets, pinned):
+		dead = set()
+		for i in range(1, len(code)):
+			previous, instruction = code[i - 1], code[i]
+			if previous.name() == 'STO' and instruction.name() == 'LDA' and instruction.data() is not None and instruction.data() == previous.data():
+				if id(instruction) not in targets and id(instruction) not in pinned and id(previous) not in pinned:
+					dead.add(i)
+		return dead
+
+	def load_store(self, code, targets, pinned):
+		dead = set()
+		for i in range(1, len(code)):
+			previous, instruction = code[i - 1], code[i]
+			if previous.name() == 'LDA' and instruction.name() == 'STO' and instruction.data() is not None and instruction.data() == previous.data():
+				if id(instruction) not in targets and id(instruction) not in pinned and id(previous) not in pinned:
+					dead.add(i)
+		return dead
+
+	def dead_load(self, code, targets, pinned):
+		#the first load can go even when jumped to, the second one overwrites it either way
+		dead = set()
+		for i in range(len(code) - 1):
+			instruction, following = code[i], code[i + 1]
+			if instruction.name() in LOADS and following.name() in LOADS:
+				if id(instruction) not in pinned and id(following) not in pinned:
+					dead.add(i)
+		return dead
+
+	def dead_spill(self, code, targets, pinned):
+		read = set()
+		for instruction in code:
+			if instruction.name() in READS and instruction.data() is not None:
+				read.add(instruction.data())
+		dead = set()
+		for i, instruction in enumerate(code):
+			if instruction.name() == 'STO' and instruction.data() in self.spills and instruction.data() not in read:
+				if id(instruction) not in pinned:
+					dead.add(i)
+		return dead
+
+	def jump_to_next(self, code, targets, pinned):
+		dead = set()
+		for i in range(len(code) - 1):
+			instruction = code[i]
+			if instruction.name() in JUMPS and instruction.offset == 0 and instruction.target is code[i + 1]:
+				if id(instruction) not in pinned:
+					dead.add(i)
+		return dead
+
+	def unreachable(self, code, targets, pinned):
+		#the last instruction, HLT, is kept so the program still ends on one
+		#a jump whose operand is filled in at run time, like a runtime routine's return, can go to
+		#any instruction an operand points at, so those count as reached too
+		index = {}
+		for i, instruction in enumerate(code):
+			index[id(instruction)] = i
+		reached = set()
+		stack = [0]
+		stack.extend(index[pin] for pin in pinned)
+		while stack:
+			i = stack.pop()
+			if i in reached or i >= len(code):
+				continue
+			reached.add(i)
+			instruction = code[i]
+			if instruction.name() in JUMPS and instruction.target is not None:
+				stack.append(index[id(instruction.target)])
+			if instruction.name() not in ('JMP', 'HLT'):
+				stack.append(i + 1)
+		dead = set()
+		for i in range(len(code) - 1):
+			if i not in reached and id(code[i]) not in pinned:
+				dead.add(i)
+		return dead
@@ -0,0 +1,240 @@
+from AST import line_number
+from types import GeneratorType, MethodType
+from time import perf_counter
+import contextlib
+import json
+import sys
+
+#source lines the table shows, those taking the most time
+LINES_SHOWN = 20
+#the formats Profiler.write knows
+FORMATS = ('table', 'json', 'folded')
+#the deepest path folded stacks tell apart, what runs deeper counts toward its ancestor at this depth.
+#Every folded stack names its whole path, so a deeply nested program would take depth squared lines of text
+FOLDED_DEPTH = 200
+
+class Profiler:
+	#wall time and memory blocks allocated per phase of a compile or run, per AST node type each
+	#visitor visits and per source line. Phases are named by phase() and timed(), and visits are
+	#recorded for the visitors given to instrument. Phases and visits nest on one stack, so each is
+	#timed twice: self, without what ran inside it, and total, with it. The totals of a phase or
+	#node type that is inside itself, a loop in a loop, count the outermost only
+	#
+	#memory blocks are sys.getallocatedblocks(), those allocated less those freed: a phase that
+	#frees what it allocated has none. Nodes a visitor evaluates without visiting, the Interpreter's
+	#numbers and plain variables, count toward the node they are in
+	def __init__(self):
+		#frames of what is running: [path, start, nested time, blocks at start, nested blocks]
+		self.stack = []
+		#paths of names from the outermost phase, interned: a path is the index of its last name
+		self.paths = {}
+		self.parents = []
+		self.names = []
+		self.folded = []
+		#what is inside itself, by key, so its total counts once
+		self.active = {}
+		#calls, self seconds, total seconds, self blocks, by phase name and by (visitor, visit method)
+		self.phases = {}
+		self.nodes = {}
+		#visits and self seconds by source line
+		self.lines = {}
+
+	def enter(self, name):
+		parent = self.stack[-1][0] if self.stack else -1
+		if len(self.stack) >= FOLDED_DEPTH:
+			path = parent
+		else:
+			path = self.paths.get((parent, name))
+		if path is None:
+			path = self.paths[(parent, name)] = len(self.names)
+			self.parents.append(parent)
+			self.names.append(name)
+			self.folded.append(0.0)
+		self.stack.append([path, perf_counter(), 0.0, sys.getallocatedblocks(), 0])
+
+	def leave(self, table, key):
+		path, start, nested, blocks, nested_blocks = self.stack.pop()
+		total = perf_counter() - start
+		allocated = sys.getallocatedblocks() - blocks
+		if self.stack:
+			parent = self.stack[-1]
+			parent[2] += total
+			parent[4] += allocated
+		self.folded[path] += total - nested
+		entry = table.get(key)
+		if entry is None:
+			entry = table[key] = [0, 0.0, 0.0, 0]
+		entry[0] += 1
+		entry[1] += total - nested
+		entry[3] += allocated - nested_blocks
+		depth = self.active.get(key, 0)
+		if depth == 0:
+			entry[2] += total
+		return total - nested
+
+	@contextlib.contextmanager
+	def phase(self, name):
+		key = ('phase', name)
+		self.enter(name)
+		self.active[key] = self.active.get(key, 0) + 1
+		try:
+			yield
+		finally:
+			self.active[key] -= 1
+			self.leave(self.phases, key)
+
+	def timed(self, name, function):
+		#function timed as the phase name each time it is called, for phases that are one call
+		#inside another, such as the lexer's get_next_token inside parsing
+		def timed(*args):
+			with self.phase(name):
+				return function(*args)
+		return timed
+
+	def instrument(self, visitor):
+		#records every visit visitor makes from now on, by giving it its own visit and run
+		visitor.visit = MethodType(visit, visitor)
+		visitor.run = MethodType(run, visitor)
+		visitor.profiler = self
+
+	def enter_node(self, visitor, node):
+		key = (visitor.__class__.__name__, 'visit_' + node.__class__.__name__)
+		self.enter(key[1])
+		self.active[key] = self.active.get(key, 0) + 1
+		return key
+
+	def leave_node(self, key, node):
+		self.active[key] -= 1
+		seconds = self.leave(self.nodes, key)
+		number = line_number(node)
+		if number is not None:
+			entry = self.lines.get(number)
+			if entry is None:
+				entry = self.lines[number] = [0, 0.0]
+			entry[0] += 1
+			entry[1] += seconds
+
+	def report(self):
+		#the measurements as plain lists and dicts, times in seconds, ordered by time
+		phases = [{'phase': name, 'calls': calls, 'self': own, 'total': total, 'blocks': blocks}
+			for (kind, name), (calls, own, total, blocks) in self.phases.items()]
+		nodes = [{'visitor': visitor, 'method': method, 'visits': visits, 'self': own, 'total': total, 'blocks': blocks}
+			for (visitor, method), (visits, own, total, blocks) in self.nodes.items()]
+		lines = [{'line': number, 'visits': visits, 'self': own} for number, (visits, own) in self.lines.items()]
+		phases.sort(key=lambda entry: -entry['total'])
+		nodes.sort(key=lambda entry: -entry['self'])
+		lines.sort(key=lambda entry: -entry['self'])
+		return {'phases': phases, 'nodes': nodes, 'lines': lines}
+
+	def table(self, source=None):
+		#the report as text, with the source lines when given the program's text
+		report = self.report()
+		text = source.splitlines() if source is not None else []
+		rows = ['{name:<24} {calls:>9} {own:>10} {total:>10} {blocks:>9}'.format(
+			name='phase', calls='calls', own='self ms', total='total ms', blocks='blocks')]
+		for entry in report['phases']:
+			rows.append('{phase:<24} {calls:>9} {own:>10.2f} {total:>10.2f} {blocks:>9}'.format(
+				phase=entry['phase'], calls=entry['calls'], own=entry['self'] * 1000, total=entry['total'] * 1000, blocks=entry['blocks']))
+		if report['nodes']:
+			rows.append('')
+			rows.append('{name:<40} {visits:>9} {own:>10} {total:>10} {blocks:>9}'.format(
+				name='visit', visits='visits', own='self ms', total='total ms', blocks='blocks'))
+			for entry in report['nodes']:
+				rows.append('{name:<40} {visits:>9} {own:>10.2f} {total:>10.2f} {blocks:>9}'.format(
+					name=entry['visitor'] + '.' + entry['method'], visits=entry['visits'], own=entry['self'] * 1000,
+					total=entry['total'] * 1000, blocks=entry['blocks']))
+		if report['lines']:
+			rows.append('')
+			rows.append('{line:>6} {visits:>9} {own:>10}  source'.format(line='line', visits='visits', own='self ms'))
+			for entry in report['lines'][:LINES_SHOWN]:
+				number = entry['line']
+				rows.append('{line:>6} {visits:>9} {own:>10.2f}  {text}'.format(
+					line=number, visits=entry['visits'], own=entry['self'] * 1000,
+					text=text[number - 1].strip() if 0 < number <= len(text) else ''))
+		return '\n'.join(rows) + '\n'
+
+	def json(self):
+		return json.dumps(self.report(), indent=1) + '\n'
+
+	def folded_stacks(self):
+		#a line per path, its names joined by ; and the microseconds spent in it and not inside
+		#anything it ran, as flamegraph.pl and speedscope read them
+		lines = []
+		for path, seconds in enumerate(self.folded):
+			microseconds = round(seconds * 1000000)
+			if microseconds <= 0:
+				continue
+			names = []
+			while path != -1:
+				names.append(self.names[path])
+				path = self.parents[path]
+			lines.append('{stack} {microseconds}\n'.format(stack=';'.join(reversed(names)), microseconds=microseconds))
+		return ''.join(lines)
+
+	def write(self, path, format, source=None):
+		#the report in format, table, json or folded, to path, - is standard error
+		if format == 'json':
+			text = self.json()
+		elif format == 'folded':
+			text = self.folded_stacks()
+		else:
+			text = self.table(source)
+		if path == '-':
+			sys.stderr.write(text)
+			return
+		with open(path, 'w') as f:
+			f.write(text)
+
+#NodeVisitor's visit and run, recording each visit in the visitor's profiler. A visit whose
+#method returns a generator lasts until the generator finishes
+def visit(self, node):
+	try:
+		visitor = self._dispatch[node.__class__]
+	except KeyError:
+		visitor = self.resolve(node.__class__)
+	profiler = self.profiler
+	key = profiler.enter_node(self, node)
+	value = visitor(self, node)
+	if value.__class__ is GeneratorType:
+		value = self.run(value)
+	profiler.leave_node(key, node)
+	return value
+
+def run(self, routine):
+	dispatch = self._dispatch
+	profiler = self.profiler
+	routines = []
+	#the key and node of each routine in routines and of routine, None for helpers a visit yielded
+	visits = []
+	visiting = None
+	value = None
+	while True:
+		try:
+			node = routine.send(value)
+		except StopIteration as finished:
+			value = finished.value
+			if visiting is not None:
+				profiler.leave_node(*visiting)
+			if not routines:
+				return value
+			routine = routines.pop()
+			visiting = visits.pop()
+			continue
+		if node.__class__ is GeneratorType:
+			value = node
+			key = None
+		else:
+			try:
+				visitor = dispatch[node.__class__]
+			except KeyError:
+				visitor = self.resolve(node.__class__)
+			key = profiler.enter_node(self, node)
+			value = visitor(self, node)
+			if value.__class__ is not GeneratorType:
+				profiler.leave_node(key, node)
+		if value.__class__ is GeneratorType:
+			routines.append(routine)
+			visits.append(visiting)
+			routine = value
+			visiting = None if key is None else (key, node)
+			value = None
@@ -0,0 +1,23 @@
+from AST import Var, iter_child_nodes
+
+class Resolver:
+	#numbers every variable name in a tree and sets each Var node's slot to its number,
+	#so the Interpreter keeps its values in a list instead of looking names up
+	#a name has one slot wherever it appears, whether its declaration is ever reached is
+	#still only known when the program runs
+	def __init__(self):
+		self.slots = {}
+
+	def resolve(self, root):
+		#returns how many slots the tree uses
+		slots = self.slots
+		stack = [root]
+		while stack:
+			node = stack.pop()
+			if node.__class__ is Var:
+				slot = slots.get(node.var_name)
+				if slot is None:
+					slot = slots[node.var_name] = len(slots)
+				node.slot = slot
+			stack.extend(iter_child_nodes(node))
+		return len(slots)
@@ -0,0 +1,151 @@
+from Command import Command, Label
+
+#routines for what the machine has no instruction for, emitted once after the program by
+#CodeGenerator and only when used. There is no call instruction either: the caller stores
+#the address to come back to into the operand of the routine's last JMP, then jumps to entry
+
+class Routine:
+	def __init__(self, arguments, result):
+		self.entry = Label()
+		#the operand of the JMP back to the caller
+		self.exit = Label()
+		#cells the caller stores the left and right operands in
+		self.arguments = arguments
+		#cell holding the other result, the remainder of a division
+		self.result = result
+		self.commands = []
+
+	def label(self, label):
+		self.commands.append(Command(label, 'label'))
+
+	def emit(self, name, operand=None, data_type='address'):
+		self.commands.append(Command(name, 'instruction'))
+		if operand is not None:
+			self.commands.append(Command(operand, data_type))
+
+	def jump(self, name, label):
+		self.emit(name, label, 'dynamic')
+
+	def leave(self):
+		self.emit('JMP')
+		self.label(self.exit)
+		self.commands.append(Command(0, 'dynamically filled'))
+
+def cell(symtab, name):
+	#$ cannot start an identifier, so no program variable collides
+	name = '$' + name
+	symtab.declare(name)
+	return symtab.lookup_address(name)
+
+def multiply(symtab, bits):
+	#shift and add from the top bit of the multiplier down:
+	#the product doubles every round and takes the multiplicand when the bit shifted out was set.
+	#Doubling is adding a value to itself, the bit shifted out of the multiplier is the carry
+	multiplicand = cell(symtab, 'multiplicand')
+	multiplier = cell(symtab, 'multiplier')
+	product = cell(symtab, 'product')
+	count = cell(symtab, 'multiply_count')
+	routine = Routine((multiplicand, multiplier), product)
+	repeat = Label()
+	add = Label()
+	next_bit = Label()
+	done = Label()
+	routine.label(routine.entry)
+	routine.emit('LDI', 0, 'data')
+	routine.emit('STO', product)
+	routine.emit('LDI', bits, 'data')
+	routine.emit('STO', count)
+	routine.label(repeat)
+	routine.emit('LDA', product)
+	routine.emit('ADD', product)
+	routine.emit('STO', product)
+	routine.emit('LDA', multiplier)
+	routine.emit('ADD', multiplier)
+	routine.emit('STO', multiplier)
+	routine.jump('JC', add)
+	routine.label(next_bit)
+	routine.emit('LDA', count)
+	routine.emit('SBI', 1, 'data')
+	routine.emit('STO', count)
+	routine.jump('JZ', done)
+	routine.jump('JMP', repeat)
+	routine.label(add)
+	routine.emit('LDA', product)
+	routine.emit('ADD', multiplicand)
+	routine.emit('STO', product)
+	routine.jump('JMP', next_bit)
+	routine.label(done)
+	routine.emit('LDA', product)
+	routine.leave()
+	return routine
+
+def divide(symtab, bits):
+	#restoring division: the dividend is shifted out of the top of its cell into the remainder
+	#one bit a round, and the quotient bits are shifted in at the bottom as the divisor is taken
+	#from the remainder. Doubling the remainder can overflow a word, then it is bigger than
+	#the divisor, which is taken without comparing
+	quotient = cell(symtab, 'dividend')
+	divisor = cell(symtab, 'divisor')
+	remainder = cell(symtab, 'remainder')
+	count = cell(symtab, 'divide_count')
+	routine = Routine((quotient, divisor), remainder)
+	repeat = Label()
+	one = Label()
+	compare = Label()
+	next_bit = Label()
+	overflowed_one = Label()
+	overflowed = Label()
+	take = Label()
+	done = Label()
+	routine.label(routine.entry)
+	routine.emit('LDI', 0, 'data')
+	routine.emit('STO', remainder)
+	routine.emit('LDI', bits, 'data')
+	routine.emit('STO', count)
+	routine.label(repeat)
+	routine.emit('LDA', quotient)
+	routine.emit('ADD', quotient)
+	routine.emit('STO', quotient)
+	routine.jump('JC', one)
+	routine.emit('LDA', remainder)
+	routine.emit('ADD', remainder)
+	routine.emit('STO', remainder)
+	routine.jump('JC', overflowed)
+	#the accumulator holds the remainder on both ways here
+	routine.label(compare)
+	routine.emit('SUB', divisor)
+	routine.jump('JC', take)
+	routine.label(next_bit)
+	routine.emit('LDA', count)
+	routine.emit('SBI', 1, 'data')
+	routine.emit('STO', count)
+	routine.jump('JZ', done)
+	routine.jump('JMP', repeat)
+	#a one shifted out of the dividend goes into the bottom of the remainder, an even number
+	routine.label(one)
+	routine.emit('LDA', remainder)
+	routine.emit('ADD', remainder)
+	routine.jump('JC', overflowed_one)
+	routine.emit('ADI', 1, 'data')
+	routine.emit('STO', remainder)
+	routine.jump('JMP', compare)
+	routine.label(overflowed_one)
+	routine.emit('ADI', 1, 'data')
+	routine.emit('STO', remainder)
+	routine.label(overflowed)
+	routine.emit('SUB', divisor)
+	routine.label(take)
+	routine.emit('STO', remainder)
+	routine.emit('LDA', quotient)
+	routine.emit('ADI', 1, 'data')
+	routine.emit('STO', quotient)
+	routine.jump('JMP', next_bit)
+	routine.label(done)
+	routine.emit('LDA', quotient)
+	routine.leave()
+	return routine
+
+ROUTINES = {
+	'multiply': multiply,
+	'divide': divide
+}
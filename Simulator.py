@@ -0,0 +1,112 @@
+from Command import Command, OPCODES, CYCLES
+
+MEMORY_SIZE = 256
+WORD_MASK = 0xFF
+NAMES = {opcode: name for name, opcode in OPCODES.items()}
+
+class Simulator:
+	#runs the target machine's code: one accumulator, carry and zero flags, 256 words of memory
+	#holding the program from address 0 and the variables from 255 down, as CodeGenerator lays them out.
+	#Stores land in the memory image, so the self-modified operands of array code work as on the machine
+	#
+	#program is the Command list from CodeGenerator.generate(), or the lines of a.txt
+	#
+	#executed counts the instructions run at each address. The mix by instruction is worked out from it
+	#with the opcodes in memory afterwards, compiled code only ever stores into operand words
+	def __init__(self, program):
+		self.memory = [0] * MEMORY_SIZE
+		if len(program) > MEMORY_SIZE:
+			raise Exception('Program is {words} words, memory is {size}'.format(words=len(program), size=MEMORY_SIZE))
+		for address, word in enumerate(program):
+			if isinstance(word, Command):
+				word = word.data
+			if isinstance(word, str):
+				word = word.strip()
+				if word in OPCODES:
+					word = OPCODES[word]
+			self.memory[address] = int(word) & WORD_MASK
+		self.output = []
+		self.executed = [0] * MEMORY_SIZE
+		self.counts = {}
+		self.instructions = 0
+		self.cycles = 0
+		self.halted = False
+
+	def run(self, limit=10000000):
+		#executes until HLT or limit instructions, returns the values sent to OUT
+		#the hot loop, everything it touches is bound to a local and the opcode tests
+		#are ordered by how often compiled code runs them
+		memory = self.memory
+		output = self.output
+		out = output.append
+		executed = [0] * MEMORY_SIZE
+		a = 0
+		carry = zero = False
+		pc = 0
+		steps = 0
+		LDA, STO, LDI, SBI, SUB, JC, JZ, JMP, ADI, ADD, OUT, HLT = (
+			OPCODES['LDA'], OPCODES['STO'], OPCODES['LDI'], OPCODES['SBI'], OPCODES['SUB'], OPCODES['JC'],
+			OPCODES['JZ'], OPCODES['JMP'], OPCODES['ADI'], OPCODES['ADD'], OPCODES['OUT'], OPCODES['HLT'])
+		try:
+			for steps in range(1, limit + 1):
+				op = memory[pc]
+				executed[pc] += 1
+				if op == LDA:
+					a = memory[memory[pc + 1]]
+					pc += 2
+				elif op == STO:
+					memory[memory[pc + 1]] = a
+					pc += 2
+				elif op == LDI:
+					a = memory[pc + 1]
+					pc += 2
+				elif op == SBI or op == SUB:
+					#subtracting adds the two's complement, carry set means nothing was borrowed
+					operand = memory[pc + 1]
+					if op == SUB:
+						operand = memory[operand]
+					carry = a >= operand
+					a = (a - operand) & WORD_MASK
+					zero = a == 0
+					pc += 2
+				elif op == JC:
+					pc = memory[pc + 1] if carry else pc + 2
+				elif op == JZ:
+					pc = memory[pc + 1] if zero else pc + 2
+				elif op == JMP:
+					pc = memory[pc + 1]
+				elif op == ADI or op == ADD:
+					operand = memory[pc + 1]
+					if op == ADD:
+						operand = memory[operand]
+					a += operand
+					carry = a > WORD_MASK
+					a &= WORD_MASK
+					zero = a == 0
+					pc += 2
+				elif op == OUT:
+					out(a)
+					pc += 1
+				elif op == HLT:
+					self.halted = True
+					break
+				else:
+					executed[pc] -= 1
+					steps -= 1
+					raise Exception('Unknown instruction {op} at address {pc}'.format(op=op, pc=pc))
+		except IndexError:
+			raise Exception('Program ran past the end of memory')
+		finally:
+			self.instructions += steps
+			for address, count in enumerate(executed):
+				if count:
+					self.executed[address] += count
+					name = NAMES[memory[address]]
+					self.counts[name] = self.counts.get(name, 0) + count
+					self.cycles += count * CYCLES[name]
+		return output
+
+	def summary(self):
+		mix = ', '.join('{count} {name}'.format(name=name, count=count) for name, count in sorted(self.counts.items(), key=lambda item: (-item[1], OPCODES[item[0]])))
+		return '{state} after {instructions} instructions, {cycles} cycles ({mix})'.format(
+			state='halted' if self.halted else 'stopped', instructions=self.instructions, cycles=self.cycles, mix=mix)
@@ -0,0 +1,112 @@
+from Command import OPCODES, CYCLES
+
+NAMES = {opcode: name for name, opcode in OPCODES.items()}
+
+def source_map(commands, source=None):
+	#what a run needs to be told about a compiled program in terms of its source, as JSON holds it:
+	#the file it was compiled from, the source of every word, see Command, and the address
+	#of the JMP closing each while loop
+	return {
+		'source': source,
+		'words': [command.source for command in commands],
+		'loops': [address for address, command in enumerate(commands) if command.loop]
+	}
+
+class Listing:
+	#the instructions and cycles a run on the Simulator spent on each line of the source and inside
+	#each while loop, from the source map and the Simulator's memory and executed counts afterwards
+	#
+	#a line's own counts are exact. A runtime routine is shared by every multiplication or division,
+	#so what it costs is only known in total: that is charged to the lines calling it by their share
+	#of the calls, and shown apart as an estimate, since a call costs more or less with its operands.
+	#A loop's counts are of the words from where it starts to its closing JMP, with what the calls
+	#among them were charged
+	def __init__(self, source_map, memory, executed):
+		self.words = source_map['words']
+		#[instructions, cycles] by line, routine name or None
+		self.own = {}
+		#[instructions, cycles] of routine calls charged to each line
+		self.charged = {}
+		#calls each routine had, and from where: {routine: {address of the call: calls}}
+		self.calls = {}
+		charged_at = {}
+		for address, count in enumerate(executed[:len(self.words)]):
+			name = NAMES.get(memory[address])
+			if not count or name is None:
+				continue
+			self.add(self.own, self.words[address], count, count * CYCLES[name])
+			if name == 'JMP' and isinstance(self.words[address], int):
+				target = memory[address + 1]
+				if target < len(self.words) and isinstance(self.words[target], str):
+					sites = self.calls.setdefault(self.words[target], {})
+					sites[address] = sites.get(address, 0) + count
+		for routine, sites in self.calls.items():
+			instructions, cycles = self.own.get(routine, (0, 0))
+			total = sum(sites.values())
+			for address, calls in sites.items():
+				share = (instructions * calls / total, cycles * calls / total)
+				charged_at[address] = share
+				self.add(self.charged, self.words[address], *share)
+		self.total = sum(cycles for instructions, cycles in self.own.values())
+		#(line, iterations, instructions, cycles) of each loop
+		self.loops = []
+		for jump in source_map['loops']:
+			start = memory[jump + 1]
+			instructions = cycles = 0
+			for address in range(start, jump + 2):
+				name = NAMES.get(memory[address])
+				if name is not None and executed[address]:
+					instructions += executed[address]
+					cycles += executed[address] * CYCLES[name]
+				if address in charged_at:
+					instructions += charged_at[address][0]
+					cycles += charged_at[address][1]
+			self.loops.append((self.words[jump], executed[jump], instructions, cycles))
+
+	def add(self, table, key, instructions, cycles):
+		entry = table.setdefault(key, [0, 0])
+		entry[0] += instructions
+		entry[1] += cycles
+
+	def share(self, cycles):
+		return 100 * cycles / self.total if self.total else 0
+
+	def text(self, source):
+		#the source annotated line by line, then the routines, the rest and the loops by cycles
+		rows = ['{line:>5} {instructions:>12} {cycles:>12} {calls:>12} {share:>6}  source'.format(
+			line='line', instructions='instructions', cycles='cycles', calls='~in calls', share='%')]
+		loops = {}
+		for line, iterations, instructions, cycles in self.loops:
+			loops.setdefault(line, []).append((iterations, cycles))
+		for number, text in enumerate(source.splitlines(), 1):
+			instructions, cycles = self.own.get(number, (0, 0))
+			called = self.charged.get(number, (0, 0))[1]
+			if instructions or called:
+				row = '{line:>5} {instructions:>12} {cycles:>12} {calls:>12} {share:>6.1f}  {text}'.format(
+					line=number, instructions=instructions, cycles=cycles, calls=round(called) if called else '',
+					share=self.share(cycles + called), text=text)
+			else:
+				row = '{line:>5} {blank:>45}  {text}'.format(line=number, blank='', text=text)
+			for iterations, inside in loops.get(number, ()):
+				row += '    <- {iterations} iterations, {cycles} cycles inside ({share:.1f}%)'.format(
+					iterations=iterations, cycles=round(inside), share=self.share(inside))
+			rows.append(row)
+		rows.append('')
+		for routine, sites in sorted(self.calls.items()):
+			instructions, cycles = self.own.get(routine, (0, 0))
+			lines = sorted(set(self.words[address] for address in sites))
+			rows.append('{routine}: {calls} calls from line{s} {lines}, {instructions} instructions, {cycles} cycles ({share:.1f}%)'.format(
+				routine=routine, calls=sum(sites.values()), s='s' if len(lines) > 1 else '', lines=', '.join(map(str, lines)),
+				instructions=instructions, cycles=cycles, share=self.share(cycles)))
+		if None in self.own:
+			instructions, cycles = self.own[None]
+			rows.append('outside any statement (HLT): {instructions} instructions, {cycles} cycles'.format(instructions=instructions, cycles=cycles))
+		rows.append('total: {cycles} cycles'.format(cycles=self.total))
+		if self.loops:
+			rows.append('')
+			rows.append('loops by cycles inside:')
+			for line, iterations, instructions, cycles in sorted(self.loops, key=lambda loop: -loop[3]):
+				text = source.splitlines()[line - 1].strip() if 0 < line <= len(source.splitlines()) else ''
+				rows.append('{line:>5} {iterations:>10} iterations {cycles:>12} cycles {share:>6.1f}%  {text}'.format(
+					line=line, iterations=iterations, cycles=round(cycles), share=self.share(cycles), text=text))
+		return '\n'.join(rows) + '\n'
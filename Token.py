@@ -1,4 +1,6 @@
 class Token(object):
+	__slots__ = ('type', 'value', 'line_number')
+
 	def __init__(self, type, value, line_number):
 		self.type = type
 		self.value = value
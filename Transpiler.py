@@ -0,0 +1,356 @@
+from Lexer import *
+from AST import UnaryOp, iter_child_nodes
+from FastLexer import FastLexer
+from IterativeParser import IterativeParser
+from SymbolTable import SymbolTable
+from NodeVisitor import NodeVisitor
+import hashlib
+import importlib.util
+import marshal
+import os
+import re
+
+#the modules whose code decides the Python a program is transpiled to, any change to them is a new version
+SOURCES = (
+	'Token.py', 'Lexer.py', 'FastLexer.py', 'AST.py', 'Parser.py', 'IterativeParser.py', 'NodeVisitor.py',
+	'Optimizer.py', 'SymbolTable.py', 'Transpiler.py'
+)
+#program variables are locals of one function, prefixed so no name is a Python keyword or builtin
+LOCAL = 'v_{name}'
+#the variable named by NameError or UnboundLocalError, which only 3.10 and up give as e.name
+UNDECLARED = re.compile(r"'v_(\w+)'")
+
+OPERATORS = {
+	PLUS: '+',
+	MINUS: '-',
+	MUL: '*',
+	DIV: '//',
+	MOD: '%'
+}
+
+COMPARISONS = {
+	'LessThan': '<',
+	'LessThanEqual': '<=',
+	'GreaterThan': '>',
+	'GreaterThanEqual': '>=',
+	'EqualTo': '==',
+	'NotEqualTo': '!='
+}
+
+#how tightly Python binds each operator, an operand binding less tightly than its operator is parenthesized
+PRECEDENCE = {'or': 1, 'and': 2, 'not': 3, '+': 5, '-': 5, '*': 6, '//': 6, '%': 6}
+PRECEDENCE.update((op, 4) for op in COMPARISONS.values())
+#of comparisons, which chain rather than nest
+COMPARISON = 4
+#numbers, variables and what is already in parentheses or a call
+ATOM = 7
+#the operators that can be a right operand of the same precedence without parentheses: a + (b - c)
+#is a + b - c, but a * (b // c * d) is not a * b // c * d and every other operator is only left associative
+UNGROUPED = {
+	'+': ('+', '-'),
+	'and': ('and',),
+	'or': ('or',)
+}
+
+COMPOUND = {
+	'PlusEquals': '+=',
+	'MinusEquals': '-=',
+	'MulEquals': '*=',
+	'DivEquals': '//=',
+	'ModEquals': '%='
+}
+
+def step(elements, index, delta):
+	#++a[i] and --a[i] inside an expression, Python has no assignment expression for elements
+	elements[index] += delta
+	return elements[index]
+
+def version():
+	#a hash of the transpiler's own source files
+	digest = hashlib.sha256()
+	directory = os.path.dirname(os.path.abspath(__file__))
+	for name in SOURCES:
+		with open(os.path.join(directory, name), 'rb') as f:
+			digest.update(name.encode() + b'\0' + f.read())
+	return digest.hexdigest()
+
+class Transpiler(NodeVisitor):
+	#turns the tree from Parser.parse() into the source of a Python function, program(), doing
+	#what the Interpreter does: while is while, an array a list, ++x is x += 1 or (x := x + 1)
+	#inside an expression, / is //. Variables are the function's locals, so CPython runs it as it
+	#runs any function, see execute for the names the source expects
+	#
+	#a declaration still goes through a symbol table when it runs, for the error of declaring twice.
+	#Using a variable before its declaration ran is a NameError, reported as the Interpreter reports it,
+	#and a store to a variable not declared on every way there checks it first. Where one statement
+	#could fail in two ways, which error comes first can differ from the Interpreter.
+	#Python allows at most 20 loops and 100 blocks inside each other, deeper programs need the Interpreter
+	def __init__(self, parser, optimizer=None):
+		self.parser = parser
+		self.root = self.parser.parse()
+		if optimizer is not None:
+			self.root = optimizer.optimize(self.root)
+		self.check(self.root)
+		#names declared on every way to the statement being transpiled
+		self.declared = set()
+		self.temporaries = 0
+
+	def source(self):
+		lines = self.visit(self.root)
+		return 'def program():\n' + self.indent(lines)
+
+	def indent(self, lines):
+		return ''.join('\t' + line + '\n' for line in (lines or ['pass']))
+
+	def temporary(self):
+		self.temporaries += 1
+		return '_t{n}'.format(n=self.temporaries)
+
+	def statement(self, node):
+		#a statement's lines. ++ and -- are expressions too, only a statement can be x += 1
+		if node.__class__ is UnaryOp:
+			delta = '+= 1' if node.op.type == INCREMENTOR else '-= 1'
+			target = yield node.identifier
+			return ['{target} {delta}'.format(target=target, delta=delta)]
+		return (yield node)
+
+	def branch(self, node):
+		#lines of a statement that may not run: what it declares is not declared after it
+		declared = set(self.declared)
+		lines = yield self.statement(node)
+		self.declared = declared
+		return lines
+
+	def visit_Num(self, node):
+		return repr(node.value)
+
+	def visit_Var(self, node):
+		name = LOCAL.format(name=node.var_name)
+		if node.index is None:
+			return name
+		return self.element(name, node)
+
+	def element(self, name, node):
+		index = yield node.index
+		return '{name}[{index}]'.format(name=name, index=index)
+
+	def visit_BinOp(self, node):
+		return self.binary(OPERATORS[node.op.type], node)
+
+	def binary(self, op, node):
+		#parenthesizing only where Python would read it otherwise, a long chain of one operator
+		#nesting parentheses would pass the parser's limit of 200
+		left = yield node.left
+		right = yield node.right
+		precedence = PRECEDENCE[op]
+		inner = self.operator(node.left)
+		if PRECEDENCE.get(inner, ATOM) < precedence or PRECEDENCE.get(inner) == COMPARISON == precedence:
+			left = '(' + left + ')'
+		inner = self.operator(node.right)
+		if PRECEDENCE.get(inner, ATOM) < precedence or PRECEDENCE.get(inner) == precedence and inner not in UNGROUPED.get(op, ()):
+			right = '(' + right + ')'
+		return '{left} {op} {right}'.format(left=left, op=op, right=right)
+
+	def operator(self, node):
+		#the Python operator node is transpiled to, None for one that needs no parentheses
+		name = node.__class__.__name__
+		if name == 'BinOp':
+			return OPERATORS[node.op.type]
+		elif name == 'CompoundCondition':
+			return 'or' if node.op.value == '||' else 'and'
+		elif name == 'Negator':
+			return 'not'
+		return COMPARISONS.get(name)
+
+	def visit_LessThan(self, node):
+		return self.binary(COMPARISONS['LessThan'], node)
+
+	def visit_LessThanEqual(self, node):
+		return self.binary(COMPARISONS['LessThanEqual'], node)
+
+	def visit_GreaterThan(self, node):
+		return self.binary(COMPARISONS['GreaterThan'], node)
+
+	def visit_GreaterThanEqual(self, node):
+		return self.binary(COMPARISONS['GreaterThanEqual'], node)
+
+	def visit_EqualTo(self, node):
+		return self.binary(COMPARISONS['EqualTo'], node)
+
+	def visit_NotEqualTo(self, node):
+		return self.binary(COMPARISONS['NotEqualTo'], node)
+
+	def visit_CompoundCondition(self, node):
+		return self.binary('or' if node.op.value == '||' else 'and', node)
+
+	def visit_Negator(self, node):
+		right = yield node.right
+		if PRECEDENCE.get(self.operator(node.right), ATOM) < PRECEDENCE['not']:
+			right = '(' + right + ')'
+		return 'not {right}'.format(right=right)
+
+	def visit_UnaryOp(self, node):
+		#as an expression, the value after stepping
+		delta = 1 if node.op.type == INCREMENTOR else -1
+		name = LOCAL.format(name=node.identifier.var_name)
+		if node.identifier.index is None:
+			return '({name} := {name} + {delta})'.format(name=name, delta=delta)
+		index = yield node.identifier.index
+		return '_step({name}, {index}, {delta})'.format(name=name, index=index, delta=delta)
+
+	def visit_Compound(self, node):
+		lines = []
+		for child in node.children:
+			lines.extend((yield self.statement(child)))
+		return lines
+
+	def visit_Output(self, node):
+		expr = yield node.expr
+		return ['print({expr})'.format(expr=expr)]
+
+	def visit_Loop(self, node):
+		condition = yield node.condition
+		body = yield self.branch(node.body)
+		return ['while {condition}:'.format(condition=condition)] + self.indent(body).splitlines()
+
+	def visit_If(self, node):
+		condition = yield node.condition
+		body = yield self.branch(node.body)
+		lines = ['if {condition}:'.format(condition=condition)] + self.indent(body).splitlines()
+		if node.else_node is not None:
+			after = yield self.branch(node.else_node.after)
+			if node.else_node.after.__class__.__name__ == 'If':
+				#else if is elif, so long chains do not nest
+				lines.append('el' + after[0])
+				lines.extend(after[1:])
+			else:
+				lines.append('else:')
+				lines.extend(self.indent(after).splitlines())
+		return lines
+
+	def visit_Else(self, node):
+		return (yield self.statement(node.after))
+
+	def visit_Declarative(self, node):
+		name = node.var.var_name
+		lines = ['_symtab.declare({name!r})'.format(name=name)]
+		if node.var.index is not None:
+			length = yield node.var.index
+			lines.append('{local} = [0] * {length}'.format(local=LOCAL.format(name=name), length=length))
+		else:
+			lines.append('{local} = 0'.format(local=LOCAL.format(name=name)))
+		self.declared.add(name)
+		if node.assigned is not None:
+			lines.extend((yield self.statement(node.assigned)))
+		return lines
+
+	def visit_Assign(self, node):
+		target = node.left
+		name = LOCAL.format(name=target.var_name)
+		index = None
+		lines = []
+		if target.index is not None:
+			index = yield target.index
+			if type(target.index).__name__ != 'Num' and (self.effects(target.index) or self.effects(node.right)):
+				#the index is calculated before the value, as the Interpreter does, where Python
+				#calculates the value of a[i] = v first
+				temporary = self.temporary()
+				lines.append('{temporary} = {index}'.format(temporary=temporary, index=index))
+				index = temporary
+		value = yield node.right
+		if target.var_name in self.declared:
+			stored = name if index is None else '{name}[{index}]'.format(name=name, index=index)
+			lines.append('{stored} = {value}'.format(stored=stored, value=value))
+			return lines
+		#the value first, then whether the target was declared, then the store
+		temporary = self.temporary()
+		lines.append('{temporary} = {value}'.format(temporary=temporary, value=value))
+		lines.extend([
+			'try:',
+			'\t' + name,
+			'except NameError:',
+			'\t_symtab.assign({name!r}, {temporary}, None)'.format(name=target.var_name, temporary=temporary)
+		])
+		stored = name if index is None else '{name}[{index}]'.format(name=name, index=index)
+		lines.append('{stored} = {temporary}'.format(stored=stored, temporary=temporary))
+		return lines
+
+	def effects(self, node):
+		#whether calculating node can change a variable, only ++ and -- can
+		stack = [node]
+		while stack:
+			node = stack.pop()
+			if node.__class__ is UnaryOp:
+				return True
+			stack.extend(iter_child_nodes(node))
+		return False
+
+	def compound(self, node):
+		#x op= y reads x before calculating y, as the Interpreter does
+		target = yield node.left
+		value = yield node.right
+		return ['{target} {op} {value}'.format(target=target, op=COMPOUND[type(node).__name__], value=value)]
+
+	def visit_PlusEquals(self, node):
+		return self.compound(node)
+
+	def visit_MinusEquals(self, node):
+		return self.compound(node)
+
+	def visit_MulEquals(self, node):
+		return self.compound(node)
+
+	def visit_DivEquals(self, node):
+		return self.compound(node)
+
+	def visit_ModEquals(self, node):
+		return self.compound(node)
+
+def execute(code):
+	#runs the code object of a transpiled program, with the names its source expects
+	namespace = {'_symtab': SymbolTable(), '_step': step}
+	exec(code, namespace)
+	try:
+		namespace['program']()
+	except NameError as e:
+		match = UNDECLARED.search(str(e))
+		if match is None:
+			raise
+		raise Exception('Variable: {name} not declared'.format(name=match.group(1))) from None
+
+class TranspileCache:
+	#compiled programs on disk, one file per source text, so running a program again skips lexing,
+	#parsing and transpiling. The key is a hash of the text, whether it was optimized, the transpiler's
+	#version and the Python version, code objects are only readable by the Python that wrote them
+	def __init__(self, directory):
+		self.directory = directory
+		self.version = version()
+		self.hits = 0
+		self.misses = 0
+
+	def key(self, text, optimize):
+		digest = hashlib.sha256()
+		digest.update(importlib.util.MAGIC_NUMBER)
+		digest.update('{version} {optimize}\n'.format(version=self.version, optimize=optimize).encode())
+		digest.update(text.encode())
+		return digest.hexdigest()
+
+	def code(self, text, optimizer=None):
+		#the code object of the program in text, from the cache or transpiled and stored there
+		path = os.path.join(self.directory, self.key(text, optimizer is not None) + '.marshal')
+		try:
+			with open(path, 'rb') as f:
+				code = marshal.load(f)
+			self.hits += 1
+			return code
+		except (OSError, EOFError, ValueError, TypeError):
+			pass
+		self.misses += 1
+		code = compile(Transpiler(IterativeParser(FastLexer(text)), optimizer).source(), '<transpiled>', 'exec')
+		os.makedirs(self.directory, exist_ok=True)
+		#written under another name and renamed, so no reader sees half a file
+		partial = '{path}.{pid}'.format(path=path, pid=os.getpid())
+		with open(partial, 'wb') as f:
+			marshal.dump(code, f)
+		os.replace(partial, path)
+		return code
@@ -0,0 +1,280 @@
+from Lexer import *
+from AST import *
+import operator
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+#whether loops can be vectorized at all, NumPy is optional
+AVAILABLE = numpy is not None
+#fewer iterations than this run element by element, converting the arrays costs more
+MINIMUM_ITERATIONS = 16
+#values this big do not fit NumPy's int64, the loop runs element by element instead
+LIMIT = 1 << 63
+#deeper expressions are left to the Interpreter, which walks them without recursion
+MAXIMUM_DEPTH = 64
+
+OPERATORS = {
+	PLUS: operator.add,
+	MINUS: operator.sub,
+	MUL: operator.mul,
+	DIV: operator.floordiv,
+	MOD: operator.mod
+}
+
+#the operator of a compound assignment
+COMPOUND = {
+	PlusEquals: PLUS,
+	MinusEquals: MINUS,
+	MulEquals: MUL,
+	DivEquals: DIV,
+	ModEquals: MOD
+}
+
+class Fallback(Exception):
+	pass
+
+class Vectorizer:
+	#runs counted loops over arrays as whole array NumPy operations, for the Interpreter:
+	#
+	#   while (i < n) {          i <= n, n > i and n >= i too, n a number or a variable
+	#       a[i] = a[i] + k;     map or fill: the element at the counter set from an expression
+	#       b[i] *= 2;           the compound assignments too
+	#       s += a[i] * b[i];    reduce: a variable added to or taken from, s = s + ... and s = s - ... too
+	#       ++i;                 the counter stepped by one, last: ++i, i++, i += 1 or i = i + 1
+	#   }
+	#
+	#expressions are numbers, the counter, variables the loop does not assign and array elements
+	#at exactly the counter, under + - * / %. Every element an iteration touches is at the counter,
+	#so each statement can run over the whole range before the next one and the values come out the same
+	#
+	#the results have to be the Interpreter's unbounded integers: arrays stay Python lists, converted
+	#around the loop, and a loop that could leave int64, divide by zero, reach outside an array or use
+	#what is not declared runs element by element instead, with whatever error that gives
+	def __init__(self):
+		#the plan of every loop seen by node, None for loops that do not have the shape
+		self.plans = {}
+		self.vectorized = 0
+
+	def run(self, node, values):
+		#True when the loop ran, False when it is left to the Interpreter, with nothing changed
+		try:
+			plan = self.plans[node]
+		except KeyError:
+			try:
+				plan = self.recognize(node)
+			except Fallback:
+				plan = None
+			self.plans[node] = plan
+		if plan is None:
+			return False
+		try:
+			self.execute(plan, values)
+		except Fallback:
+			return False
+		self.vectorized += 1
+		return True
+
+	def recognize(self, node):
+		#(counter, bound, inclusive, statements, scalars, arrays, written), or Fallback
+		condition = node.condition
+		if condition.__class__ in (LessThan, LessThanEqual):
+			counter, bound = condition.left, condition.right
+		elif condition.__class__ in (GreaterThan, GreaterThanEqual):
+			counter, bound = condition.right, condition.left
+		else:
+			raise Fallback()
+		inclusive = condition.__class__ in (LessThanEqual, GreaterThanEqual)
+		if not self.is_variable(counter, None):
+			raise Fallback()
+		if not (bound.__class__ is Num or self.is_variable(bound, None)):
+			raise Fallback()
+		body = node.body
+		if body.__class__ is not Compound or len(body.children) < 2 or not self.step(body.children[-1], counter):
+			raise Fallback()
+		found = []
+		written = set()
+		reduced = set()
+		for statement in body.children[:-1]:
+			target = getattr(statement, 'left', None)
+			if target.__class__ is not Var:
+				raise Fallback()
+			if target.index is None:
+				for sign, expression in self.reduction(statement, target):
+					found.append(('reduce', target.slot, sign, expression))
+				reduced.add(target.slot)
+			elif self.is_variable(target.index, counter.var_name):
+				if statement.__class__ is Assign:
+					found.append(('map', target.slot, None, statement.right))
+				elif statement.__class__ in COMPOUND:
+					found.append(('map', target.slot, COMPOUND[statement.__class__], statement.right))
+				else:
+					raise Fallback()
+				written.add(target.slot)
+			else:
+				raise Fallback()
+		assigned = reduced | {counter.slot}
+		if written & assigned or counter.slot in reduced:
+			raise Fallback()
+		scalars = set()
+		arrays = set(written)
+		if bound.__class__ is Var:
+			scalars.add(bound.slot)
+		statements = []
+		for kind, slot, extra, expression in found:
+			self.check(expression, counter, scalars, arrays)
+			expression = self.convert(expression, counter)
+			if kind == 'map' and extra is not None:
+				#a[i] op= x is a[i] = a[i] op x
+				expression = ('operation', extra, ('element', slot), expression)
+			statements.append((kind, slot, extra, expression))
+		if scalars & (assigned | arrays):
+			raise Fallback()
+		return (counter, bound, inclusive, statements, scalars, arrays, written)
+
+	def is_variable(self, node, name):
+		#whether node is a plain variable, named name unless that is None
+		return node.__class__ is Var and node.index is None and (name is None or node.var_name == name)
+
+	def step(self, statement, counter):
+		#whether statement adds one to the counter
+		name = counter.var_name
+		def is_one(node):
+			return node.__class__ is Num and node.value == 1
+		if statement.__class__ is UnaryOp:
+			return statement.op.type == INCREMENTOR and self.is_variable(statement.identifier, name)
+		elif statement.__class__ is PlusEquals:
+			return self.is_variable(statement.left, name) and is_one(statement.right)
+		elif statement.__class__ is Assign and statement.right.__class__ is BinOp and statement.right.op.type == PLUS:
+			right = statement.right
+			return self.is_variable(statement.left, name) and (
+				(self.is_variable(right.left, name) and is_one(right.right)) or (is_one(right.left) and self.is_variable(right.right, name)))
+		return False
+
+	def reduction(self, statement, target):
+		#the (sign, expression) terms a statement adds to target
+		name = target.var_name
+		if statement.__class__ is PlusEquals:
+			return [(1, statement.right)]
+		elif statement.__class__ is MinusEquals:
+			return [(-1, statement.right)]
+		elif statement.__class__ is Assign and statement.right.__class__ is BinOp:
+			right = statement.right
+			if right.op.type == PLUS and self.is_variable(right.left, name):
+				return [(1, right.right)]
+			elif right.op.type == PLUS and self.is_variable(right.right, name):
+				return [(1, right.left)]
+			elif right.op.type == MINUS and self.is_variable(right.left, name):
+				return [(-1, right.right)]
+		raise Fallback()
+
+	def check(self, root, counter, scalars, arrays):
+		#whether an expression has the shape, collecting the variables and arrays it reads
+		stack = [(root, 1)]
+		while stack:
+			node, depth = stack.pop()
+			if depth > MAXIMUM_DEPTH:
+				raise Fallback()
+			if node.__class__ is Num or self.is_variable(node, counter.var_name):
+				continue
+			elif self.is_variable(node, None):
+				scalars.add(node.slot)
+			elif node.__class__ is Var and self.is_variable(node.index, counter.var_name):
+				arrays.add(node.slot)
+			elif node.__class__ is BinOp and node.op.type in OPERATORS:
+				stack.append((node.left, depth + 1))
+				stack.append((node.right, depth + 1))
+			else:
+				raise Fallback()
+
+	def convert(self, node, counter):
+		#a checked expression as nested tuples
+		if node.__class__ is Num:
+			return ('number', node.value)
+		elif self.is_variable(node, counter.var_name):
+			return ('counter',)
+		elif node.__class__ is Var and node.index is None:
+			return ('scalar', node.slot)
+		elif node.__class__ is Var:
+			return ('element', node.slot)
+		return ('operation', node.op.type, self.convert(node.left, counter), self.convert(node.right, counter))
+
+	def execute(self, plan, values):
+		counter, bound, inclusive, statements, scalars, arrays, written = plan
+		start = values[counter.slot]
+		stop = bound.value if bound.__class__ is Num else values[bound.slot]
+		if start.__class__ is not int or stop.__class__ is not int:
+			raise Fallback()
+		if inclusive:
+			stop += 1
+		if stop - start < MINIMUM_ITERATIONS:
+			raise Fallback()
+		for slot in scalars:
+			value = values[slot]
+			if value.__class__ is not int or not -LIMIT < value < LIMIT:
+				raise Fallback()
+		working = {}
+		for slot in arrays:
+			elements = values[slot]
+			if elements.__class__ is not list or start < 0 or stop > len(elements):
+				raise Fallback()
+			try:
+				working[slot] = numpy.array(elements[start:stop], dtype=numpy.int64)
+			except OverflowError:
+				raise Fallback()
+		totals = {}
+		for kind, slot, extra, expression in statements:
+			if kind == 'reduce' and values[slot].__class__ is not int:
+				raise Fallback()
+			result, limit = self.evaluate(expression, values, working, start, stop)
+			if kind == 'map':
+				if result.__class__ is not numpy.ndarray:
+					result = numpy.full(stop - start, result, dtype=numpy.int64)
+				working[slot] = result
+			else:
+				if limit * (stop - start) >= LIMIT:
+					raise Fallback()
+				if result.__class__ is numpy.ndarray:
+					total = int(result.sum())
+				else:
+					total = result * (stop - start)
+				totals[slot] = totals.get(slot, 0) + extra * total
+		#nothing is written back until every statement has been worked out
+		for slot in written:
+			values[slot][start:stop] = working[slot].tolist()
+		for slot, total in totals.items():
+			values[slot] += total
+		values[counter.slot] = stop
+
+	def evaluate(self, expression, values, working, start, stop):
+		#(value, limit): an int64 array or a Python int, and a bound on the size of its elements
+		kind = expression[0]
+		if kind == 'number':
+			value = expression[1]
+			if not -LIMIT < value < LIMIT:
+				raise Fallback()
+			return value, abs(value)
+		elif kind == 'counter':
+			return numpy.arange(start, stop, dtype=numpy.int64), max(abs(start), abs(stop))
+		elif kind == 'scalar':
+			return values[expression[1]], abs(values[expression[1]])
+		elif kind == 'element':
+			elements = working[expression[1]]
+			return elements, max(abs(int(elements.min())), abs(int(elements.max())))
+		op = expression[1]
+		left, left_limit = self.evaluate(expression[2], values, working, start, stop)
+		right, right_limit = self.evaluate(expression[3], values, working, start, stop)
+		if op == PLUS or op == MINUS:
+			limit = left_limit + right_limit
+		elif op == MUL:
+			limit = left_limit * right_limit
+		else:
+			if (right == 0).any() if right.__class__ is numpy.ndarray else right == 0:
+				raise Fallback()
+			#a quotient is no bigger than what is divided, a remainder smaller than the divisor
+			limit = left_limit if op == DIV else right_limit
+		if limit >= LIMIT:
+			raise Fallback()
+		return OPERATORS[op](left, right), limit
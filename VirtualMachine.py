@@ -0,0 +1,127 @@
+from BytecodeCompiler import *
+
+class VirtualMachine:
+	#stack machine for the code produced by BytecodeCompiler, slots are its slots by name.
+	#A slot is None until its declaration runs
+	def __init__(self, code, slots):
+		self.code = code
+		self.slots = [None] * len(slots)
+		self.names = sorted(slots, key=slots.get)
+
+	def run(self):
+		#the hot loop, everything it touches is bound to a local
+		#and the opcode tests are ordered by how often they come up
+		code = self.code
+		slots = self.slots
+		operators = OPERATORS
+		stack = []
+		push = stack.append
+		pop = stack.pop
+		pc = 0
+		end = len(code)
+		while pc < end:
+			op = code[pc]
+			if op == LOAD:
+				push(slots[code[pc + 1]])
+				pc += 2
+			elif op == BINARY_CONST:
+				stack[-1] = operators[code[pc + 1]](stack[-1], code[pc + 2])
+				pc += 3
+			elif op == STORE:
+				slots[code[pc + 1]] = pop()
+				pc += 2
+			elif op == BRANCH_CONST:
+				if operators[code[pc + 1]](pop(), code[pc + 2]):
+					pc = code[pc + 3]
+				else:
+					pc += 4
+			elif op == BINARY:
+				right = pop()
+				stack[-1] = operators[code[pc + 1]](stack[-1], right)
+				pc += 2
+			elif op == BRANCH:
+				right = pop()
+				if operators[code[pc + 1]](pop(), right):
+					pc = code[pc + 2]
+				else:
+					pc += 3
+			elif op == CONST:
+				push(code[pc + 1])
+				pc += 2
+			elif op == INC:
+				slots[code[pc + 1]] += code[pc + 2]
+				pc += 3
+			elif op == JUMP:
+				pc = code[pc + 1]
+			elif op == LOAD_ELEM:
+				stack[-1] = slots[code[pc + 1]][stack[-1]]
+				pc += 2
+			elif op == STORE_ELEM:
+				value = pop()
+				slots[code[pc + 1]][pop()] = value
+				pc += 2
+			elif op == INC_VALUE:
+				slot = code[pc + 1]
+				slots[slot] += code[pc + 2]
+				push(slots[slot])
+				pc += 3
+			elif op == INC_ELEM:
+				slots[code[pc + 1]][pop()] += code[pc + 2]
+				pc += 3
+			elif op == INC_ELEM_VALUE:
+				array = slots[code[pc + 1]]
+				index = pop()
+				array[index] += code[pc + 2]
+				push(array[index])
+				pc += 3
+			elif op == DUP:
+				push(stack[-1])
+				pc += 1
+			elif op == JUMP_IF_TRUE:
+				if pop():
+					pc = code[pc + 1]
+				else:
+					pc += 2
+			elif op == JUMP_IF_FALSE:
+				if pop():
+					pc += 2
+				else:
+					pc = code[pc + 1]
+			elif op == JUMP_IF_TRUE_OR_POP:
+				if stack[-1]:
+					pc = code[pc + 1]
+				else:
+					pop()
+					pc += 2
+			elif op == JUMP_IF_FALSE_OR_POP:
+				if stack[-1]:
+					pop()
+					pc += 2
+				else:
+					pc = code[pc + 1]
+			elif op == NOT:
+				stack[-1] = not stack[-1]
+				pc += 1
+			elif op == OUTPUT:
+				print(pop())
+				pc += 1
+			elif op == CHECK:
+				if slots[code[pc + 1]] is None:
+					raise Exception('Variable: {name} not declared'.format(name=self.names[code[pc + 1]]))
+				pc += 2
+			elif op == DECLARE:
+				if slots[code[pc + 1]] is not None:
+					raise Exception('Var {var_name} is already declared.'.format(var_name=self.names[code[pc + 1]]))
+				slots[code[pc + 1]] = 0
+				pc += 2
+			elif op == NEW_ARRAY:
+				if slots[code[pc + 1]] is not None:
+					raise Exception('Var {var_name} is already declared.'.format(var_name=self.names[code[pc + 1]]))
+				slots[code[pc + 1]] = [0] * code[pc + 2]
+				pc += 3
+			elif op == CHECK_STORE:
+				if slots[code[pc + 1]] is None:
+					raise Exception('Var {var_name} is not declared.'.format(var_name=self.names[code[pc + 1]]))
+				pc += 2
+			else:
+				raise Exception('Unknown opcode {op} at {pc}'.format(op=op, pc=pc))
@@ -0,0 +1,470 @@
+from Lexer import *
+from Parser import Parser
+from IterativeParser import IterativeParser
+from AST import *
+from NodeVisitor import NodeVisitor
+from Interpreter import Interpreter
+from CodeGenerator import CodeGenerator
+from Simulator import Simulator
+from BytecodeCompiler import BytecodeCompiler
+from VirtualMachine import VirtualMachine
+from ClosureCompiler import ClosureCompiler
+from Transpiler import Transpiler, TranspileCache, execute
+from Compiler import Compiler
+from CompileCache import CompileCache
+from Vectorizer import AVAILABLE as VECTORIZER_AVAILABLE
+from FastLexer import FastLexer
+from Token import Token
+import AST as ast_module
+import FastLexer as fast_lexer_module
+import Parser as parser_module
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+import timeit
+import tracemalloc
+from types import GeneratorType
+
+def loop_program(iterations):
+	return '''
+declare i = 0;
+declare s = 0;
+declare a[10];
+while (i < {iterations}) {{
+	a[i % 10] += i;
+	s = s + i * 2 - 1;
+	if (s > 1000000) {{ s -= 1000000; }} else {{ ++s; }}
+	++i;
+}}
+output s;
+'''.format(iterations=iterations)
+
+def parse(text):
+	return Parser(Lexer(text)).parse()
+
+def best_of(repeat, function):
+	#best wall time of several runs, the least disturbed by everything else on the machine
+	best = None
+	for count in range(repeat):
+		start = time.perf_counter()
+		function()
+		elapsed = time.perf_counter() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+class LegacyInterpreter(Interpreter):
+	#NodeVisitor.visit as it was before the dispatch table, children are visited recursively
+	def visit(self, node):
+		method_name = 'visit_' + type(node).__name__
+		visitor = getattr(self, method_name, self.generic_visit)
+		value = visitor(node)
+		if isinstance(value, GeneratorType):
+			routine = value
+			value = None
+			try:
+				while True:
+					value = self.visit(routine.send(value))
+			except StopIteration as finished:
+				return finished.value
+		return value
+
+def dispatch(args):
+	node = Num(Token(INTEGER, 1, 1))
+	cached = Interpreter(Parser(Lexer('declare x;')))
+	legacy = LegacyInterpreter(Parser(Lexer('declare x;')))
+	calls = args.calls
+	for name, visitor in (('getattr', legacy), ('cached', cached)):
+		elapsed = min(timeit.repeat(lambda: visitor.visit(node), number=calls, repeat=args.repeat))
+		print('{name:>8}: {ns:8.1f} ns per visit'.format(name=name, ns=elapsed / calls * 1e9))
+
+	text = loop_program(args.iterations)
+	for name, interpreter in (('getattr', LegacyInterpreter), ('cached', Interpreter)):
+		def run():
+			with contextlib.redirect_stdout(io.StringIO()):
+				interpreter(Parser(Lexer(text)))
+		elapsed = best_of(args.repeat, run)
+		print('{name:>8}: {seconds:8.3f} s for {iterations} loop iterations'.format(name=name, seconds=elapsed, iterations=args.iterations))
+
+def sized_program(size):
+	#repeats a block of representative code until the text is at least size bytes
+	block = loop_program(1000).replace('declare ', '') + '/* block comment\n spanning lines */ x_long_identifier_name = 1234567 + y; // trailing\n'
+	return block * (size // len(block) + 1)
+
+def drain(lexer):
+	token = lexer.get_next_token()
+	while token.type != EOF:
+		token = lexer.get_next_token()
+
+def lexer(args):
+	text = sized_program(int(args.megabytes * 1000000))
+	megabytes = len(text.encode()) / 1e6
+	print('{size:.1f} MB of source'.format(size=megabytes))
+	for name, lexer_class in (('Lexer', Lexer), ('FastLexer', FastLexer)):
+		elapsed = best_of(args.repeat, lambda: drain(lexer_class(text)))
+		print('{name:>10}: {rate:8.2f} MB/s'.format(name=name, rate=megabytes / elapsed))
+
+	#peak memory of lexing from a string already in memory against streaming from the file
+	handle, path = tempfile.mkstemp(suffix='.txt')
+	with os.fdopen(handle, 'w') as f:
+		f.write(text)
+	del text
+	try:
+		for name in ('read()', 'stream'):
+			tracemalloc.start()
+			with open(path, 'r') as f:
+				drain(FastLexer(f.read() if name == 'read()' else f))
+			peak = tracemalloc.get_traced_memory()[1]
+			tracemalloc.stop()
+			print('{name:>10}: {peak:8.2f} MB peak'.format(name=name, peak=peak / 1e6))
+	finally:
+		os.remove(path)
+
+def statements_program(statements):
+	#roughly one statement per line: assignments, compound assignments, ifs and loops over a few variables
+	lines = ['declare v{n} = {n};'.format(n=n) for n in range(8)]
+	shapes = (
+		'v{a} = (v{b} + {k}) * v{c} - {k};',
+		'v{a} += v{b} % 7;',
+		'if (v{a} < {k} && v{b} != v{c}) {{ ++v{a}; }}',
+		'while (v{a} > {k}) --v{a};',
+		'output v{a} + v{b};'
+	)
+	for n in range(statements - len(lines)):
+		shape = shapes[n % len(shapes)]
+		lines.append(shape.format(a=n % 8, b=(n + 3) % 8, c=(n + 5) % 8, k=n % 100))
+	return '\n'.join(lines)
+
+def dict_class(cls):
+	#the same node or token as a plain object with a __dict__, op stored again as token, like before __slots__
+	def __init__(self, *args, **kwargs):
+		cls.__init__(self, *args, **kwargs)
+		if hasattr(self, 'op'):
+			self.token = self.op
+	return type(cls.__name__, (object,), {'__init__': __init__})
+
+@contextlib.contextmanager
+def dict_representation():
+	#swaps dict based classes into the modules that build tokens and nodes
+	patched = []
+	for module in (parser_module, fast_lexer_module):
+		for name, value in list(vars(module).items()):
+			if isinstance(value, type) and (value is Token or issubclass(value, ast_module.AST)) and value is not ast_module.AST:
+				patched.append((module, name, value))
+				setattr(module, name, dict_class(value))
+	try:
+		yield
+	finally:
+		for module, name, value in patched:
+			setattr(module, name, value)
+
+def count_nodes(root):
+	count = 0
+	stack = [root]
+	while stack:
+		count += 1
+		stack.extend(ast_module.iter_child_nodes(stack.pop()))
+	return count
+
+def measure_tree(text):
+	tracemalloc.start()
+	root = parser_module.Parser(fast_lexer_module.FastLexer(text)).parse()
+	size = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	return root, size
+
+def memory(args):
+	text = statements_program(args.statements)
+	print('{statements} statements, {size:.1f} MB of source'.format(statements=args.statements, size=len(text) / 1e6))
+	with dict_representation():
+		root, before = measure_tree(text)
+	del root
+	root, after = measure_tree(text)
+	#both trees have the same shape, only the slotted one can be walked generically
+	nodes = count_nodes(root)
+	del root
+	for name, size in (('__dict__', before), ('__slots__', after)):
+		print('{name:>10}: {nodes} nodes, {total:8.1f} MB, {per_node:6.1f} bytes per node'.format(
+			name=name, nodes=nodes, total=size / 1e6, per_node=size / nodes))
+
+def nested_program(shape, depth):
+	if shape == 'parens':
+		return 'output ' + '(' * depth + '1' + ')' * depth + ';'
+	elif shape == 'conditions':
+		return 'if (' + '!(' * depth + 'x' + ')' * depth + ') x = 1;'
+	elif shape == 'blocks':
+		return 'while (x) {' * depth + '--x;' + '}' * depth
+	return 'if (x == 0) x = 1;' + ''.join(' else if (x == {n}) x = {n};'.format(n=n) for n in range(depth))
+
+class TokenReplay:
+	#hands out tokens lexed beforehand so only the parser is timed
+	def __init__(self, tokens):
+		self.get_next_token = iter(tokens).__next__
+
+class TreeReplay:
+	#hands out a tree parsed beforehand so only code generation is timed
+	def __init__(self, root):
+		self.root = root
+
+	def parse(self):
+		return self.root
+
+def nesting(args):
+	print('{shape:>10} {depth:>8} {recursive:>12} {iterative:>12}'.format(shape='shape', depth='depth', recursive='Parser', iterative='Iterative'))
+	for shape in ('parens', 'conditions', 'blocks', 'elseif'):
+		for depth in args.depths:
+			tokens = list(FastLexer(nested_program(shape, depth)).tokens())
+			times = []
+			for parser in (Parser, IterativeParser):
+				try:
+					times.append('{ms:10.2f}ms'.format(ms=best_of(args.repeat, lambda: parser(TokenReplay(tokens)).parse()) * 1000))
+				except RecursionError:
+					times.append('too deep')
+			print('{shape:>10} {depth:>8} {recursive:>12} {iterative:>12}'.format(shape=shape, depth=depth, recursive=times[0], iterative=times[1]))
+
+def depth(args):
+	#an expression nested depth levels deep, evaluated and compiled
+	print('{depth:>8} {recursive:>12} {iterative:>12} {generator:>12}'.format(depth='depth', recursive='recursive', iterative='Interpreter', generator='CodeGen'))
+	for depth in args.depths:
+		text = 'declare x = 1;\noutput ' + 'x + (' * depth + 'x' + ')' * depth + ';'
+		times = []
+		for run in (
+			lambda: LegacyInterpreter(IterativeParser(FastLexer(text))),
+			lambda: Interpreter(IterativeParser(FastLexer(text))),
+			lambda: CodeGenerator(IterativeParser(FastLexer(text))).generate()
+		):
+			try:
+				with contextlib.redirect_stdout(io.StringIO()):
+					times.append('{ms:10.2f}ms'.format(ms=best_of(args.repeat, run) * 1000))
+			except RecursionError:
+				times.append('too deep')
+		print('{depth:>8} {recursive:>12} {iterative:>12} {generator:>12}'.format(depth=depth, recursive=times[0], iterative=times[1], generator=times[2]))
+
+def loops(args):
+	#loops nested depth deep, compiled: time per level stays flat when compiling is linear
+	print('{depth:>8} {words:>8} {time:>12} {per_level:>12}'.format(depth='depth', words='words', time='CodeGen', per_level='per level'))
+	for depth in args.depths:
+		text = 'declare x = 0;\n' + 'while (x < 5) {\n' * depth + '++x;\n' + '}\n' * depth
+		root = IterativeParser(FastLexer(text)).parse()
+		words = len(CodeGenerator(TreeReplay(root)).generate())
+		elapsed = best_of(args.repeat, lambda: CodeGenerator(TreeReplay(root)).generate())
+		print('{depth:>8} {words:>8} {ms:10.2f}ms {us:10.2f}us'.format(depth=depth, words=words, ms=elapsed * 1000, us=elapsed / depth * 1e6))
+
+def simulator(args):
+	#compiled nested counting loops, the inner body runs outer * 250 times
+	text = '''
+declare i = 0;
+declare j = 0;
+declare s = 0;
+while (i < {outer}) {{
+	j = 0;
+	while (j < 250) {{
+		s = s + 3;
+		++j;
+	}}
+	++i;
+}}
+output s;
+'''.format(outer=args.outer)
+	commands = CodeGenerator(IterativeParser(FastLexer(text))).generate()
+	program = [command.data for command in commands]
+	machine = None
+	def run():
+		nonlocal machine
+		machine = Simulator(program)
+		machine.run()
+	elapsed = best_of(args.repeat, run)
+	print(machine.summary())
+	print('{rate:.2f} million instructions per second, {hz:.2f} MHz simulated'.format(
+		rate=machine.instructions / elapsed / 1e6, hz=machine.cycles / elapsed / 1e6))
+
+def routines(args):
+	#cycles an operation takes on the simulator over every pair of operands, or every left operand
+	#against a constant: the routines' loops run a fixed number of rounds, what varies is the adds
+	print('{operation:>10} {words:>6} {minimum:>8} {mean:>8} {maximum:>8}'.format(operation='operation', words='words', minimum='min', mean='mean', maximum='max'))
+	for operation in args.operations:
+		generator = CodeGenerator(Parser(Lexer('declare x;\ndeclare y;\noutput ' + operation + ';')))
+		program = [command.data for command in generator.generate()]
+		x = generator.symtab.lookup_address('x')
+		y = generator.symtab.lookup_address('y')
+		cycles = []
+		#the bare program, loading the operands and OUT and HLT, is taken off
+		empty = CodeGenerator(Parser(Lexer('declare x;\ndeclare y;\noutput x;')))
+		machine = Simulator([command.data for command in empty.generate()])
+		machine.run()
+		overhead = machine.cycles
+		divides = '/' in operation or '%' in operation
+		for left in range(0, 256, args.step):
+			for right in range(0, 256, args.step):
+				if divides and right == 0:
+					continue
+				machine = Simulator(program)
+				machine.memory[x] = left
+				machine.memory[y] = right
+				machine.run()
+				cycles.append(machine.cycles - overhead)
+		print('{operation:>10} {words:>6} {minimum:>8} {mean:>8.1f} {maximum:>8}'.format(
+			operation=operation, words=len(program), minimum=min(cycles), mean=sum(cycles) / len(cycles), maximum=max(cycles)))
+
+def array_program(length, shape):
+	#one counted loop over arrays of length elements, then a sum over the result so there is output
+	setup = 'declare a[{n}];\ndeclare b[{n}];\ndeclare i = 0;\ndeclare s = 0;\ndeclare k = 3;\n'.format(n=length)
+	loops = {
+		'fill': 'while (i < {n}) {{ a[i] = k; ++i; }}',
+		'map': 'while (i < {n}) {{ a[i] = a[i] * k + i; b[i] += a[i] % 7; ++i; }}',
+		'reduce': 'while (i < {n}) {{ s += a[i] * b[i] - i; ++i; }}'
+	}
+	return setup + loops[shape].format(n=length) + '\noutput s;\n'
+
+def arrays(args):
+	#array loops element by element, and as NumPy operations when NumPy is installed
+	if not VECTORIZER_AVAILABLE:
+		print('NumPy is not installed, only the element by element times are shown')
+	print('{shape:>8} {length:>8} {scalar:>12} {vector:>12}'.format(shape='loop', length='length', scalar='elements', vector='NumPy'))
+	for shape in ('fill', 'map', 'reduce'):
+		root = IterativeParser(FastLexer(array_program(args.length, shape))).parse()
+		times = []
+		for vectorize in (False, True):
+			if vectorize and not VECTORIZER_AVAILABLE:
+				times.append('-')
+				continue
+			def run():
+				with contextlib.redirect_stdout(io.StringIO()):
+					Interpreter(TreeReplay(root), vectorize=vectorize)
+			times.append('{ms:10.2f}ms'.format(ms=best_of(args.repeat, run) * 1000))
+		print('{shape:>8} {length:>8} {scalar:>12} {vector:>12}'.format(shape=shape, length=args.length, scalar=times[0], vector=times[1]))
+
+def nested_loops_program(outer):
+	return '''
+declare i = 0;
+declare j = 0;
+declare s = 0;
+while (i < {outer}) {{
+	j = 0;
+	while (j < 100) {{
+		if (j % 3 == 0 || j > 90) {{ s = s + j * i; }} else {{ s -= 1; }}
+		++j;
+	}}
+	++i;
+}}
+output s;
+'''.format(outer=outer)
+
+def modes(args):
+	#the same loop heavy programs walked as a tree, run as bytecode, as closures and as transpiled Python
+	#build is the time to make the closures, the others include building what they run
+	programs = (('loop', loop_program(args.iterations)), ('nested', nested_loops_program(args.iterations // 100)))
+	print('{program:>8} {tree:>12} {vm:>12} {closure:>12} {build:>12} {python:>12}'.format(program='program', tree='tree', vm='vm', closure='closure', build='build', python='python'))
+	for name, text in programs:
+		root = IterativeParser(FastLexer(text)).parse()
+		def tree():
+			Interpreter(TreeReplay(root), vectorize=False)
+		def vm():
+			compiler = BytecodeCompiler(TreeReplay(root))
+			VirtualMachine(compiler.compile(), compiler.slots).run()
+		def closure():
+			ClosureCompiler(TreeReplay(root)).compile()()
+		def python():
+			execute(compile(Transpiler(TreeReplay(root)).source(), name, 'exec'))
+		times = []
+		with contextlib.redirect_stdout(io.StringIO()):
+			for run in (tree, vm, closure, lambda: ClosureCompiler(TreeReplay(root)).compile(), python):
+				times.append('{ms:10.2f}ms'.format(ms=best_of(args.repeat, run) * 1000))
+		print('{program:>8} {tree:>12} {vm:>12} {closure:>12} {build:>12} {python:>12}'.format(
+			program=name, tree=times[0], vm=times[1], closure=times[2], build=times[3], python=times[4]))
+
+def transpile_cache(args):
+	#getting a large program ready to run: lexing, parsing, transpiling and compiling it, or loading it from the cache
+	text = statements_program(args.statements)
+	directory = tempfile.mkdtemp()
+	try:
+		cache = TranspileCache(directory)
+		cold = best_of(1, lambda: cache.code(text))
+		warm = best_of(args.repeat, lambda: cache.code(text))
+		print('{statements} statements: {cold:.2f}ms transpiled, {warm:.2f}ms from the cache ({hits} hits, {misses} misses)'.format(
+			statements=args.statements, cold=cold * 1000, warm=warm * 1000, hits=cache.hits, misses=cache.misses))
+	finally:
+		for name in os.listdir(directory):
+			os.remove(os.path.join(directory, name))
+		os.rmdir(directory)
+
+def compile_cache(args):
+	#compiling a program for the target machine with -O, or loading it from the cache
+	text = statements_program(args.statements)
+	directory = tempfile.mkdtemp()
+	try:
+		cache = CompileCache(directory)
+		compiler = Compiler(True, cache)
+		cold = best_of(args.repeat, lambda: Compiler(True).compile(text))
+		compiler.compile(text)
+		warm = best_of(args.repeat, lambda: compiler.compile(text))
+		print('{statements} statements: {cold:.2f}ms compiled, {warm:.2f}ms from the cache ({hits} hits, {misses} misses)'.format(
+			statements=args.statements, cold=cold * 1000, warm=warm * 1000, hits=cache.hits, misses=cache.misses))
+	finally:
+		for name in os.listdir(directory):
+			os.remove(os.path.join(directory, name))
+		os.rmdir(directory)
+
+def main():
+	argparser = argparse.ArgumentParser(description='Performance benchmarks for the compiler and interpreter.')
+	argparser.add_argument('--repeat', type=int, default=3)
+	benchmarks = argparser.add_subparsers(dest='benchmark', required=True)
+
+	dispatch_parser = benchmarks.add_parser('dispatch', help='NodeVisitor.visit dispatch cost')
+	dispatch_parser.add_argument('--calls', type=int, default=1000000)
+	dispatch_parser.add_argument('--iterations', type=int, default=20000)
+	dispatch_parser.set_defaults(run=dispatch)
+
+	lexer_parser = benchmarks.add_parser('lexer', help='tokenizer throughput')
+	lexer_parser.add_argument('--megabytes', type=float, default=2)
+	lexer_parser.set_defaults(run=lexer)
+
+	memory_parser = benchmarks.add_parser('memory', help='bytes per AST node, including tokens')
+	memory_parser.add_argument('--statements', type=int, default=1000000)
+	memory_parser.set_defaults(run=memory)
+
+	nesting_parser = benchmarks.add_parser('nesting', help='parse time against nesting depth, recursive and iterative parser')
+	nesting_parser.add_argument('--depths', type=int, nargs='+', default=[10, 100, 300, 1000, 10000, 100000])
+	nesting_parser.set_defaults(run=nesting)
+
+	depth_parser = benchmarks.add_parser('depth', help='visiting time against tree depth, recursive and explicit stack')
+	depth_parser.add_argument('--depths', type=int, nargs='+', default=[10, 100, 300, 1000, 10000])
+	depth_parser.set_defaults(run=depth)
+
+	loops_parser = benchmarks.add_parser('loops', help='code generation time against loop nesting depth')
+	loops_parser.add_argument('--depths', type=int, nargs='+', default=[10, 100, 1000, 3000, 10000])
+	loops_parser.set_defaults(run=loops)
+
+	simulator_parser = benchmarks.add_parser('simulator', help='instructions per second of the target machine simulator')
+	simulator_parser.add_argument('--outer', type=int, default=200)
+	simulator_parser.set_defaults(run=simulator)
+
+	routines_parser = benchmarks.add_parser('routines', help='simulated cycles of multiply, divide and modulo, called and inlined')
+	routines_parser.add_argument('--operations', nargs='+', default=['x * y', 'x / y', 'x % y', 'x * 2', 'x * 10', 'x * 3', 'x / 200', 'x % 200'])
+	routines_parser.add_argument('--step', type=int, default=3)
+	routines_parser.set_defaults(run=routines)
+
+	arrays_parser = benchmarks.add_parser('arrays', help='interpreting counted array loops, element by element and vectorized')
+	arrays_parser.add_argument('--length', type=int, default=100000)
+	arrays_parser.set_defaults(run=arrays)
+
+	modes_parser = benchmarks.add_parser('modes', help='loop heavy programs in each interpreter mode: tree, bytecode and closures')
+	modes_parser.add_argument('--iterations', type=int, default=20000)
+	modes_parser.set_defaults(run=modes)
+
+	cache_parser = benchmarks.add_parser('cache', help='starting a transpiled program, with and without the on disk cache')
+	cache_parser.add_argument('--statements', type=int, default=20000)
+	cache_parser.set_defaults(run=transpile_cache)
+
+	compile_cache_parser = benchmarks.add_parser('compile-cache', help='compiling for the target machine, with and without the on disk cache')
+	compile_cache_parser.add_argument('--statements', type=int, default=14)
+	compile_cache_parser.set_defaults(run=compile_cache)
+
+	args = argparser.parse_args()
+	args.run(args)
+
+if __name__ == '__main__':
+	main()
@@ -1,23 +1,178 @@
-from Lexer import *
-from Parser import Parser
-from AST import AST
-from CodeGenerator import CodeGenerator
+from Compiler import Compiler
+from CompileCache import CompileCache
+from MemoryPlanner import OutOfMemory
+from Profiler import Profiler, FORMATS as PROFILE_FORMATS
+import Image
+import SourceMap
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import fnmatch
+import json
+import os
 import sys
+import time
 
-def main():
-	if len(sys.argv) == 2:
-		text = open(sys.argv[1], 'r').read()
+#the stages Compiler times, in the order they run
+STAGES = ('cache', 'parse', 'optimize', 'generate', 'peephole', 'plan', 'report', 'write')
+
+def single(args, cache):
+	with open(args.sources[0], 'r') as source:
+		text = source.read()
+	profiler = Profiler() if args.profile is not None else None
+	compiler = Compiler(args.optimize, cache, profiler)
+	try:
+		commands, messages, memory_map = compiler.compile(text)
+	except OutOfMemory as e:
+		print(e, file=sys.stderr)
+		sys.exit(1)
+	if args.map:
+		print(memory_map, file=sys.stderr)
+	output = args.output
+	if output is None:
+		output = 'a' + Image.FORMATS[args.format][1]
+	with compiler.stage('write'):
+		Image.write(output, commands, args.format)
+		if args.source_map is not None:
+			with open(args.source_map, 'w') as f:
+				json.dump(SourceMap.source_map(commands, os.path.abspath(args.sources[0])), f)
+	for message in messages:
+		print(message, file=sys.stderr)
+	if profiler is not None:
+		profiler.write(args.profile_output, args.profile, text)
+
+def find(sources, pattern, out):
+	#every file named in sources and every file matching pattern under a directory in sources,
+	#leaving out what is under the output directory
+	out = os.path.abspath(out)
+	found = []
+	for source in sources:
+		if not os.path.isdir(source):
+			found.append(source)
+			continue
+		for directory, directories, names in os.walk(source):
+			directories[:] = sorted(name for name in directories if os.path.abspath(os.path.join(directory, name)) != out)
+			found.extend(os.path.join(directory, name) for name in sorted(names) if fnmatch.fnmatch(name, pattern))
+	return found
+
+def destinations(sources, out, extension):
+	#the output of each source under out, at its path relative to the directory holding all the sources
+	#with the extension of the output format
+	root = os.path.commonpath([os.path.dirname(os.path.abspath(source)) for source in sources])
+	return [os.path.join(out, os.path.splitext(os.path.relpath(os.path.abspath(source), root))[0] + extension) for source in sources]
+
+#the Compiler of a batch worker process, made once per process by start_worker
+worker = None
+
+#the output format of a batch worker process
+worker_format = None
+
+def start_worker(optimize, cache_directory, cache_limit, format):
+	global worker, worker_format
+	worker_format = format
+	cache = None
+	if cache_directory is not None:
+		cache = CompileCache(cache_directory, cache_limit)
+	#the messages of -O are not printed in a batch, nothing is spent on them
+	worker = Compiler(optimize, cache, report=False)
+
+def compile_file(job):
+	#compiles one source of a batch to its destination. Returns the error, None when it compiled,
+	#and the seconds this worker spent in each stage so far
+	source, destination = job
+	try:
+		with open(source, 'r') as f:
+			text = f.read()
+		commands, messages, memory_map = worker.compile(text)
+		with worker.stage('write'):
+			os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+			Image.write(destination, commands, worker_format)
+		error = None
+	except Exception as e:
+		#the first line, running out of memory goes on with the memory map
+		error = str(e).split('\n')[0]
+	return error, os.getpid(), dict(worker.timings)
+
+def batch(args, cache_limit):
+	sources = find(args.sources, args.pattern, args.out)
+	if not sources:
+		print('no sources to compile', file=sys.stderr)
+		sys.exit(1)
+	jobs = list(zip(sources, destinations(sources, args.out, Image.FORMATS[args.format][1])))
+	workers = min(args.jobs or os.cpu_count() or 1, len(jobs))
+	initargs = (args.optimize, args.cache, cache_limit, args.format)
+	start = time.perf_counter()
+	if workers == 1:
+		#in this process, the baseline a pool is measured against
+		start_worker(*initargs)
+		results = [compile_file(job) for job in jobs]
 	else:
-		text = open('test.txt', 'r').read()
-	if text:
-		lexer = Lexer(text)
-		parser = Parser(lexer)
-		codeGen = CodeGenerator(parser)
-		commands = codeGen.generate()
-		f = open('a.txt', 'w')
-		for command in commands:
-			f.write(str(command.data) + '\n')
-		f.close()
+		#big chunks keep the cost of passing jobs between processes small, small ones share the work out evenly
+		chunksize = max(1, len(jobs) // (workers * 8))
+		with ProcessPoolExecutor(workers, initializer=start_worker, initargs=initargs) as executor:
+			results = list(executor.map(compile_file, jobs, chunksize=chunksize))
+	wall = time.perf_counter() - start
+	failed = 0
+	timings = {}
+	for (source, destination), (error, pid, totals) in zip(jobs, results):
+		if error is not None:
+			failed += 1
+			print('{source}: {error}'.format(source=source, error=error), file=sys.stderr)
+		#each result carries its worker's running totals, so the last one from a worker is all of its time
+		timings[pid] = totals
+	stages = {}
+	for totals in timings.values():
+		for stage, seconds in totals.items():
+			stages[stage] = stages.get(stage, 0) + seconds
+	busy = sum(stages.values())
+	print('{compiled} compiled, {failed} failed in {wall:.2f}s with {workers} workers, {rate:.0f} files/s'.format(
+		compiled=len(jobs) - failed, failed=failed, wall=wall, workers=workers, rate=len(jobs) / wall), file=sys.stderr)
+	for stage in STAGES:
+		if stage in stages:
+			print('{stage:>9} {seconds:8.2f}s {share:5.1f}%'.format(stage=stage, seconds=stages[stage], share=100 * stages[stage] / busy), file=sys.stderr)
+	print('{total:>9} {busy:8.2f}s worker time, {parallel:.1f}x the wall time'.format(total='total', busy=busy, parallel=busy / wall), file=sys.stderr)
+	if failed:
+		sys.exit(1)
+
+def main():
+	argparser = argparse.ArgumentParser(description='Compile a program for the target machine into a.txt, or many programs in parallel.')
+	argparser.add_argument('sources', nargs='*', default=['test.txt'], metavar='source',
+		help='files or directories to compile, more than one file or any directory compiles them all in parallel into --out')
+	argparser.add_argument('-O', dest='optimize', action='store_true',
+		help='fold constants and prune dead code before generating code, remove redundant instructions after, share the cells of variables')
+	argparser.add_argument('--map', action='store_true', help='print where the code and each variable are in memory')
+	argparser.add_argument('--format', choices=sorted(Image.FORMATS), default='text',
+		help='text is a word per line with instructions by mnemonic, binary a byte per word, hex Intel HEX')
+	argparser.add_argument('-o', dest='output', metavar='FILE',
+		help='where to write the program, - for standard output (default a.txt, a.bin or a.hex by --format)')
+	argparser.add_argument('--source-map', metavar='FILE',
+		help='write the source line of every word and where the while loops are, for simulate.py --source-map')
+	argparser.add_argument('--profile', nargs='?', const='table', choices=PROFILE_FORMATS,
+		help='report the time and memory of each phase, each node type the optimizer and code generator visit and each source line, as a table (default), json or folded stacks for flamegraph.pl')
+	argparser.add_argument('--profile-output', default='-', metavar='FILE',
+		help='where to write the profile (default standard error)')
+	argparser.add_argument('--cache', metavar='DIRECTORY',
+		help='keep compiled programs here, compiling the same source with the same options again reads them back')
+	argparser.add_argument('--cache-size', type=int, default=64, metavar='MB',
+		help='the least recently used programs are removed from the cache past this size')
+	argparser.add_argument('--out', metavar='DIRECTORY',
+		help='compile in parallel, each source to a file of the same name with the extension of --format here, by its path under the directory holding all the sources (default build)')
+	argparser.add_argument('-j', '--jobs', type=int, metavar='N',
+		help='worker processes for compiling in parallel (default one per core, 1 compiles in this process)')
+	argparser.add_argument('--pattern', default='*.txt',
+		help='the files compiled from a directory (default *.txt)')
+	args = argparser.parse_args()
+	cache_limit = args.cache_size * 1024 * 1024
+	if args.out is not None or len(args.sources) > 1 or os.path.isdir(args.sources[0]):
+		if args.map or args.output is not None or args.profile is not None or args.source_map is not None:
+			argparser.error('--map, -o, --profile and --source-map are for compiling one source')
+		if args.out is None:
+			args.out = 'build'
+		batch(args, cache_limit)
+		return
+	cache = None
+	if args.cache is not None:
+		cache = CompileCache(args.cache, cache_limit)
+	single(args, cache)
 
 if __name__ == '__main__':
 	main()
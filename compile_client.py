@@ -0,0 +1,56 @@
+#a client of compile_server.py, doing what compile.py does for one source. It imports none of the
+#compiler, so it starts in the time Python takes to start
+import Image
+import argparse
+import json
+import os
+import socket
+import sys
+
+#in TMPDIR as tempfile.gettempdir() would find it, without importing tempfile
+DEFAULT_SOCKET = os.path.join(os.environ.get('TMPDIR', '/tmp'), 'compiler-{uid}.sock'.format(uid=os.getuid()))
+
+def request(path, message):
+	#sends one request to the server at path, returns its response
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+		connection.connect(path)
+		connection.sendall(json.dumps(message).encode() + b'\n')
+		with connection.makefile('rb') as f:
+			line = f.readline()
+	if not line:
+		raise Exception('Compile server at {path} closed the connection'.format(path=path))
+	return json.loads(line)
+
+def main():
+	argparser = argparse.ArgumentParser(description='Compile a program for the target machine into a.txt with a running compile_server.py.')
+	argparser.add_argument('source', nargs='?', default='test.txt')
+	argparser.add_argument('-O', dest='optimize', action='store_true',
+		help='fold constants and prune dead code before generating code, remove redundant instructions after, share the cells of variables')
+	argparser.add_argument('--map', action='store_true', help='print where the code and each variable are in memory')
+	argparser.add_argument('--format', choices=sorted(Image.FORMATS), default='text',
+		help='text is a word per line with instructions by mnemonic, binary a byte per word, hex Intel HEX')
+	argparser.add_argument('-o', dest='output', metavar='FILE',
+		help='where to write the program, - for standard output (default a.txt, a.bin or a.hex by --format)')
+	argparser.add_argument('--socket', default=DEFAULT_SOCKET, help='the server\'s socket (default {path})'.format(path=DEFAULT_SOCKET))
+	args = argparser.parse_args()
+	with open(args.source, 'r') as source:
+		text = source.read()
+	try:
+		response = request(args.socket, {'source': text, 'optimize': args.optimize})
+	except OSError as e:
+		print('No compile server at {path}: {error}'.format(path=args.socket, error=e), file=sys.stderr)
+		sys.exit(2)
+	if 'error' in response:
+		print(response['error'], file=sys.stderr)
+		sys.exit(1)
+	if args.map:
+		print(response['map'], file=sys.stderr)
+	output = args.output
+	if output is None:
+		output = 'a' + Image.FORMATS[args.format][1]
+	Image.write(output, response['output'], args.format)
+	for message in response['messages']:
+		print(message, file=sys.stderr)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,27 @@
+from CompileServer import CompileServer
+from CompileCache import CompileCache, MemoryCache, DEFAULT_ENTRIES
+from compile_client import DEFAULT_SOCKET
+import argparse
+import asyncio
+import sys
+
+def main():
+	argparser = argparse.ArgumentParser(description='Keep the compiler loaded and compile programs sent by compile_client.py.')
+	argparser.add_argument('--socket', default=DEFAULT_SOCKET, help='where to listen (default {path})'.format(path=DEFAULT_SOCKET))
+	argparser.add_argument('--entries', type=int, default=DEFAULT_ENTRIES,
+		help='compiled programs kept in memory, the least recently used go past this many')
+	argparser.add_argument('--cache', metavar='DIRECTORY',
+		help='keep compiled programs here too, so they outlive the server, shared with compile.py --cache')
+	argparser.add_argument('--cache-size', type=int, default=64, metavar='MB',
+		help='the least recently used programs are removed from the disk cache past this size')
+	args = argparser.parse_args()
+	backing = None
+	if args.cache is not None:
+		backing = CompileCache(args.cache, args.cache_size * 1024 * 1024)
+	server = CompileServer(args.socket, MemoryCache(args.entries, backing))
+	print('listening on {path}'.format(path=args.socket), file=sys.stderr)
+	asyncio.run(server.serve())
+	print(server.summary(), file=sys.stderr)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,507 @@
+from Lexer import Lexer
+from Parser import Parser
+from Interpreter import Interpreter
+from BytecodeCompiler import BytecodeCompiler
+from VirtualMachine import VirtualMachine
+from ClosureCompiler import ClosureCompiler
+from Transpiler import Transpiler, execute
+from CodeGenerator import CodeGenerator, WORD_BITS
+from Optimizer import Optimizer
+from Peephole import Peephole
+from Simulator import Simulator
+from MemoryPlanner import MemoryPlanner, OutOfMemory
+import argparse
+import contextlib
+import io
+import multiprocessing
+import random
+import time
+import traceback
+
+#differential testing: random programs are run by the Interpreter, in interpret.py's other modes
+#and, compiled, by the Simulator, and the values they output compared. A program that disagrees
+#is shrunk to a small one that still does.
+#
+#programs are nested tuples until they are rendered to source, so shrinking can drop statements
+#and replace expressions with their parts. The code generator has no else or !, programs with
+#them are only interpreted. A program is only checked when every value it computes fits a word,
+#the interpreter's integers being unbounded
+#
+#programs that once went wrong somewhere are kept in REGRESSIONS and checked first on every run,
+#in each interpreter mode as well as compiled
+
+SCALARS = ('v0', 'v1', 'v2', 'v3')
+ARRAY = 'a'
+ARRAY_LENGTH = 4
+COUNTERS = ('l0', 'l1', 'l2')
+COMPARISONS = ('<', '<=', '>', '>=', '==', '!=')
+EXPRESSIONS = ('num', 'var', 'elem', 'binop', 'unary')
+STEP_LIMIT = 1000000
+
+#how interpret.py runs a program in each of its modes, the first the reference
+MODES = {
+	'tree': lambda text: Interpreter(Parser(Lexer(text))),
+	'vm': lambda text: run_bytecode(BytecodeCompiler(Parser(Lexer(text)))),
+	'closure': lambda text: ClosureCompiler(Parser(Lexer(text))).compile()(),
+	'python': lambda text: execute(compile(Transpiler(Parser(Lexer(text))).source(), '<transpiled>', 'exec'))
+}
+
+REGRESSIONS = (
+	#a flat chain of one operator, transpiled with a pair of parentheses for each was past Python's nesting limit
+	'declare x = 1;\noutput ' + ' + '.join(['x'] * 250) + ';\n',
+	'declare x = 255;\noutput ' + ' - '.join(['x'] + ['1'] * 254) + ';\n',
+	#compiled, the right operand was calculated before the left one it changes
+	'declare x = 1;\noutput x + ++x;\n',
+	'declare x = 5;\noutput x - --x;\n',
+	'declare x = 3;\noutput x * ++x;\noutput x / --x;\noutput (x + 1) % ++x;\n',
+	'declare x = 2;\ndeclare a[4];\na[x] = 7;\noutput a[x] + a[--x];\nif (x < ++x) {\n\toutput x;\n}\n',
+	#> and >= subtract the left side from the right one, which calculated the right side first
+	'declare x = 1;\nif (++x > x) {\n\toutput 1;\n}\noutput x;\ndeclare y = 1;\nif (++y >= y + 1) {\n\toutput 7;\n}\n',
+	'declare x = 1;\nif (x >= ++x) {\n\toutput 3;\n}\nif (x + 0 > ++x) {\n\toutput 4;\n}\noutput x;\n',
+	#transpiled, a[i] = v calculated v before the index it changes, as Python does
+	'declare i = 0;\ndeclare a[2];\na[i] = ++i;\noutput a[0];\noutput a[1];\n',
+	#the vm resolved declarations when compiling, so a declaration running twice or not at all went unnoticed
+	'declare i = 0;\nwhile (i < 3) {\n\tdeclare y;\n\toutput i;\n\t++i;\n}\n',
+	'declare i = 0;\nif (i > 0) {\n\tdeclare y;\n}\noutput i;\noutput y;\n',
+	'declare i = 0;\noutput i;\ny = 4;\n',
+	'declare i = 1;\nif (i > 0) {\n\tdeclare a[3];\n} else {\n\tdeclare y = 3;\n}\na[1] = 5;\noutput a[1];\n++a[i];\noutput a[i];\noutput y;\n',
+)
+
+class OutOfRange(Exception):
+	pass
+
+class ProgramGenerator:
+	def __init__(self, seed, operators='+-*/%', statements=6, depth=3):
+		self.random = random.Random(seed)
+		self.operators = operators
+		self.statements = statements
+		self.depth = depth
+
+	def program(self):
+		return self.block(0, self.random.randint(1, self.statements))
+
+	def block(self, level, count):
+		return [self.statement(level) for n in range(count)]
+
+	def statement(self, level):
+		r = self.random.random()
+		if r < 0.15 and level < len(COUNTERS):
+			return ('loop', COUNTERS[level], self.random.randint(0, 4), self.block(level + 1, self.random.randint(1, 3)))
+		elif r < 0.3 and level < self.depth:
+			if self.random.random() < 0.2:
+				return ('ifelse', self.condition(1), self.block(level + 1, self.random.randint(1, 3)), self.block(level + 1, self.random.randint(1, 3)))
+			return ('if', self.condition(1), self.block(level + 1, self.random.randint(1, 3)))
+		elif r < 0.45:
+			return ('step', self.random.choice(('++', '--')), self.target())
+		elif r < 0.65:
+			return ('output', self.expression(self.depth))
+		return ('assign', self.target(), self.expression(self.depth))
+
+	def target(self):
+		if self.random.random() < 0.25:
+			return ('elem', ARRAY, self.index())
+		return ('var', self.random.choice(SCALARS))
+
+	def index(self):
+		if self.random.random() < 0.5:
+			return ('num', self.random.randrange(ARRAY_LENGTH))
+		return ('var', self.random.choice(SCALARS + COUNTERS))
+
+	def expression(self, depth):
+		r = self.random.random()
+		if depth > 0 and r < 0.4:
+			return ('binop', self.random.choice(self.operators), self.expression(depth - 1), self.expression(depth - 1))
+		elif r < 0.55:
+			return ('num', self.random.randint(0, 20))
+		elif r < 0.8:
+			return ('var', self.random.choice(SCALARS + COUNTERS))
+		elif r < 0.9:
+			return ('elem', ARRAY, self.index())
+		#++ or -- of what a statement could step, so loop counters only change where the loop does it
+		return ('unary', self.random.choice(('++', '--')), self.target())
+
+	def condition(self, depth):
+		r = self.random.random()
+		if depth > 0 and r < 0.3:
+			return (self.random.choice(('and', 'or')), self.condition(depth - 1), self.condition(depth - 1))
+		elif depth > 0 and r < 0.4:
+			return ('not', self.condition(depth - 1))
+		return ('cmp', self.random.choice(COMPARISONS), self.expression(1), self.expression(1))
+
+def render(program):
+	lines = ['declare {name} = {value};'.format(name=name, value=n + 1) for n, name in enumerate(SCALARS)]
+	lines.extend('declare {name};'.format(name=name) for name in COUNTERS)
+	lines.append('declare {name}[{length}];'.format(name=ARRAY, length=ARRAY_LENGTH))
+	lines.extend('{name}[{n}] = {value};'.format(name=ARRAY, n=n, value=n + 5) for n in range(ARRAY_LENGTH))
+	render_block(program, lines, '')
+	return '\n'.join(lines) + '\n'
+
+def render_block(statements, lines, indent):
+	for statement in statements:
+		kind = statement[0]
+		if kind == 'assign':
+			lines.append('{indent}{target} = {value};'.format(indent=indent, target=render_expression(statement[1]), value=render_expression(statement[2])))
+		elif kind == 'output':
+			lines.append('{indent}output {value};'.format(indent=indent, value=render_expression(statement[1])))
+		elif kind == 'step':
+			lines.append('{indent}{op}{target};'.format(indent=indent, op=statement[1], target=render_expression(statement[2])))
+		elif kind == 'if' or kind == 'ifelse':
+			lines.append('{indent}if ({condition}) {{'.format(indent=indent, condition=render_condition(statement[1])))
+			render_block(statement[2], lines, indent + '\t')
+			if kind == 'ifelse':
+				lines.append(indent + '} else {')
+				render_block(statement[3], lines, indent + '\t')
+			lines.append(indent + '}')
+		elif kind == 'loop':
+			counter, bound = statement[1], statement[2]
+			lines.append('{indent}{counter} = 0;'.format(indent=indent, counter=counter))
+			lines.append('{indent}while ({counter} < {bound}) {{'.format(indent=indent, counter=counter, bound=bound))
+			render_block(statement[3], lines, indent + '\t')
+			lines.append('{indent}\t++{counter};'.format(indent=indent, counter=counter))
+			lines.append(indent + '}')
+
+def render_expression(node):
+	kind = node[0]
+	if kind == 'num':
+		return str(node[1])
+	elif kind == 'var':
+		return node[1]
+	elif kind == 'elem':
+		return '{name}[{index}]'.format(name=node[1], index=render_expression(node[2]))
+	elif kind == 'unary':
+		return node[1] + render_expression(node[2])
+	#a condition takes a leading parenthesis for its own, but conditions only compare
+	#expressions one operator deep, whose left operand needs none
+	left = render_expression(node[2])
+	if node[2][0] == 'binop' and node[2][1] in '+-' and node[1] in '*/%':
+		left = '(' + left + ')'
+	right = render_expression(node[3])
+	if node[3][0] == 'binop':
+		right = '(' + right + ')'
+	return '{left} {op} {right}'.format(left=left, op=node[1], right=right)
+
+def render_condition(node):
+	kind = node[0]
+	if kind == 'cmp':
+		return '{left} {op} {right}'.format(left=render_expression(node[2]), op=node[1], right=render_expression(node[3]))
+	elif kind == 'not':
+		#! takes all of the condition after it
+		return '!(' + render_condition(node[1]) + ')'
+	#one && and one || per level, anything deeper in parentheses
+	sides = []
+	for side in (node[1], node[2]):
+		sides.append(render_condition(side) if side[0] == 'cmp' else '(' + render_condition(side) + ')')
+	return '{left} {op} {right}'.format(left=sides[0], op='&&' if kind == 'and' else '||', right=sides[1])
+
+class RangeCheck:
+	#runs a program the way the language defines it and raises OutOfRange if a value
+	#does not fit a word or an index is outside the array, deciding whether it can be compared
+	def __init__(self):
+		self.values = {name: n + 1 for n, name in enumerate(SCALARS)}
+		self.values.update((name, 0) for name in COUNTERS)
+		self.array = [n + 5 for n in range(ARRAY_LENGTH)]
+
+	def word(self, value):
+		if not 0 <= value < 1 << WORD_BITS:
+			raise OutOfRange(value)
+		return value
+
+	def run(self, statements):
+		for statement in statements:
+			kind = statement[0]
+			if kind == 'assign':
+				#the index before the value, which could change it
+				index = None
+				if statement[1][0] == 'elem':
+					index = self.index(statement[1][2])
+				value = self.expression(statement[2])
+				self.store(statement[1], value, index)
+			elif kind == 'output':
+				self.expression(statement[1])
+			elif kind == 'step':
+				self.step(statement[1], statement[2])
+			elif kind == 'if':
+				if self.condition(statement[1]):
+					self.run(statement[2])
+			elif kind == 'ifelse':
+				self.run(statement[2] if self.condition(statement[1]) else statement[3])
+			elif kind == 'loop':
+				self.values[statement[1]] = 0
+				while self.values[statement[1]] < statement[2]:
+					self.run(statement[3])
+					self.values[statement[1]] += 1
+
+	def store(self, target, value, index=None):
+		if target[0] == 'var':
+			self.values[target[1]] = value
+		else:
+			self.array[self.index(target[2]) if index is None else index] = value
+
+	def step(self, op, target):
+		#++ or --, the value after
+		index = None
+		if target[0] == 'elem':
+			index = self.index(target[2])
+			value = self.array[index]
+		else:
+			value = self.values[target[1]]
+		value = self.word(value + (1 if op == '++' else -1))
+		self.store(target, value, index)
+		return value
+
+	def index(self, node):
+		index = self.expression(node)
+		if index >= ARRAY_LENGTH:
+			raise OutOfRange(index)
+		return index
+
+	def expression(self, node):
+		kind = node[0]
+		if kind == 'num':
+			return node[1]
+		elif kind == 'var':
+			return self.values[node[1]]
+		elif kind == 'elem':
+			return self.array[self.index(node[2])]
+		elif kind == 'unary':
+			return self.step(node[1], node[2])
+		left = self.expression(node[2])
+		right = self.expression(node[3])
+		if node[1] == '+':
+			return self.word(left + right)
+		elif node[1] == '-':
+			return self.word(left - right)
+		elif node[1] == '*':
+			return self.word(left * right)
+		elif right == 0:
+			raise OutOfRange('division by zero')
+		elif node[1] == '/':
+			return left // right
+		return left % right
+
+	def condition(self, node):
+		kind = node[0]
+		if kind == 'and':
+			return self.condition(node[1]) and self.condition(node[2])
+		elif kind == 'or':
+			return self.condition(node[1]) or self.condition(node[2])
+		elif kind == 'not':
+			return not self.condition(node[1])
+		left = self.expression(node[2])
+		right = self.expression(node[3])
+		return {'<': left < right, '<=': left <= right, '>': left > right, '>=': left >= right, '==': left == right, '!=': left != right}[node[1]]
+
+def interpret(text):
+	output = io.StringIO()
+	with contextlib.redirect_stdout(output):
+		Interpreter(Parser(Lexer(text)))
+	return [int(value) for value in output.getvalue().split()]
+
+def run_bytecode(compiler):
+	code = compiler.compile()
+	VirtualMachine(code, compiler.slots).run()
+
+def outcome(text, mode):
+	#the values text outputs in mode and the error it stops with, None if it does not
+	output = io.StringIO()
+	error = None
+	with contextlib.redirect_stdout(output):
+		try:
+			MODES[mode](text)
+		except Exception as e:
+			error = str(e)
+	return [int(value) for value in output.getvalue().split()], error
+
+def simulate(text, optimize):
+	optimizer = None
+	if optimize:
+		optimizer = Optimizer(bits=WORD_BITS, static_declarations=True)
+	generator = CodeGenerator(Parser(Lexer(text)), optimizer)
+	commands = generator.generate()
+	if optimize:
+		commands = Peephole(generator.spills()).optimize(commands)
+	try:
+		commands = MemoryPlanner(generator.symtab, share=optimize).plan(commands)
+	except OutOfMemory:
+		return None
+	simulator = Simulator(commands)
+	output = simulator.run(STEP_LIMIT)
+	if not simulator.halted:
+		output.append('no HLT after {steps} instructions'.format(steps=STEP_LIMIT))
+	return output
+
+def verdict(program):
+	#None when the program agrees or cannot be compared, otherwise what went wrong
+	try:
+		RangeCheck().run(program)
+	except OutOfRange:
+		return None
+	text = render(program)
+	try:
+		expected = interpret(text)
+	except Exception as e:
+		return 'interpreter: {error}'.format(error=e)
+	for mode in MODES:
+		if mode != 'tree':
+			result = outcome(text, mode)
+			if result != (expected, None):
+				return '{mode}: tree {expected}, {mode} {result}'.format(mode=mode, expected=expected, result=result)
+	if not compilable(program):
+		return None
+	for optimize in (False, True):
+		try:
+			output = simulate(text, optimize)
+		except Exception as e:
+			return '{mode}: {error}'.format(mode='-O' if optimize else 'plain', error=e)
+		if output is not None and output != expected:
+			return '{mode}: interpreter {expected}, simulator {output}'.format(mode='-O' if optimize else 'plain', expected=expected, output=output)
+	return None
+
+def compilable(node):
+	#whether the code generator supports node, the program or any part of it
+	if isinstance(node, list):
+		return all(compilable(statement) for statement in node)
+	if node[0] in ('ifelse', 'not'):
+		return False
+	return all(compilable(part) for part in node if isinstance(part, (tuple, list)))
+
+def shrink(program):
+	#takes any smaller version that still fails, until there is none
+	while True:
+		for candidate in smaller(program):
+			if verdict(candidate) is not None:
+				program = candidate
+				break
+		else:
+			return program
+
+def smaller(node):
+	#every version of node with one statement dropped or one part simplified
+	if isinstance(node, list):
+		for i in range(len(node)):
+			yield node[:i] + node[i + 1:]
+		for i, statement in enumerate(node):
+			if statement[0] in ('if', 'loop'):
+				yield node[:i] + statement[-1] + node[i + 1:]
+			elif statement[0] == 'ifelse':
+				yield node[:i] + [('if',) + statement[1:3]] + node[i + 1:]
+				yield node[:i] + statement[2] + node[i + 1:]
+				yield node[:i] + statement[3] + node[i + 1:]
+			for replacement in smaller(statement):
+				yield node[:i] + [replacement] + node[i + 1:]
+		return
+	kind = node[0]
+	if kind in ('assign', 'step', 'unary'):
+		#the target stays a variable, only an index in it can change
+		if kind == 'unary':
+			yield ('num', 0)
+			yield node[2]
+		value, target = (2, 1) if kind == 'assign' else (None, 2)
+		if node[target][0] == 'elem':
+			for index in smaller(node[target][2]):
+				yield node[:target] + (node[target][:2] + (index,),) + node[target + 1:]
+		if value is not None:
+			for replacement in smaller(node[value]):
+				yield node[:value] + (replacement,)
+		return
+	if kind == 'num':
+		if node[1] > 0:
+			yield ('num', 0)
+			yield ('num', node[1] // 2)
+		return
+	if kind in EXPRESSIONS and kind != 'num':
+		yield ('num', 0)
+	if kind == 'binop':
+		yield node[2]
+		yield node[3]
+	elif kind in ('and', 'or'):
+		yield node[1]
+		yield node[2]
+	elif kind == 'not':
+		yield node[1]
+	elif kind == 'loop' and node[2] > 0:
+		yield node[:2] + (node[2] - 1,) + node[3:]
+	for i, part in enumerate(node):
+		if isinstance(part, (tuple, list)):
+			for replacement in smaller(part):
+				yield node[:i] + (replacement,) + node[i + 1:]
+
+def regressions():
+	#what went wrong with each of REGRESSIONS, compared with tree mode. Compiled programs
+	#do not check declarations, so a program stopping with an error is only interpreted
+	problems = []
+	for text in REGRESSIONS:
+		expected = outcome(text, 'tree')
+		for mode in MODES:
+			result = outcome(text, mode)
+			if mode != 'tree' and result != expected:
+				problems.append(('{mode}: tree {expected}, {mode} {result}'.format(mode=mode, expected=expected, result=result), text))
+		if expected[1] is not None:
+			continue
+		for optimize in (False, True):
+			mode = '-O' if optimize else 'plain'
+			try:
+				output = simulate(text, optimize)
+			except Exception as e:
+				problems.append(('{mode}: {error}'.format(mode=mode, error=e), text))
+				continue
+			if output is not None and output != expected[0]:
+				problems.append(('{mode}: interpreter {expected}, simulator {output}'.format(mode=mode, expected=expected[0], output=output), text))
+	return problems
+
+def check(case):
+	#one case's result, a case the harness itself breaks on is a failure of that case only
+	seed, options = case
+	try:
+		return judge(seed, options)
+	except Exception as e:
+		return seed, 'failed', ('harness: {kind}: {error}'.format(kind=type(e).__name__, error=e), traceback.format_exc())
+
+def judge(seed, options):
+	program = ProgramGenerator(seed, **options).program()
+	try:
+		RangeCheck().run(program)
+	except OutOfRange:
+		return seed, 'skipped', None
+	problem = verdict(program)
+	if problem is None:
+		return seed, 'passed', None
+	program = shrink(program)
+	return seed, 'failed', (verdict(program), render(program))
+
+def main():
+	argparser = argparse.ArgumentParser(description='Check compiled programs against the interpreter on random programs.')
+	argparser.add_argument('--cases', type=int, default=1000)
+	argparser.add_argument('--seed', type=int, default=0, help='seed of the first case, each case has its own')
+	argparser.add_argument('--operators', default='+-*/%', help='arithmetic operators the programs use')
+	argparser.add_argument('--statements', type=int, default=6, help='most statements in a block')
+	argparser.add_argument('--workers', type=int, default=None, help='processes, all cores by default')
+	argparser.add_argument('--show', type=int, default=3, help='failures to print in full')
+	args = argparser.parse_args()
+	problems = regressions()
+	for problem, text in problems:
+		print('regression: {problem}'.format(problem=problem))
+		print(text)
+	print('{passed} of {count} regressions passed'.format(passed=len(REGRESSIONS) - len(set(text for problem, text in problems)), count=len(REGRESSIONS)))
+	options = {'operators': args.operators, 'statements': args.statements}
+	cases = [(seed, options) for seed in range(args.seed, args.seed + args.cases)]
+	counts = {'passed': 0, 'failed': 0, 'skipped': 0}
+	failures = []
+	start = time.perf_counter()
+	with multiprocessing.Pool(args.workers) as pool:
+		for seed, result, failure in pool.imap_unordered(check, cases, chunksize=16):
+			counts[result] += 1
+			if failure is not None:
+				failures.append((seed, failure))
+	elapsed = time.perf_counter() - start
+	failures.sort()
+	for seed, (problem, text) in failures[:args.show]:
+		print('seed {seed}: {problem}'.format(seed=seed, problem=problem))
+		print(text)
+	print('{passed} passed, {failed} failed, {skipped} out of range in {seconds:.1f}s ({rate:.0f} programs a minute)'.format(
+		seconds=elapsed, rate=args.cases / elapsed * 60, **counts))
+	if failures:
+		print('failing seeds: ' + ' '.join(str(seed) for seed, failure in failures))
+
+if __name__ == '__main__':
+	main()
@@ -1,18 +1,84 @@
 from Lexer import *
-from Parser import Parser
+from FastLexer import FastLexer
+from IterativeParser import IterativeParser
 from AST import AST
 from Interpreter import Interpreter
-import sys
+from BytecodeCompiler import BytecodeCompiler
+from VirtualMachine import VirtualMachine
+from ClosureCompiler import ClosureCompiler
+from Transpiler import Transpiler, TranspileCache, execute
+from Optimizer import Optimizer
+from Compiler import Parsed
+from Profiler import Profiler, FORMATS as PROFILE_FORMATS
+import argparse
+
+def profile(args):
+	#tree mode with every phase and visit recorded
+	with open(args.source, 'r') as source:
+		text = source.read()
+	profiler = Profiler()
+	with profiler.phase('parse'):
+		lexer = FastLexer(text)
+		lexer.get_next_token = profiler.timed('lex', lexer.get_next_token)
+		root = IterativeParser(lexer).parse()
+	if args.optimize:
+		with profiler.phase('optimize'):
+			optimizer = Optimizer()
+			profiler.instrument(optimizer)
+			root = optimizer.optimize(root)
+	with profiler.phase('interpret'):
+		Interpreter(Parsed(root), None, args.vectorize, profiler)
+	profiler.write(args.profile_output, args.profile, text)
 
 def main():
-	if len(sys.argv) == 2:
-		text = open(sys.argv[1], 'r').read()
-	else:
-		text = open('test.txt', 'r').read()
-	if text:
-		lexer = Lexer(text)
-		parser = Parser(lexer)
-		interpreter = Interpreter(parser)
+	argparser = argparse.ArgumentParser(description='Run a program without compiling it for the target machine.')
+	argparser.add_argument('source', nargs='?', default='test.txt')
+	argparser.add_argument('--mode', choices=['tree', 'vm', 'closure', 'python'], default='tree',
+		help='tree walks the AST (reference), vm runs it as bytecode, closure as nested Python functions, python as transpiled Python')
+	argparser.add_argument('--cache', metavar='DIRECTORY',
+		help='keep transpiled programs here, running the same source again skips lexing and parsing (python mode)')
+	argparser.add_argument('-O', dest='optimize', action='store_true',
+		help='fold constants and prune dead code first')
+	argparser.add_argument('--no-vectorize', dest='vectorize', action='store_false',
+		help='run counted array loops element by element even when NumPy is installed (tree mode)')
+	argparser.add_argument('--profile', nargs='?', const='table', choices=PROFILE_FORMATS,
+		help='report the time and memory of each phase, the visits and time of each visit_ method and each source line, as a table (default), json or folded stacks for flamegraph.pl (tree mode)')
+	argparser.add_argument('--profile-output', default='-', metavar='FILE',
+		help='where to write the profile (default standard error)')
+	args = argparser.parse_args()
+	if args.profile is not None:
+		if args.mode != 'tree':
+			argparser.error('--profile is for tree mode')
+		profile(args)
+		return
+	if args.mode == 'python':
+		with open(args.source, 'r') as source:
+			text = source.read()
+		optimizer = Optimizer() if args.optimize else None
+		if args.cache is not None:
+			code = TranspileCache(args.cache).code(text, optimizer)
+		else:
+			code = compile(Transpiler(IterativeParser(FastLexer(text)), optimizer).source(), args.source, 'exec')
+		execute(code)
+		return
+	with open(args.source, 'r') as source:
+		lexer = FastLexer(source)
+		parser = IterativeParser(lexer)
+		optimizer = None
+		if args.mode == 'vm':
+			if args.optimize:
+				optimizer = Optimizer()
+			compiler = BytecodeCompiler(parser, optimizer)
+			code = compiler.compile()
+			VirtualMachine(code, compiler.slots).run()
+		elif args.mode == 'closure':
+			if args.optimize:
+				optimizer = Optimizer()
+			ClosureCompiler(parser, optimizer).compile()()
+		else:
+			if args.optimize:
+				optimizer = Optimizer()
+			interpreter = Interpreter(parser, optimizer, args.vectorize)
 
 if __name__ == '__main__':
-	main()
\ No newline at end of file
+	main()
@@ -0,0 +1,33 @@
+from Simulator import Simulator
+from SourceMap import Listing
+import Image
+import argparse
+import json
+import sys
+
+def main():
+	argparser = argparse.ArgumentParser(description='Run the code compile.py wrote on a simulation of the target machine.')
+	argparser.add_argument('program', nargs='?', default='a.txt')
+	argparser.add_argument('--format', choices=sorted(Image.FORMATS),
+		help='the format compile.py wrote the program in (default by its extension: .bin binary, .hex Intel HEX, otherwise text)')
+	argparser.add_argument('--source-map', metavar='FILE',
+		help='the source map compile.py --source-map wrote, to print the source with the instructions and cycles of each line and loop')
+	argparser.add_argument('--source', metavar='FILE',
+		help='the program\'s source, by default the file the source map was written for')
+	argparser.add_argument('--limit', type=int, default=10000000,
+		help='stop after this many instructions')
+	args = argparser.parse_args()
+	simulator = Simulator(Image.read(args.program, args.format))
+	for value in simulator.run(args.limit):
+		print(value)
+	print(simulator.summary(), file=sys.stderr)
+	if args.source_map is not None:
+		with open(args.source_map, 'r') as f:
+			source_map = json.load(f)
+		with open(args.source or source_map['source'], 'r') as f:
+			source = f.read()
+		listing = Listing(source_map, simulator.memory, simulator.executed)
+		print(listing.text(source), end='', file=sys.stderr)
+
+if __name__ == '__main__':
+	main()